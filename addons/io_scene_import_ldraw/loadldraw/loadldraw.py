@@ -51,6 +51,14 @@ import tempfile
 
 from pprint import pprint
 
+# encoding detection and decoding come from the ldraw_core package of the LDraw Import MM addon,
+# which is released and installed next to this one, so both importers read files the same way
+# if that addon isn't there, files are decoded the way this addon always did
+try:
+    from io_scene_import_ldraw_mm.ldraw_core import text as ldraw_text
+except ImportError:
+    ldraw_text = None
+
 # **************************************************************************************
 def internalPrint(message, is_error=False):
     """Print output with identification timestamp."""
@@ -1346,32 +1354,48 @@ class FileSystem:
             dirname = os.path.dirname(dirname)
 
         if not os.path.exists(dirname):
-            debug_dirname = dirname
             dirname = FileSystem.__pathInsensitive(dirname)
             if not dirname:
                 return
 
         # at this point, the directory exists but not the file
 
-        try:  # we are expecting dirname to be a directory, but it could be a file
-            files = CachedDirectoryFilenames.getCached(dirname)
-            if files is None:
-                files = os.listdir(dirname)
-                CachedDirectoryFilenames.addToCache(dirname, files)
-        except OSError:
-            return
-
-        baselow = base.lower()
-        try:
-            basefinal = next(fl for fl in files if fl.lower() == baselow)
-        except StopIteration:
+        # we are expecting dirname to be a directory, but it could be a file
+        files = CachedDirectoryFilenames.getIndex(dirname)
+        if files is None:
             return
 
+        basefinal = files.get(base.lower())
         if basefinal:
             return os.path.join(dirname, basefinal) + suffix
         else:
             return
 
+    def resolvePath(path, partName):
+        """Find partName relative to the existing directory path, ignoring case"""
+
+        dirname = path
+        parts = partName.split(os.path.sep)
+        for part in parts[:-1]:
+            if part in (os.curdir, os.pardir):
+                dirname = os.path.join(dirname, part)
+                continue
+            files = CachedDirectoryFilenames.getIndex(dirname)
+            if files is None:
+                return None
+            part = files.get(part.lower())
+            if part is None:
+                return None
+            dirname = os.path.join(dirname, part)
+
+        files = CachedDirectoryFilenames.getIndex(dirname)
+        if files is None:
+            return None
+        basefinal = files.get(parts[-1].lower())
+        if basefinal is None:
+            return None
+        return os.path.join(dirname, basefinal)
+
     def __checkEncoding(filepath):
         """Check the encoding of a file for Endian encoding."""
 
@@ -1400,6 +1424,9 @@ class FileSystem:
 
         lines = None
         if os.path.exists(filepath):
+            if ldraw_text is not None:
+                return ldraw_text.read_text(filepath).splitlines(True)
+
             # Try to read using the suspected encoding
             file_encoding = FileSystem.__checkEncoding(filepath)
             try:
@@ -1426,11 +1453,19 @@ class FileSystem:
         if rootPath not in allSearchPaths:
             allSearchPaths.append(rootPath)
 
+        if os.path.isabs(partName):
+            fullPathName = FileSystem.pathInsensitive(partName)
+            if os.path.exists(fullPathName):
+                return fullPathName
+            allSearchPaths = []
+
         for path in allSearchPaths:
-            fullPathName = os.path.join(path, partName)
-            fullPathName = FileSystem.pathInsensitive(fullPathName)
+            # the root path is built from a lowercase filename so it may need its case restored
+            if CachedDirectoryFilenames.getIndex(path) is None:
+                path = FileSystem.pathInsensitive(path)
 
-            if os.path.exists(fullPathName):
+            fullPathName = FileSystem.resolvePath(path, partName)
+            if fullPathName is not None:
                 return fullPathName
 
         if haveArchiveLibraries is True:
@@ -1449,20 +1484,42 @@ class FileSystem:
 # **************************************************************************************
 # **************************************************************************************
 class CachedDirectoryFilenames:
-    """Cached dictionary of directory filenames keyed by directory path"""
+    """Cached dictionary of lowercase filename to filename dictionaries keyed by directory path.
+    The dictionaries are kept between loads and only rebuilt when the directory's modified time changes."""
 
-    __cache = {}        # Dictionary
+    __cache = {}        # Dictionary of directory paths as keys, and (mtime, {lowercase filename: filename}) as values
+    __checked = set()   # Directories whose modified time has been checked during this load
 
-    def getCached(key):
-        if key in CachedDirectoryFilenames.__cache:
-            return CachedDirectoryFilenames.__cache[key]
-        return None
+    def getIndex(dirname):
+        """Return the lowercase filename dictionary of dirname, or None if it is not a directory"""
 
-    def addToCache(key, value):
-        CachedDirectoryFilenames.__cache[key] = value
+        entry = CachedDirectoryFilenames.__cache.get(dirname)
+        if entry is not None and dirname in CachedDirectoryFilenames.__checked:
+            return entry[1]
+
+        try:
+            mtime = os.stat(dirname or os.curdir).st_mtime_ns
+        except OSError:
+            mtime = None
+
+        if entry is None or entry[0] != mtime:
+            index = None
+            if mtime is not None:
+                try:
+                    index = {}
+                    for filename in os.listdir(dirname or os.curdir):
+                        index.setdefault(filename.lower(), filename)
+                except OSError:
+                    index = None
+            entry = (mtime, index)
+            CachedDirectoryFilenames.__cache[dirname] = entry
+
+        CachedDirectoryFilenames.__checked.add(dirname)
+        return entry[1]
 
     def clearCache():
-        CachedDirectoryFilenames.__cache = {}
+        """Start a new load. Directories are checked for changes again the next time they are used"""
+        CachedDirectoryFilenames.__checked = set()
 
 
 # **************************************************************************************
@@ -1496,6 +1553,9 @@ class CachedLibraries:
         return CachedLibraries.__unofficialCache
 
     def getEncoding(binIOSlice):
+        if ldraw_text is not None:
+            return ldraw_text.get_encoding(binIOSlice)
+
         # The file uses UCS-2 (UTF-16) Big Endian encoding
         if binIOSlice == b'\xfe\xff\x00':
             return "utf_16_be"
@@ -1506,6 +1566,13 @@ class CachedLibraries:
         else:
             return "utf_8"
 
+    def decode(binIO):
+        if ldraw_text is not None:
+            return ldraw_text.decode(binIO)
+
+        encoding = CachedLibraries.getEncoding(binIO[:3])
+        return binIO.decode(encoding)
+
     def isInitialUpdate():
         return CachedLibraries.initialLibraryUpdate
 
@@ -1528,16 +1595,14 @@ class CachedLibraries:
         if library != CachedLibraries.allLibraries:
             if key in CachedLibraries.__cache[library]:
                 binIO = CachedLibraries.__cache[library][key]
-                encoding = CachedLibraries.getEncoding(binIO[:3])
-                return binIO.decode(encoding)
+                return CachedLibraries.decode(binIO)
             else:
                 return None
         else:
             for library in CachedLibraries.__cache:
                 if key in library:
                     binIO = library[key]
-                    encoding = CachedLibraries.getEncoding(binIO[:3])
-                    return binIO.decode(encoding)
+                    return CachedLibraries.decode(binIO)
                 else:
                     return None
 
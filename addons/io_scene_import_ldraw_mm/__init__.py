@@ -39,14 +39,24 @@ bl_info = {
 
 #############################################
 # support reloading sub-modules
+import sys
+
 _modules_loaded = []
+# ldraw_core first since the modules after it import from it
 _modules = [
+    'ldraw_core.text',
+    'ldraw_core.matrix',
+    'ldraw_core.geometry_lines',
+    'ldraw_core.weld',
+    'ldraw_core.edges',
+    'archive_library',
     'base64_handler',
     'blender_camera',
     'blender_import',
     'blender_light',
     'blender_lookat',
     'blender_materials',
+    'compiled_cache',
     'definitions',
     'export_options',
     'filesystem',
@@ -65,6 +75,8 @@ _modules = [
     'ldraw_node',
     'ldraw_object',
     'ldraw_part_types',
+    'library_catalog',
+    'library_index',
     'matrices',
     'pe_texmap',
     'special_bricks',
@@ -92,9 +104,7 @@ else:
 
 # First import the modules
 __import__(name=__name__, fromlist=_modules)
-_namespace = globals()
-_modules_loaded = [_namespace[name] for name in _modules]
-del _namespace
+_modules_loaded = [sys.modules[f"{__name__}.{name}"] for name in _modules]
 # support reloading sub-modules
 #############################################
 
@@ -0,0 +1,104 @@
+import os
+import threading
+import zipfile
+from collections import OrderedDict
+
+from .ldraw_core.text import decode
+
+
+class ArchiveLibrary:
+    """
+    An LDraw library zip that stays open for the life of the process.
+    Members are only decompressed when they are read and the decoded text is kept in a bounded LRU cache.
+    """
+
+    cache_size = 2048
+
+    __libraries = {}
+
+    @classmethod
+    def open(cls, path):
+        """Return the already opened library for path, reopening it only if the zip changed on disk"""
+
+        stat = os.stat(path)
+        signature = (stat.st_mtime_ns, stat.st_size)
+
+        library = cls.__libraries.get(path)
+        if library is not None:
+            if library.signature == signature:
+                return library
+            library.close()
+
+        library = ArchiveLibrary(path, signature)
+        cls.__libraries[path] = library
+        return library
+
+    @classmethod
+    def close_all(cls):
+        for library in cls.__libraries.values():
+            library.close()
+        cls.__libraries.clear()
+
+    @classmethod
+    def stats(cls):
+        hits = sum(library.hits for library in cls.__libraries.values())
+        misses = sum(library.misses for library in cls.__libraries.values())
+        return hits, misses
+
+    def __init__(self, path, signature):
+        self.path = path
+        self.name = os.path.basename(path)
+        self.signature = signature
+        self.hits = 0
+        self.misses = 0
+
+        self.__lock = threading.Lock()
+        self.__texts = OrderedDict()
+        self.__zip = zipfile.ZipFile(path)
+
+        # lowercase member name -> actual member name
+        self.names = {info.filename.lower(): info.filename for info in self.__zip.infolist() if not info.is_dir()}
+
+        self.is_official = "ldraw/ldconfig.ldr" in self.names and "ldraw/p/1-4cyli.dat" in self.names
+        # a password protected member can't be read
+        self.is_encrypted = any(info.flag_bits & 0x1 for info in self.__zip.infolist())
+        self.has_parts = any(key.endswith((".dat", ".ldr", ".mpd")) for key in self.names)
+
+    def __contains__(self, key):
+        return key in self.names
+
+    def size(self, key):
+        name = self.names.get(key)
+        if name is None:
+            return None
+        return self.__zip.getinfo(name).file_size
+
+    def close(self):
+        with self.__lock:
+            self.__texts.clear()
+            self.__zip.close()
+
+    def read(self, key):
+        """Return the decoded text of the member with lowercase name key, or None if it isn't in this library"""
+
+        name = self.names.get(key)
+        if name is None:
+            return None
+
+        with self.__lock:
+            text = self.__texts.get(key)
+            if text is not None:
+                self.__texts.move_to_end(key)
+                self.hits += 1
+                return text
+            self.misses += 1
+
+        # decompressed outside the lock so prefetch threads can read several members at once
+        # ZipFile serializes the reads of the zip itself
+        text = decode(self.__zip.read(name))
+
+        with self.__lock:
+            self.__texts[key] = text
+            if len(self.__texts) > self.cache_size:
+                self.__texts.popitem(last=False)
+        return text
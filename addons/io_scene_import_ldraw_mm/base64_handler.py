@@ -3,16 +3,33 @@ from pathlib import Path
 
 import struct
 import base64
+import hashlib
 
 try:
     from .definitions import APP_ROOT
     from .helpers import get_bytes
+    from .strings import ldraw_image_hash_key
 except ImportError as e:
     print(e)
     import traceback
     print(traceback.format_exc())
     from definitions import APP_ROOT
     from helpers import get_bytes
+    from strings import ldraw_image_hash_key
+
+# name -> (text, start, end) of an embedded image that hasn't been used yet in this import
+# it is only decoded when a texmap or material asks for it by name
+embedded_images = {}
+# name -> blender image of the embedded images that have been decoded in this import
+decoded_images = {}
+# content hash -> name of the blender image it was decoded to, kept across imports
+# so the same png embedded in several models is only packed once
+image_names_by_hash = {}
+
+
+def reset_caches():
+    embedded_images.clear()
+    decoded_images.clear()
 
 
 # http://coreygoldberg.blogspot.com/2013/01/python-verify-png-file-and-get-image.html
@@ -65,6 +82,49 @@ def named_png_from_base64_str(filename, base64_str):
     return image_from_base64_str(filename, base64_str)
 
 
+# text[start:end] is either base64 text or the 0 !: lines of a !DATA block
+def add_embedded_image(name, text, start, end):
+    embedded_images[name] = (text, start, end)
+    decoded_images.pop(name, None)
+
+
+def base64_str_from_span(text, start, end):
+    data = []
+    for line in text[start:end].splitlines():
+        params = line.split()
+        if params[:2] == ["0", "!:"]:
+            params = params[2:]
+        data.extend(params)
+    return "".join(data)
+
+
+def embedded_image(name):
+    """Return the blender image of the embedded image name, decoding it the first time it is asked for.
+    Returns None if no embedded image has that name."""
+
+    image = decoded_images.get(name)
+    if image is not None:
+        return image
+
+    span = embedded_images.get(name)
+    if span is None:
+        return None
+
+    import bpy
+
+    img_data = base64_to_png_data(base64_str_from_span(*span))
+    content_hash = hashlib.sha1(img_data).hexdigest()
+
+    image = bpy.data.images.get(image_names_by_hash.get(content_hash, ""))
+    if image is None or image.get(ldraw_image_hash_key) != content_hash:
+        image = image_from_data(f"{Path(name).stem}.png", img_data)
+        image[ldraw_image_hash_key] = content_hash
+        image_names_by_hash[content_hash] = image.name
+
+    decoded_images[name] = image
+    return image
+
+
 # basename prevents writing to any place but APP_ROOT
 def write_png_data(app_root, filename, data):
     filepath = os.path.join(app_root, f"{os.path.basename(filename)}.png")
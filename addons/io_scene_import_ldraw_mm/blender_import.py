@@ -1,3 +1,5 @@
+import time
+
 import bpy
 import bmesh
 # _*_lp_lc_mod
@@ -17,10 +19,12 @@ from . import blender_camera
 from . import blender_light
 # _*_mod_end
 
+from . import base64_handler
 from . import helpers
 from . import strings
 from . import group
 from . import ldraw_meta
+from . import ldraw_mesh
 from . import ldraw_object
 from . import matrices
 # _*_lp_lc_mod
@@ -42,8 +46,10 @@ def do_import(filepath, color_code="16", return_mesh=False):
     LDrawNode.reset_caches()
     group.reset_caches()
     ldraw_meta.reset_caches()
+    ldraw_mesh.reset_caches()
     ldraw_object.reset_caches()
     matrices.reset_caches()
+    base64_handler.reset_caches()
 
     __scene_setup()
 
@@ -51,6 +57,14 @@ def do_import(filepath, color_code="16", return_mesh=False):
     LDrawFile.read_color_table()
     BlenderMaterials.create_blender_node_groups()
 
+    # _*_lp_lc_mod
+    if ImportOptions.prefetch_workers > 0:
+        start = time.perf_counter()
+        referenced_count, read_count = LDrawFile.prefetch(filepath, ImportOptions.prefetch_workers)
+        elapsed = time.perf_counter() - start
+        helpers.render_print(f"Prefetched {read_count} of {referenced_count} referenced files in {elapsed:.2f}s with {ImportOptions.prefetch_workers} workers")
+    # _*_mod_end
+
     ldraw_file = LDrawFile.get_file(filepath)
     if ldraw_file is None:
         return
@@ -69,6 +83,19 @@ def do_import(filepath, color_code="16", return_mesh=False):
     # return root_node.load()
     obj = root_node.load(color_code=color_code, return_mesh=return_mesh)
 
+    # _*_lp_lc_mod
+    FileSystem.report_missing_files()
+    if FileSystem.have_archive_libraries:
+        hits, misses = FileSystem.archive_stats()
+        helpers.render_print(f"Archive library cache: {hits} hits, {misses} misses")
+    if ImportOptions.share_part_meshes and not return_mesh:
+        mesh_count, saved_count = ldraw_object.mesh_stats()
+        helpers.render_print(f"Shared part meshes: {mesh_count} meshes for {mesh_count + saved_count} part colors, {saved_count} meshes saved")
+    face_count, lookup_count = ldraw_mesh.material_stats()
+    if face_count > 0:
+        helpers.render_print(f"Part materials: {lookup_count} lookups for {face_count} faces, {face_count - lookup_count} get_material calls avoided")
+    # _*_mod_end
+
     # s = {str(k): v for k, v in sorted(LDrawNode.geometry_datas2.items(), key=lambda ele: ele[1], reverse=True)}
     # helpers.write_json("gs2.json", s, indent=4)
 
@@ -6,6 +6,7 @@ import uuid
 from .definitions import APP_ROOT
 from .ldraw_color import LDrawColor
 from .filesystem import FileSystem
+from . import base64_handler
 from . import strings
 
 
@@ -299,7 +300,10 @@ class BlenderMaterials:
 
         # TODO: requests retrieve image from ldraw.org
         # https://blender.stackexchange.com/questions/157531/blender-2-8-python-add-texture-image
-        image = bpy.data.images.get(image_name)
+        # an image embedded in the model with !DATA or PE_TEX_INFO is decoded the first time it is used
+        image = base64_handler.embedded_image(image_name)
+        if image is None:
+            image = bpy.data.images.get(image_name)
         if image is None:
             image_path = FileSystem.locate(image_name)
             if image_path is not None:
@@ -309,8 +313,7 @@ class BlenderMaterials:
                 image.colorspace_settings.name = colorspace
                 image.pack()
 
-        image = bpy.data.images.get(image_name)
-        if image_name is not None:
+        if image is not None:
             node.image = image
 
         return node
@@ -0,0 +1,153 @@
+import hashlib
+import marshal
+import os
+import struct
+import sys
+
+import numpy as np
+
+from . import helpers
+
+
+# the addon directory may be read only and is replaced when the addon is updated, so compiled files are kept per user
+def user_cache_dir():
+    if sys.platform == 'win32':
+        root = os.environ.get('LOCALAPPDATA') or os.path.join(os.path.expanduser('~'), 'AppData', 'Local')
+    elif sys.platform == 'darwin':
+        root = os.path.join(os.path.expanduser('~'), 'Library', 'Caches')
+    else:
+        root = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(root, 'io_scene_import_ldraw_mm', 'compiled')
+
+
+class CompiledCache:
+    """
+    Parsed library files stored on disk so later imports don't have to parse their text again.
+    Each file holds the header fields, the line records and every coordinate as one packed float array.
+    """
+
+    cache_dir = user_cache_dir()
+
+    # bump this whenever LDrawFile parsing changes what it produces
+    parser_version = 2
+
+    enabled = True
+
+    reads = 0
+    writes = 0
+    write_errors = 0
+
+    magic = b"LDRC"
+    # magic, parser version, marshal version, metadata size, float count
+    header_format = "<4sIIII"
+    header_size = struct.calcsize(header_format)
+
+    # mathutils stores vectors and matrices as single precision, so nothing is lost by packing them as float32
+    float_type = np.float32
+
+    # the compiled file for a location is replaced when it changes, instead of adding a new one
+    @staticmethod
+    def __identity(signature):
+        if len(signature) == 3:
+            return signature[0]
+        key, (archive_path, archive_signature) = signature
+        return f"{archive_path}|{key}"
+
+    @classmethod
+    def get_path(cls, signature, options_key):
+        digest = hashlib.sha1(repr((cls.__identity(signature), options_key)).encode('utf-8')).hexdigest()
+        return os.path.join(cls.cache_dir, digest[:2], f"{digest}.ldc")
+
+    @classmethod
+    def read(cls, signature, options_key):
+        """Return (metadata, floats) for signature, or None if it was never compiled or the file changed since"""
+
+        if not cls.enabled or signature is None:
+            return None
+
+        path = cls.get_path(signature, options_key)
+        try:
+            # read into a bytearray so the float array can be a writable view of it instead of another copy
+            with open(path, 'rb') as file:
+                buffer = bytearray(os.fstat(file.fileno()).st_size)
+                if file.readinto(buffer) != len(buffer):
+                    return None
+            return cls.__read_buffer(buffer, signature)
+        except (OSError, ValueError, EOFError, TypeError, struct.error):
+            return None
+
+    @classmethod
+    def __read_buffer(cls, buffer, signature):
+        magic, parser_version, marshal_version, metadata_size, float_count = struct.unpack_from(cls.header_format, buffer)
+        if magic != cls.magic or parser_version != cls.parser_version or marshal_version != marshal.version:
+            return None
+
+        start = cls.header_size
+        end = start + metadata_size
+        stored_signature, metadata = marshal.loads(memoryview(buffer)[start:end])
+        if stored_signature != cls.__marshal_signature(signature):
+            return None
+
+        start = cls.__align(end)
+        floats = np.frombuffer(buffer, dtype=cls.float_type, count=float_count, offset=start)
+        cls.reads += 1
+        return metadata, floats
+
+    @classmethod
+    def write(cls, signature, options_key, metadata, float_parts):
+        """metadata must only hold types marshal can write, float_parts is a list of flat sequences of numbers stored one after another"""
+
+        if not cls.enabled or signature is None:
+            return False
+
+        try:
+            metadata_bytes = marshal.dumps((cls.__marshal_signature(signature), metadata))
+        except ValueError:
+            return False
+
+        float_bytes = b"".join(np.asarray(floats, dtype=cls.float_type).tobytes() for floats in float_parts)
+
+        header = struct.pack(
+            cls.header_format,
+            cls.magic,
+            cls.parser_version,
+            marshal.version,
+            len(metadata_bytes),
+            len(float_bytes) // np.dtype(cls.float_type).itemsize,
+        )
+        padding = b"\0" * (cls.__align(len(header) + len(metadata_bytes)) - len(header) - len(metadata_bytes))
+
+        path = cls.get_path(signature, options_key)
+        # write to a temporary file first so a reader never sees a partly written file
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(temp_path, 'wb') as file:
+                file.write(header)
+                file.write(metadata_bytes)
+                file.write(padding)
+                file.write(float_bytes)
+            os.replace(temp_path, path)
+            cls.writes += 1
+        except OSError as e:
+            # the same error is usually hit by every file, so only the first one is reported
+            if cls.write_errors == 0:
+                helpers.render_print(f"Compiled cache not written to {cls.cache_dir}: {e}", True)
+            cls.write_errors += 1
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            return False
+        return True
+
+    # marshal writes tuples and lists differently, so make sure the stored signature compares equal to a new one
+    @classmethod
+    def __marshal_signature(cls, signature):
+        if isinstance(signature, (tuple, list)):
+            return tuple(cls.__marshal_signature(value) for value in signature)
+        return signature
+
+    @staticmethod
+    def __align(offset):
+        return (offset + 7) & ~7
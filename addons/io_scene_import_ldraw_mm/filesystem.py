@@ -1,6 +1,5 @@
 import os
 import string
-import glob
 from sys import platform
 from pathlib import Path
 # _*_lp_lc_mod
@@ -9,6 +8,10 @@ import zipfile
 # _*_mod_end
 import tempfile
 
+from .archive_library import ArchiveLibrary
+from .library_index import LibraryIndex
+from .ldraw_core.text import get_encoding
+
 def locate_ldraw():
     ldraw_folder_name = 'ldraw'
 
@@ -176,14 +179,22 @@ class FileSystem:
         return FileSystem.resolution_choices[FileSystem.resolution][0]
 
     search_dirs = []
-    lowercase_paths = {}
+    root_dirs = set()
+
+    # only the first missing files are printed as they are found
+    # the rest are only listed in report_missing_files
+    missing_print_limit = 10
+    __missing_files = {}
 
     # _*_lp_lc_mod
     @staticmethod
     def reset_caches():
         FileSystem.search_dirs.clear()
-        FileSystem.lowercase_paths.clear()
+        FileSystem.root_dirs.clear()
+        FileSystem.__missing_files.clear()
+        LibraryIndex.reset_caches()
         FileSystem.clear_archives()
+        FileSystem.unmount_io()
 
     @staticmethod
     def get_basename(filename):
@@ -239,7 +250,7 @@ class FileSystem:
 
         return lgeo_colours
     
-    # Cached dictionary of LDraw archive library objects
+    # Cached LDraw archive library objects
     # **************************************************************************************
 
     # List of archive library file paths
@@ -247,18 +258,17 @@ class FileSystem:
 
     # List of loaded archive library names
     __archive_names       = []
-    
-    # Dictionary list - holds populated archives
-    __archives            = []
 
-    # Library Dictionaries
-    __official_archive    = {}
-    __unofficial_archive  = {}
+    # Library lists - the zip files stay open in ArchiveLibrary across imports
+    # and are only read when a file is requested
+    __official_archives   = []
+    __unofficial_archives = []
 
     archive_not_found     = -2
     all_libraries         = -1
     official_library      = 0
     unofficial_library    = 1
+    io_library            = 2
 
     is_initial_update      = True
     has_official_archive   = False
@@ -275,72 +285,75 @@ class FileSystem:
         FileSystem.has_unofficial_archive = False
         FileSystem.have_archive_libraries = False
         FileSystem.is_initial_update = True
-        FileSystem.__official_archive = {}
-        FileSystem.__unofficial_archive = {}
         del FileSystem.archive_search_paths[:]
         del FileSystem.__archive_names[:]
-        del FileSystem.__archives[:]
-        
+        del FileSystem.__official_archives[:]
+        del FileSystem.__unofficial_archives[:]
+
     @staticmethod
     def get_encoding(bin_io_slice):
-        # The file uses UCS-2 (UTF-16) Big Endian encoding
-        if bin_io_slice == b'\xfe\xff\x00':
-            return "utf_16_be"
-        # The file uses UCS-2 (UTF-16) Little Endian
-        elif bin_io_slice == b'\xff\xfe0':
-            return "utf_16_le"
-        # Use LDraw model standard UTF-8
+        return get_encoding(bin_io_slice)
+
+    # unofficial archives loaded later replace entries of the ones loaded before them
+    @classmethod
+    def __get_libraries(cls, library):
+        if library == cls.io_library:
+            return [cls.__io_archive] if cls.__io_archive is not None else []
+        if library == cls.official_library:
+            return cls.__official_archives
+        elif library == cls.unofficial_library:
+            return cls.__unofficial_archives[::-1]
+        elif cls.prefer_unofficial:
+            return cls.__unofficial_archives[::-1] + cls.__official_archives
         else:
-            return "utf_8"
+            return cls.__official_archives + cls.__unofficial_archives[::-1]
 
     @classmethod
     def archive_file_exists(cls, key):
-        if key in cls.__official_archive:
+        if any(key in library for library in cls.__official_archives):
             return cls.official_library
-        elif key in cls.__unofficial_archive:
+        elif any(key in library for library in cls.__unofficial_archives):
             return cls.unofficial_library
         else:
             return cls.archive_not_found
 
+    @classmethod
+    def archive_keys(cls, library):
+        keys = []
+        for archive in cls.__get_libraries(library):
+            keys.extend(archive.names.keys())
+        return keys
+
     @classmethod
     def get_archive(cls, key, library=all_libraries):
-        if library != cls.all_libraries:
-            if key in cls.__archives[library]:
-                bin_io = cls.__archives[library][key]
-                encoding = cls.get_encoding(bin_io[:3])
-                return bin_io.decode(encoding)
-            else:
-                return None
-        elif cls.prefer_unofficial:
-            library = cls.unofficial_library
-            if key not in cls.__archives[library]:
-                library = cls.official_library
-                if key not in cls.__archives[library]:
-                    return None
-            bin_io = cls.__archives[library][key]
-            encoding = cls.get_encoding(bin_io[:3])
-            return bin_io.decode(encoding)
-        else:
-            for library in cls.__archives:
-                if key in library:
-                    bin_io = library[key]
-                    encoding = cls.get_encoding(bin_io[:3])
-                    return bin_io.decode(encoding)
-                else:
-                    return None
+        for archive in cls.__get_libraries(library):
+            text = archive.read(key)
+            if text is not None:
+                return text
+        return None
+
+    @classmethod
+    def archive_stats(cls):
+        return ArchiveLibrary.stats()
+
+    # the zip an archive key is read from and its state on disk
+    @classmethod
+    def archive_signature(cls, key, library=all_libraries):
+        for archive in cls.__get_libraries(library):
+            if key in archive:
+                return archive.path, archive.signature
+        return None
 
     @classmethod
     def set_official_archive(cls, archive_name, library):
-        cls.__official_archive = {key.lower(): library.read(key) for key in library.namelist()}
-        cls.__archives.append(cls.__official_archive)
+        cls.__official_archives.append(library)
         cls.__archive_names.append(archive_name)
         cls.has_official_archive = True
         helpers.render_print(f"Load official archive library: {archive_name}")
-    
+
     @classmethod
     def set_unofficial_archive(cls, archive_name, library):
-        cls.__unofficial_archive = {key.lower(): library.read(key) for key in library.namelist()}
-        cls.__archives.append(cls.__unofficial_archive)
+        cls.__unofficial_archives.append(library)
         cls.__archive_names.append(archive_name)
         cls.has_unofficial_archive  = True
         cls.is_initial_update = False
@@ -348,37 +361,105 @@ class FileSystem:
 
     @classmethod
     def update_unofficial_archive(cls, archive_name, library):
-        dictionary = {key.lower(): library.read(key) for key in library.namelist()}
-        cls.__unofficial_archive.update(dictionary)
+        cls.__unofficial_archives.append(library)
         cls.__archive_names.append(archive_name)
         helpers.render_print(f"Load unofficial archive library: {archive_name}")
-    
+
     @classmethod
     def archive_library_found(cls, path):
         for library_name in os.listdir(path):
             if (library_name.endswith(".zip") or library_name.endswith(".bin")) and \
                 library_name not in cls.loaded_archives():
                 library_path = os.path.join(path, library_name)
-                with zipfile.ZipFile(library_path) as library:
-                    if not cls.has_official_archive and \
-                        "ldraw/LDConfig.ldr" in library.namelist() and \
-                        "ldraw/p/1-4cyli.dat" in library.namelist():
-                        cls.set_official_archive(library_name, library)
+                try:
+                    library = ArchiveLibrary.open(library_path)
+                except (OSError, zipfile.BadZipFile) as e:
+                    helpers.render_print(f"Invalid archive library {library_name}: {e}", True)
+                    continue
+
+                if not cls.has_official_archive and library.is_official:
+                    cls.set_official_archive(library_name, library)
+                elif library.has_parts:
+                    if cls.is_initial_update:
+                        cls.set_unofficial_archive(library_name, library)
                     else:
-                        try:
-                            is_unofficial_library = \
-                                next(pid for pid in library.namelist()
-                                    if (pid.endswith(".dat") or pid.endswith(".ldr") or pid.endswith(".mpd")))
-                        except StopIteration:
-                            continue
-                        else:
-                            if is_unofficial_library is not None:
-                                if cls.is_initial_update:
-                                    cls.set_unofficial_archive(library_name, library)
-                                else:
-                                    cls.update_unofficial_archive(library_name, library)
+                        cls.update_unofficial_archive(library_name, library)
 
         return FileSystem.has_official_archive or FileSystem.has_unofficial_archive
+
+    # Stud.io .io package overlay
+    # **************************************************************************************
+
+    # the .io being imported, mounted in memory as the highest precedence library
+    # its model.ldr is found by the .io path, and CustomParts are found by name before any other library
+    __io_path    = None
+    __io_archive = None
+    # lowercase name -> member key
+    __io_names   = {}
+
+    io_model_key = "model.ldr"
+
+    @classmethod
+    def __io_search_paths(cls):
+        paths = ["customparts", "customparts/parts"]
+        if cls.resolution_value() == "High":
+            paths.append("customparts/p/48")
+        elif cls.resolution_value() == "Low":
+            paths.append("customparts/p/8")
+        paths.append("customparts/p")
+        paths.append("customparts/s")
+        paths.append("customparts/s/s")
+        return paths
+
+    @classmethod
+    def mount_io(cls, filepath):
+        """Mount the .io zip at filepath so its model and CustomParts are read straight from the zip.
+        The zip stays open in ArchiveLibrary and is only indexed again if it changes on disk."""
+
+        cls.unmount_io()
+        try:
+            library = ArchiveLibrary.open(filepath)
+        except (OSError, zipfile.BadZipFile) as e:
+            helpers.render_print(f"Invalid .io file {filepath}: {e}", True)
+            return False
+
+        if library.is_encrypted:
+            helpers.render_print(f"Password protected .io files are not supported: {filepath}", True)
+            return False
+
+        if cls.io_model_key not in library:
+            helpers.render_print(f".io file has no {cls.io_model_key}: {filepath}", True)
+            return False
+
+        names = {}
+        for search_path in cls.__io_search_paths():
+            prefix = f"{search_path}/"
+            for key in library.names:
+                if key.startswith(prefix):
+                    names.setdefault(key[len(prefix):], key)
+
+        cls.__io_path = os.path.normcase(os.path.abspath(filepath))
+        cls.__io_archive = library
+        cls.__io_names = names
+        helpers.render_print(f"Load .io package: {os.path.basename(filepath)}")
+        return True
+
+    @classmethod
+    def unmount_io(cls):
+        cls.__io_path = None
+        cls.__io_archive = None
+        cls.__io_names = {}
+
+    @classmethod
+    def __locate_io(cls, filename, part_path):
+        if cls.__io_archive is None:
+            return None
+        if part_path.lower().endswith(".io") and os.path.normcase(os.path.abspath(part_path)) == cls.__io_path:
+            return [cls.io_library, cls.io_model_key]
+        key = cls.__io_names.get(LibraryIndex.normalize(filename))
+        if key is not None:
+            return [cls.io_library, key]
+        return None
     # **************************************************************************************
     # _*_mod_end
 
@@ -389,6 +470,9 @@ class FileSystem:
         # _*_lp_lc_mod
         if cls.use_archive_library and not cls.have_archive_libraries:
             cls.have_archive_libraries = FileSystem.archive_library_found(cls.ldraw_path)
+
+        if parent_filepath is not None and parent_filepath.lower().endswith(".io"):
+            cls.mount_io(parent_filepath)
         # _*_mod_end
 
         # append top level file's directory
@@ -512,57 +596,132 @@ class FileSystem:
             path = os.path.join(root, "models")
             cls.append_search_path(path)
 
+        cls.build_library_index()
+
     # build a list of folders to search for parts
-    # build a map of lowercase to actual filenames
     @classmethod
     def append_search_path(cls, path, root=False):
         cls.search_dirs.append(path)
-        if cls.case_sensitive_filesystem:
-            cls.append_lowercase_paths(path, '*')
-            if root:
-                return
-            cls.append_lowercase_paths(path, '**/*')
+        if root:
+            cls.root_dirs.add(path)
 
+    # build a map of lowercase names to actual filenames and archive entries
+    # so that locate is a single lookup instead of checking every search path
     @classmethod
-    def append_lowercase_paths(cls, path, pattern):
-        files = glob.glob(os.path.join(path, pattern))
-        for file in files:
-            cls.lowercase_paths.setdefault(file.lower(), file)
+    def build_library_index(cls):
+        archive_entries = []
+        # _*_lp_lc_mod
+        if cls.have_archive_libraries:
+            archive_entries.append((cls.official_library, cls.archive_keys(cls.official_library)))
+            archive_entries.append((cls.unofficial_library, cls.archive_keys(cls.unofficial_library)))
+        # _*_mod_end
+
+        LibraryIndex.build(
+            cls.search_dirs,
+            cls.root_dirs,
+            archive_search_paths=cls.archive_search_paths,
+            archive_entries=archive_entries,
+        )
 
     @classmethod
-    def locate(cls, filename):
+    def locate(cls, filename, parent_filename=None, count_missing=True):
+        # a file that wasn't found is not searched for again during this import
+        # count_missing is False for lookups that aren't a reference, so they aren't in the missing file report
+        missing_key = LibraryIndex.normalize(filename)
+        missing = cls.__missing_files.get(missing_key)
+        if missing is not None:
+            if count_missing:
+                missing["count"] += 1
+            return None
+
         part_path = str(filename).replace("\\", os.path.sep).replace("/", os.path.sep)
         part_path = os.path.expanduser(part_path)
 
+        # _*_lp_lc_mod
+        location = cls.__locate_io(filename, part_path)
+        if location is not None:
+            return location
+        # _*_mod_end
+
         # full path was specified
         if os.path.isfile(part_path):
             return part_path
 
-        for dir in cls.search_dirs:
-            full_path = os.path.join(dir, part_path)
-            if os.path.isfile(full_path):
-                return full_path
-
-            lc_path = full_path.lower()
-            if lc_path in cls.lowercase_paths:
-                full_path = cls.lowercase_paths.get(lc_path)
+        location = LibraryIndex.get(filename)
+        if location is not None:
+            return location
 
-            if os.path.isfile(full_path):
-                return full_path
+        # root folders only index the files directly inside them
+        # so a name with a folder in it, like parts/3001.dat, is still checked against them
+        if os.path.sep in part_path:
+            for dir in cls.search_dirs:
+                full_path = os.path.join(dir, part_path)
+                if os.path.isfile(full_path):
+                    return full_path
 
-        # _*_lp_lc_mod
-        if cls.have_archive_libraries:
-            for path in cls.archive_search_paths:
-                archive_path = os.path.join(path, filename.lower()).replace("\\", "/")
-                archive_library = cls.archive_file_exists(archive_path)
-                
-                if archive_library != cls.archive_not_found:
-                    result_list = list([archive_library, archive_path])
-                    return result_list
-        # _*_mod_end
-        
         # TODO: requests retrieve missing items from ldraw.org
         # _*_lp_lc_mod
-        helpers.render_print(f"missing {filename}", True)
+        if not count_missing:
+            return None
+
+        cls.__missing_files[missing_key] = {
+            "filename": str(filename),
+            "count": 1,
+            "parent_filename": parent_filename,
+        }
+        if len(cls.__missing_files) <= cls.missing_print_limit:
+            helpers.render_print(f"missing {filename}", True)
+        elif len(cls.__missing_files) == cls.missing_print_limit + 1:
+            helpers.render_print(f"more than {cls.missing_print_limit} files are missing, see the missing file report", True)
         # _*_mod_end
         return None
+
+    # identifies the contents of a location returned by locate
+    # if the signature of a location changes, its file needs to be read again
+    @classmethod
+    def location_signature(cls, location):
+        if location is None:
+            return None
+
+        if isinstance(location, list):
+            return (location[1], cls.archive_signature(location[1], library=location[0]))
+
+        try:
+            stat = os.stat(location)
+        except OSError:
+            return None
+        return (location, stat.st_mtime_ns, stat.st_size)
+
+    @classmethod
+    def location_size(cls, location):
+        if location is None:
+            return None
+
+        if isinstance(location, list):
+            for archive in cls.__get_libraries(location[0]):
+                size = archive.size(location[1])
+                if size is not None:
+                    return size
+            return None
+
+        try:
+            return os.path.getsize(location)
+        except OSError:
+            return None
+
+    @classmethod
+    def file_signature(cls, filename):
+        return cls.location_signature(cls.locate(filename))
+
+    # _*_lp_lc_mod
+    @classmethod
+    def report_missing_files(cls):
+        if not cls.__missing_files:
+            return
+
+        missing_files = sorted(cls.__missing_files.values(), key=lambda m: m["count"], reverse=True)
+        helpers.render_print(f"Missing files: {len(missing_files)}", True)
+        for missing in missing_files:
+            parent_filename = missing["parent_filename"] or "-"
+            helpers.render_print(f"  {missing['filename']}: {missing['count']} reference(s), first referenced by {parent_filename}", True)
+    # _*_mod_end
@@ -1,52 +1,37 @@
+import numpy as np
+
+from .ldraw_core.matrix import transform as transform_vertices
+
+
 class FaceData:
     """
-    Raw vertex information
+    The vertex order of faces, for the winding and for bowtie quadrilaterals.
     """
 
-    def __init__(self, vertices, color_code, texmap=None, pe_texmap=None):
-        self.vertices = vertices
-        self.color_code = color_code
-        self.texmap = texmap
-        self.pe_texmap = pe_texmap
-
     # https://github.com/rredford/LdrawToObj/blob/802924fb8d42145c4f07c10824e3a7f2292a6717/LdrawData/LdrawToData.cs#L219
     # https://github.com/rredford/LdrawToObj/blob/802924fb8d42145c4f07c10824e3a7f2292a6717/LdrawData/LdrawToData.cs#L260
     @staticmethod
-    def handle_vertex_winding(child_node, matrix, winding):
-        vert_count = len(child_node.vertices)
-
-        # matrix = matrix @ matrices.gap_scale_matrix
+    def handle_vertex_winding(vertices, winding):
+        vert_count = len(vertices)
 
-        vertices = []
+        # vertices are already transformed, see LDrawFile.geometry
         if winding == "CW":
             if vert_count == 3:
                 vertices = [
-                    matrix @ child_node.vertices[0],
-                    matrix @ child_node.vertices[2],
-                    matrix @ child_node.vertices[1],
+                    vertices[0],
+                    vertices[2],
+                    vertices[1],
                 ]
             elif vert_count == 4:
                 vertices = [
-                    matrix @ child_node.vertices[0],
-                    matrix @ child_node.vertices[3],
-                    matrix @ child_node.vertices[2],
-                    matrix @ child_node.vertices[1],
+                    vertices[0],
+                    vertices[3],
+                    vertices[2],
+                    vertices[1],
                 ]
                 FaceData.__fix_bowties(vertices)
         else:  # winding == "CCW" or winding is None:
-            if vert_count == 3:
-                vertices = [
-                    matrix @ child_node.vertices[0],
-                    matrix @ child_node.vertices[1],
-                    matrix @ child_node.vertices[2],
-                ]
-            elif vert_count == 4:
-                vertices = [
-                    matrix @ child_node.vertices[0],
-                    matrix @ child_node.vertices[1],
-                    matrix @ child_node.vertices[2],
-                    matrix @ child_node.vertices[3],
-                ]
+            if vert_count == 4:
                 FaceData.__fix_bowties(vertices)
 
         return vertices
@@ -63,36 +48,318 @@ class FaceData:
         elif nB.dot(nC) < 0:
             vertices[2], vertices[1] = vertices[1], vertices[2]
 
+    # the CW order of a triangle and a quad, faces given as arrays are padded to 4 vertices
+    cw_orders = np.array((
+        (0, 2, 1, 3),
+        (0, 3, 2, 1),
+    ))
+
+    # handle_vertex_winding for an (N, 4, 3) array of faces, is_quad tells which faces have 4 vertices
+    @staticmethod
+    def wind_faces(vertices, is_quad, winding):
+        if winding == "CW":
+            order = FaceData.cw_orders[is_quad.astype(np.intp)]
+            vertices = np.take_along_axis(vertices, order[:, :, np.newaxis], axis=1)
+        return vertices
+
+    # __fix_bowties for every quad of an (N, 4, 3) array of faces, in place
+    @staticmethod
+    def fix_bowties(vertices, is_quad):
+        if not is_quad.any():
+            return
+        quads = vertices[is_quad]
+        v0, v1, v2, v3 = quads[:, 0], quads[:, 1], quads[:, 2], quads[:, 3]
+        nA = FaceData.__cross(v1 - v0, v2 - v0)
+        nB = FaceData.__cross(v2 - v1, v3 - v1)
+        nC = FaceData.__cross(v3 - v2, v0 - v2)
+        swap_23 = FaceData.__dot(nA, nB) < 0
+        swap_12 = ~swap_23 & (FaceData.__dot(nB, nC) < 0)
+        if swap_23.any() or swap_12.any():
+            quads[swap_23] = quads[swap_23][:, [0, 1, 3, 2]]
+            quads[swap_12] = quads[swap_12][:, [0, 2, 1, 3]]
+            vertices[is_quad] = quads
+
+    # np.cross and np.einsum cost more to set up than to run on the few faces of a primitive
+    @staticmethod
+    def __cross(a, b):
+        return (
+            a[:, 1] * b[:, 2] - a[:, 2] * b[:, 1],
+            a[:, 2] * b[:, 0] - a[:, 0] * b[:, 2],
+            a[:, 0] * b[:, 1] - a[:, 1] * b[:, 0],
+        )
+
+    @staticmethod
+    def __dot(a, b):
+        return a[0] * b[0] + a[1] * b[1] + a[2] * b[2]
+
+
+class ArrayBuffer:
+    """
+    A NumPy array that rows are appended to, its capacity is doubled when it is full.
+    """
+
+    __slots__ = (
+        "data",
+        "size",
+    )
+
+    def __init__(self, row_shape, dtype, capacity=16):
+        self.data = np.empty((capacity, *row_shape), dtype=dtype)
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    # the rows appended so far, a view that is only valid until the next append
+    @property
+    def array(self):
+        return self.data[:self.size]
+
+    def append(self, row):
+        self.__reserve(self.size + 1)
+        self.data[self.size] = row
+        self.size += 1
+
+    def extend(self, rows):
+        end = self.size + len(rows)
+        self.__reserve(end)
+        self.data[self.size:end] = rows
+        self.size = end
+
+    def __reserve(self, size):
+        if size <= len(self.data):
+            return
+        data = np.empty((max(size, len(self.data) * 2), *self.data.shape[1:]), dtype=self.data.dtype)
+        data[:self.size] = self.data[:self.size]
+        self.data = data
+
 
 class GeometryData:
     """
     Raw mesh data used to build the final mesh.
+    Faces are one flat vertex buffer with the start and size of each face, since triangles and quads are mixed.
+    Color codes, texmaps and pe_texmaps are stored per face as indices into the lists of the ones this part uses.
     """
 
+    __slots__ = (
+        "key",
+        "file",
+        "bfc_certified",
+        "face_vertices",
+        "face_starts",
+        "face_sizes",
+        "face_colors",
+        "face_texmaps",
+        "face_pe_texmaps",
+        "edge_vertices",
+        "edge_colors",
+        "line_vertices",
+        "line_colors",
+        "color_codes",
+        "texmaps",
+        "pe_texmaps",
+        "color_indices",
+        "texmap_indices",
+    )
+
+    # the blender mesh stores its vertices as 32 bit floats
+    float_type = np.float32
+
     def __init__(self):
         self.key = None
         self.file = None
         self.bfc_certified = None
-        self.edge_data = []
-        self.face_data = []
-        self.line_data = []
+
+        self.face_vertices = ArrayBuffer((3,), self.float_type, capacity=64)
+        self.face_starts = ArrayBuffer((), np.int32)
+        self.face_sizes = ArrayBuffer((), np.uint8)
+        self.face_colors = ArrayBuffer((), np.int32)
+        self.face_texmaps = ArrayBuffer((), np.int32)
+        self.face_pe_texmaps = ArrayBuffer((), np.int32)
+
+        # type 2 lines are (N, 2, 3), type 5 lines are (N, 4, 3)
+        self.edge_vertices = ArrayBuffer((2, 3), self.float_type)
+        self.edge_colors = ArrayBuffer((), np.int32)
+        self.line_vertices = ArrayBuffer((4, 3), self.float_type)
+        self.line_colors = ArrayBuffer((), np.int32)
+
+        # index 0 of texmaps and pe_texmaps is a face without one
+        self.color_codes = []
+        self.texmaps = [None]
+        self.pe_texmaps = [None]
+
+        # color_code -> index in color_codes, id(texmap) -> index in texmaps
+        self.color_indices = {}
+        self.texmap_indices = {}
+
+    @property
+    def face_count(self):
+        return len(self.face_sizes)
+
+    def color_index(self, color_code):
+        index = self.color_indices.get(color_code)
+        if index is None:
+            index = len(self.color_codes)
+            self.color_codes.append(color_code)
+            self.color_indices[color_code] = index
+        return index
+
+    def __color_index_array(self, color_codes):
+        unique_color_codes, inverse = np.unique(color_codes, return_inverse=True)
+        indices = np.array([self.color_index(color_code) for color_code in unique_color_codes.tolist()], dtype=np.int32)
+        return indices[inverse.reshape(-1)]
+
+    def __texmap_index(self, texmap):
+        if texmap is None:
+            return 0
+        index = self.texmap_indices.get(id(texmap))
+        if index is None:
+            index = len(self.texmaps)
+            self.texmaps.append(texmap)
+            self.texmap_indices[id(texmap)] = index
+        return index
+
+    # every pe_texmap belongs to a single face
+    def __pe_texmap_index(self, pe_texmap):
+        if pe_texmap is None:
+            return 0
+        self.pe_texmaps.append(pe_texmap)
+        return len(self.pe_texmaps) - 1
 
     def add_edge_data(self, vertices, color_code):
-        self.edge_data.append(FaceData(
-            vertices=vertices,
-            color_code=color_code,
-        ))
+        self.edge_vertices.append(vertices)
+        self.edge_colors.append(self.color_index(color_code))
 
     def add_face_data(self, vertices, color_code, texmap=None, pe_texmap=None):
-        self.face_data.append(FaceData(
-            vertices=vertices,
-            color_code=color_code,
-            texmap=texmap,
-            pe_texmap=pe_texmap,
-        ))
+        self.face_starts.append(len(self.face_vertices))
+        self.face_sizes.append(len(vertices))
+        self.face_vertices.extend(vertices)
+        self.face_colors.append(self.color_index(color_code))
+        self.face_texmaps.append(self.__texmap_index(texmap))
+        self.face_pe_texmaps.append(self.__pe_texmap_index(pe_texmap))
 
     def add_line_data(self, vertices, color_code):
-        self.line_data.append(FaceData(
-            vertices=vertices,
-            color_code=color_code,
-        ))
+        self.line_vertices.append(vertices)
+        self.line_colors.append(self.color_index(color_code))
+
+    # the add_*_data methods for a whole run of lines at once
+    # vertices are arrays that are already transformed, faces are (N, 4, 3) with the 4th vertex of a triangle ignored
+    def add_faces(self, vertices, is_quad, color_codes, winding, texmap=None):
+        vertices = FaceData.wind_faces(vertices, is_quad, winding)
+        FaceData.fix_bowties(vertices, is_quad)
+
+        sizes = np.where(is_quad, 4, 3)
+        used = np.ones((len(is_quad), 4), dtype=bool)
+        used[:, 3] = is_quad
+
+        self.face_starts.extend(len(self.face_vertices) + np.cumsum(sizes) - sizes)
+        self.face_sizes.extend(sizes)
+        self.face_vertices.extend(vertices[used])
+        self.face_colors.extend(self.__color_index_array(color_codes))
+        self.face_texmaps.extend(np.full(len(is_quad), self.__texmap_index(texmap), dtype=np.int32))
+        self.face_pe_texmaps.extend(np.zeros(len(is_quad), dtype=np.int32))
+
+    def add_edges(self, vertices, color_codes):
+        self.edge_vertices.extend(vertices)
+        self.edge_colors.extend(self.__color_index_array(color_codes))
+
+    def add_lines(self, vertices, color_codes):
+        self.line_vertices.extend(vertices)
+        self.line_colors.extend(self.__color_index_array(color_codes))
+
+
+class BakedGeometry:
+    """
+    The faces, edges and lines of a subfile and everything it references, in the subfile's own space.
+    A subfile is baked once for each BFC state that decides its winding, see LDrawNode.load,
+    then every reference adds it to its part with one matrix multiply.
+    Color code 16 is left unresolved so every color the subfile is used in shares the bake.
+    """
+
+    __slots__ = (
+        "faces",
+        "is_quad",
+        "face_color_codes",
+        "edges",
+        "edge_color_codes",
+        "lines",
+        "line_color_codes",
+    )
+
+    def __init__(self):
+        # lists of arrays while the subfile is baked, single arrays after finish
+        self.faces = []
+        self.is_quad = []
+        self.face_color_codes = []
+        self.edges = []
+        self.edge_color_codes = []
+        self.lines = []
+        self.line_color_codes = []
+
+    # the winding is applied as it's baked since it is just an order of the vertices
+    # bowties depend on where the vertices end up, so they are fixed when the faces are added to a part
+    # texmap is always None, subfiles with texmaps aren't baked
+    def add_faces(self, vertices, is_quad, color_codes, winding, texmap=None):
+        self.faces.append(FaceData.wind_faces(vertices, is_quad, winding))
+        self.is_quad.append(is_quad)
+        self.face_color_codes.append(color_codes)
+
+    def add_edges(self, vertices, color_codes):
+        self.edges.append(vertices)
+        self.edge_color_codes.append(color_codes)
+
+    def add_lines(self, vertices, color_codes):
+        self.lines.append(vertices)
+        self.line_color_codes.append(color_codes)
+
+    def finish(self):
+        self.faces = BakedGeometry.__concatenate(self.faces, (0, 4, 3), np.float64)
+        self.is_quad = BakedGeometry.__concatenate(self.is_quad, (0,), bool)
+        self.face_color_codes = BakedGeometry.__concatenate(self.face_color_codes, (0,), str)
+        self.edges = BakedGeometry.__concatenate(self.edges, (0, 2, 3), np.float64)
+        self.edge_color_codes = BakedGeometry.__concatenate(self.edge_color_codes, (0,), str)
+        self.lines = BakedGeometry.__concatenate(self.lines, (0, 4, 3), np.float64)
+        self.line_color_codes = BakedGeometry.__concatenate(self.line_color_codes, (0,), str)
+
+    @staticmethod
+    def __concatenate(arrays, empty_shape, dtype):
+        if len(arrays) < 1:
+            return np.empty(empty_shape, dtype=dtype)
+        if len(arrays) == 1:
+            return arrays[0]
+        return np.concatenate(arrays)
+
+    # geometry_data is a GeometryData or the BakedGeometry of the subfile this one is referenced by
+    def add_to(self, geometry_data, matrix, color_code):
+        face_count = len(self.faces) * 4
+        edge_count = len(self.edges) * 2
+
+        vertices = transform_vertices(np.concatenate((
+            self.faces.reshape((-1, 3)),
+            self.edges.reshape((-1, 3)),
+            self.lines.reshape((-1, 3)),
+        )), matrix)
+
+        if len(self.faces) > 0:
+            geometry_data.add_faces(
+                vertices[:face_count].reshape((-1, 4, 3)),
+                self.is_quad,
+                BakedGeometry.__resolve_color_codes(self.face_color_codes, color_code),
+                None,
+            )
+        if len(self.edges) > 0:
+            geometry_data.add_edges(
+                vertices[face_count:face_count + edge_count].reshape((-1, 2, 3)),
+                BakedGeometry.__resolve_color_codes(self.edge_color_codes, color_code),
+            )
+        if len(self.lines) > 0:
+            geometry_data.add_lines(
+                vertices[face_count + edge_count:].reshape((-1, 4, 3)),
+                BakedGeometry.__resolve_color_codes(self.line_color_codes, color_code),
+            )
+
+    @staticmethod
+    def __resolve_color_codes(color_codes, color_code):
+        if color_code == "16":
+            return color_codes
+        return np.where(color_codes == "16", color_code, color_codes)
@@ -76,6 +76,16 @@ class ImportOptions:
     defaults["no_studs"] = False
     no_studs = defaults["no_studs"]
 
+    # threads that read and parse the files a model references before it is loaded, 0 reads each file when it is first referenced
+    # LDrawFile.get_file still links each file to its subfiles one at a time, and an mpd is only read on the threads
+    defaults["prefetch_workers"] = 8
+    prefetch_workers = defaults["prefetch_workers"]
+
+    # build one mesh for every part instead of one for every color it is used in
+    # its color 16 faces get their material from the object
+    defaults["share_part_meshes"] = False
+    share_part_meshes = defaults["share_part_meshes"]
+
     defaults["set_end_frame"] = True
     set_end_frame = defaults["set_end_frame"]
 
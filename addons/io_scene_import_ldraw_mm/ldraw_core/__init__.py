@@ -0,0 +1,16 @@
+"""
+The parts of LDraw parsing that need neither bpy nor mathutils, shared by the LDraw importers.
+
+Everything here only depends on the standard library and NumPy and only uses relative imports,
+so it can also be imported in a plain Python process, for benchmarks or worker processes,
+by adding the io_scene_import_ldraw_mm folder to sys.path and importing ldraw_core.
+
+io_scene_import_ldraw only uses text, for encoding detection and decoding.
+It imports it as io_scene_import_ldraw_mm.ldraw_core.text, and falls back to its own decoding if io_scene_import_ldraw_mm isn't installed.
+
+text            - encoding detection, line cleaning and mpd section indexing
+matrix          - type 1 line parsing into NumPy matrices
+geometry_lines  - type 2-5 lines decoded in bulk into NumPy arrays
+weld            - merging the vertices of a mesh that are within a distance of each other
+edges           - finding the edges of a mesh that type 2 lines run along
+"""
@@ -0,0 +1,48 @@
+import numpy as np
+
+from .weld import points_near
+
+
+def edge_keys(edges, vertex_count):
+    """One int64 for each edge of an array of vertex index pairs, the same whichever way round the edge is"""
+
+    edges = np.asarray(edges, dtype=np.int64).reshape((-1, 2))
+    return edges.min(axis=1) * vertex_count + edges.max(axis=1)
+
+
+def sharp_edge_keys(vertices, lines, distance):
+    """The sorted keys of the vertex pairs of a mesh that type 2 lines run along, see edge_keys.
+    Each end of a line matches every vertex within distance of it and every vertex
+    matched by one end of a line is paired with every vertex matched by the other end.
+    lines is an array of line vertices with a shape of (N, 2, 3)."""
+
+    lines = np.asarray(lines).reshape((-1, 2, 3))
+    line_count = len(lines)
+    query, point = points_near(vertices, lines.reshape((-1, 3)), distance)
+
+    counts = np.bincount(query, minlength=line_count * 2)
+    starts = np.cumsum(counts) - counts
+    counts_0, counts_1 = counts[0::2], counts[1::2]
+    starts_0, starts_1 = starts[0::2], starts[1::2]
+
+    pair_counts = counts_0 * counts_1
+    total = int(pair_counts.sum())
+    pair_line = np.repeat(np.arange(line_count), pair_counts)
+    pair_index = np.arange(total) - np.repeat(np.cumsum(pair_counts) - pair_counts, pair_counts)
+    pair_count_1 = counts_1[pair_line]
+    vertex_0 = point[starts_0[pair_line] + pair_index // pair_count_1]
+    vertex_1 = point[starts_1[pair_line] + pair_index % pair_count_1]
+
+    return np.unique(edge_keys(np.stack((vertex_0, vertex_1), axis=1), len(vertices)))
+
+
+def sharp_edge_mask(keys, edges, vertex_count):
+    """Which edges of an array of vertex index pairs have one of the sorted keys"""
+
+    edges = np.asarray(edges).reshape((-1, 2))
+    if len(keys) == 0:
+        return np.zeros(len(edges), dtype=bool)
+
+    keys_of_edges = edge_keys(edges, vertex_count)
+    found = np.minimum(np.searchsorted(keys, keys_of_edges), len(keys) - 1)
+    return keys[found] == keys_of_edges
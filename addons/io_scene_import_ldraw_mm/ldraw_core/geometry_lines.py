@@ -0,0 +1,126 @@
+import numpy as np
+
+from .matrix import transform as transform_vertices
+
+
+class GeometryLines:
+    """
+    The type 2, 3, 4 and 5 lines of a file, decoded in bulk into one float array per line type.
+    Each line type keeps its lines in file order, with a parallel array of their color codes.
+    """
+
+    # line type -> vertices attribute, colors attribute, vertex count
+    line_types = {
+        "2": ("edges", "edge_colors", 2),
+        "3": ("triangles", "triangle_colors", 3),
+        "4": ("quads", "quad_colors", 4),
+        "5": ("conditional_lines", "conditional_line_colors", 4),
+    }
+
+    float_type = np.float32
+
+    def __init__(self):
+        # (N, 2, 3), (N, 3, 3), (N, 4, 3) and (N, 4, 3) arrays of vertices
+        self.edges = None
+        self.triangles = None
+        self.quads = None
+        self.conditional_lines = None
+
+        # color codes, parallel to the vertex arrays
+        self.edge_colors = None
+        self.triangle_colors = None
+        self.quad_colors = None
+        self.conditional_line_colors = None
+
+        # (line type, index) -> clean_line for lines with more parameters than their vertices
+        # such as the uvs of a Stud.io PE_TEX line
+        self.extended_lines = {}
+        # (line type, index) of lines whose coordinates aren't numbers, they are skipped
+        self.invalid_lines = set()
+
+        self.__tokens = {line_type: [] for line_type in self.line_types}
+        self.__colors = {line_type: [] for line_type in self.line_types}
+
+    # the vertex and color arrays of a line type
+    def get(self, line_type):
+        vertices_name, colors_name, vert_count = self.line_types[line_type]
+        return getattr(self, vertices_name), getattr(self, colors_name)
+
+    def count(self, line_type):
+        if self.__colors is not None:
+            return len(self.__colors[line_type])
+        vertices, colors = self.get(line_type)
+        return len(colors)
+
+    # the coordinates are only collected as text here, they are all converted at once by finalize
+    # returns the index of the line within its line type
+    def add(self, line_type, clean_line, _params):
+        vert_count = self.line_types[line_type][2]
+        end = vert_count * 3 + 2
+        if len(_params) < end:
+            raise IndexError(f"{clean_line} needs {vert_count * 3} coordinates")
+
+        colors = self.__colors[line_type]
+        index = len(colors)
+        colors.append(_params[1])
+        self.__tokens[line_type].extend(_params[2:end])
+        if len(_params) > end:
+            self.extended_lines[(line_type, index)] = clean_line
+        return index
+
+    def finalize(self):
+        for line_type in self.line_types:
+            tokens = self.__tokens[line_type]
+            try:
+                vertices = np.array(tokens, dtype=np.float64)
+            except ValueError:
+                vertices = self.__convert_lines(line_type, tokens)
+            self.set(line_type, vertices, self.__colors[line_type])
+        self.__tokens = None
+        self.__colors = None
+
+    # only used when a line has a coordinate that isn't a number, so the rest of the lines are still used
+    def __convert_lines(self, line_type, tokens):
+        size = self.line_types[line_type][2] * 3
+        vertices = np.empty(len(tokens), dtype=np.float64)
+        for start in range(0, len(tokens), size):
+            try:
+                vertices[start:start + size] = [float(token) for token in tokens[start:start + size]]
+            except ValueError as e:
+                print(e)
+                vertices[start:start + size] = 0
+                self.invalid_lines.add((line_type, start // size))
+        return vertices
+
+    def set(self, line_type, vertices, colors):
+        vertices_name, colors_name, vert_count = self.line_types[line_type]
+        setattr(self, vertices_name, np.asarray(vertices, dtype=self.float_type).reshape((-1, vert_count, 3)))
+        setattr(self, colors_name, np.array(colors, dtype=str))
+
+    # transform count lines of line_type, starting at start, by a 4x4 matrix
+    # returns a nested list of [line][vertex][x, y, z]
+    def transform(self, line_type, start, count, matrix):
+        vertices, colors = self.get(line_type)
+        return transform_vertices(vertices[start:start + count], matrix).tolist()
+
+    # what is written to CompiledCache - metadata marshal can write and the vertex arrays
+    def to_compiled(self):
+        colors = {line_type: self.get(line_type)[1].tolist() for line_type in self.line_types}
+        float_parts = [self.get(line_type)[0].ravel() for line_type in self.line_types]
+        return (colors, self.extended_lines, self.invalid_lines), float_parts
+
+    @classmethod
+    def from_compiled(cls, metadata, floats):
+        colors, extended_lines, invalid_lines = metadata
+
+        geometry = GeometryLines()
+        offset = 0
+        for line_type, (vertices_name, colors_name, vert_count) in cls.line_types.items():
+            size = len(colors[line_type]) * vert_count * 3
+            geometry.set(line_type, floats[offset:offset + size], colors[line_type])
+            offset += size
+        geometry.extended_lines = extended_lines
+        geometry.invalid_lines = invalid_lines
+        geometry.__tokens = None
+        geometry.__colors = None
+        return geometry
@@ -0,0 +1,34 @@
+import numpy as np
+
+float_type = np.float64
+
+identity = np.identity(4, dtype=float_type)
+identity.flags.writeable = False
+
+
+def subfile_params(clean_line, strip_line):
+    """Return the color code, the 12 numbers x y z a b c d e f g h i and the filename of a type 1 line.
+    The filename is taken from strip_line so it keeps its case and any extra spaces."""
+
+    _params = clean_line.split(maxsplit=14)
+    _sparams = strip_line.split(maxsplit=14)
+    return _params[1], tuple(map(float, _params[2:14])), _sparams[14]
+
+
+def subfile_matrix(values):
+    """The 4x4 matrix of the 12 numbers of a type 1 line"""
+
+    (x, y, z, a, b, c, d, e, f, g, h, i) = values
+    return np.array((
+        (a, b, c, x),
+        (d, e, f, y),
+        (g, h, i, z),
+        (0, 0, 0, 1)
+    ), dtype=float_type)
+
+
+def transform(vertices, matrix):
+    """Transform an array of points with a last dimension of 3 by a 4x4 matrix"""
+
+    matrix = np.asarray(matrix, dtype=float_type)
+    return np.asarray(vertices, dtype=float_type) @ matrix[:3, :3].T + matrix[:3, 3]
@@ -0,0 +1,148 @@
+import re
+
+# the prefix of the lines of a !DATA block and of texmap fallback geometry
+texmap_prefix = "0 !: "
+
+# the lines that start, end or interrupt an mpd section
+mpd_line_pattern = re.compile(r"^[ \t]*0[ \t]+(FILE[ \t]+\S|NOFILE|!DATA[ \t]+\S)[^\n]*", re.MULTILINE)
+not_blank_pattern = re.compile(r"\S")
+
+
+def get_encoding(bin_io_slice):
+    # The file uses UCS-2 (UTF-16) Big Endian encoding
+    if bin_io_slice == b'\xfe\xff\x00':
+        return "utf_16_be"
+    # The file uses UCS-2 (UTF-16) Little Endian
+    elif bin_io_slice == b'\xff\xfe0':
+        return "utf_16_le"
+    # UTF-8 with a byte order mark, Stud.io writes model.ldr this way
+    elif bin_io_slice == b'\xef\xbb\xbf':
+        return "utf_8_sig"
+    # Use LDraw model standard UTF-8
+    else:
+        return "utf_8"
+
+
+def decode(bin_io):
+    """Decode the bytes of an LDraw file, with every line ending changed to \\n"""
+
+    try:
+        text = bin_io.decode(get_encoding(bin_io[:3]))
+    except UnicodeDecodeError:
+        # If all else fails, read using Latin 1 encoding
+        text = bin_io.decode("latin_1")
+
+    if "\r" in text:
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+    return text
+
+
+def read_text(filepath):
+    with open(filepath, "rb") as file:
+        return decode(file.read())
+
+
+def clean_line(line):
+    return " ".join(line.split())
+
+
+def first_line(text):
+    """The first line of text that isn't blank, cleaned"""
+
+    match = not_blank_pattern.search(text)
+    if match is None:
+        return ""
+    end = text.find("\n", match.start())
+    return clean_line(text[match.start():end if end != -1 else len(text)])
+
+
+# if the first non-blank line is 0 FILE or 0 !DATA, this is an mpd
+def is_mpd(text):
+    line = first_line(text)
+    return line.startswith("0 FILE ") or line.startswith("0 !DATA ")
+
+
+def index_mpd(text):
+    """Find the sections and data blocks of an mpd with a single pass over the 0 FILE, 0 NOFILE and 0 !DATA lines.
+
+    Returns (first_filename, sections, data_blocks)
+    sections is a list of (lowercase filename, start, end) offsets into text, after the 0 FILE line and up to the line that ends it
+    data_blocks is a list of (name, start) where start is the offset of the line after 0 !DATA, see data_block_end
+    a data block doesn't end the section it is in, the lines after it are still part of that section
+    """
+
+    first_filename = None
+    sections = []
+    data_blocks = []
+
+    filename = None
+    section_start = None
+    for match in mpd_line_pattern.finditer(text):
+        keyword = match.group(1)
+
+        if keyword.startswith("!DATA"):
+            data_blocks.append((match.group(0).split(maxsplit=2)[2], match.end() + 1))
+            continue
+
+        if filename is not None:
+            sections.append((filename, section_start, match.start()))
+            filename = None
+
+        if keyword.startswith("FILE"):
+            filename = match.group(0).split(maxsplit=2)[2].lower()
+            section_start = match.end()
+            if first_filename is None:
+                first_filename = filename
+
+    # last file in mpd doesn't have to end in 0 NOFILE
+    if filename is not None:
+        sections.append((filename, section_start, len(text)))
+
+    return first_filename, sections, data_blocks
+
+
+def section_lines(lines, is_mpd, meta_texmap):
+    """Yield (line, clean_line, strip_line) for each line of a file, or of an mpd section, that is parsed.
+    Blank lines are left out, and so are the 0 !DATA lines of an mpd section and, with meta_texmap, the lines of their data blocks
+    since index_mpd already found those. With meta_texmap the texmap prefix is removed from the lines that have it.
+    """
+
+    in_data = False
+    for line in lines:
+        _clean_line = clean_line(line)
+        if _clean_line == "":
+            continue
+
+        if in_data:
+            if not _clean_line.startswith(texmap_prefix):
+                in_data = False
+            elif meta_texmap:
+                continue
+
+        if is_mpd and _clean_line.startswith("0 !DATA "):
+            in_data = True
+            continue
+
+        # clean up texmap geometry line prefixes
+        if meta_texmap and texmap_prefix in line:
+            line = line.replace(texmap_prefix, "")
+            _clean_line = clean_line(line)
+
+        yield line, _clean_line, line.strip()
+
+
+def data_block_end(text, start):
+    """The offset where the 0 !: lines of a data block that starts at start end"""
+
+    end = start
+    position = start
+    while position < len(text):
+        line_end = text.find("\n", position)
+        if line_end == -1:
+            line_end = len(text)
+        line = clean_line(text[position:line_end])
+        if line != "" and not line.startswith(texmap_prefix):
+            break
+        position = line_end + 1
+        end = min(position, len(text))
+    return end
@@ -0,0 +1,177 @@
+import numpy as np
+
+# the most cells along one axis, so the key of a cell always fits in an int64
+max_cells = 2 ** 20
+
+# a cell and its 26 neighbors
+neighbor_offsets = np.array([(x, y, z) for x in (-1, 0, 1) for y in (-1, 0, 1) for z in (-1, 0, 1)], dtype=np.int64)
+
+
+def weld_vertices(vertices, distance):
+    """Merge every vertex into the first vertex that is within distance of it, like bmesh.ops.remove_doubles.
+    Vertices are hashed into a grid of cells at least distance wide, so only the vertices in neighboring cells are compared.
+    Returns the welded vertices, in the order their first vertex had, and the index of the welded vertex of every vertex."""
+
+    vertices = np.asarray(vertices)
+    count = len(vertices)
+    if count == 0:
+        return vertices.copy(), np.zeros(0, dtype=np.int32)
+
+    if distance <= 0:
+        _, first, index = np.unique(vertices, axis=0, return_index=True, return_inverse=True)
+        return __in_vertex_order(vertices, first, index.reshape(-1))
+
+    points = vertices.astype(np.float64)
+    low = points.min(axis=0)
+    extent = float((points.max(axis=0) - low).max())
+    cell_size = max(float(distance), extent / max_cells)
+
+    # one empty cell on either side so the neighbor of every cell has a key
+    cells = np.floor((points - low) / cell_size).astype(np.int64) + 1
+    dims = cells.max(axis=0) + 2
+    strides = np.array((dims[1] * dims[2], dims[2], 1), dtype=np.int64)
+    keys = cells @ strides
+
+    # the vertices sorted by cell, cell_starts and cell_ends are the range of each cell in order
+    order = np.argsort(keys, kind="stable")
+    cell_keys, cell_starts = np.unique(keys[order], return_index=True)
+    cell_ends = np.append(cell_starts[1:], count)
+    cell_of = np.empty(count, dtype=np.int64)
+    cell_of[order] = np.repeat(np.arange(len(cell_keys)), cell_ends - cell_starts)
+    distance_squared = float(distance) ** 2
+
+    # almost every vertex is within distance of the first vertex of its cell, usually because it has the same coordinates
+    first = order[cell_starts][cell_of]
+    target = np.where(((points - points[first]) ** 2).sum(axis=1) <= distance_squared, first, np.arange(count))
+
+    # the rest are compared with every vertex of their cell
+    pair_vertex = [np.flatnonzero(target != first)]
+    pair_cell = [cell_of[pair_vertex[0]]]
+
+    # and the vertices of cells with a neighboring cell are compared with every vertex of that cell
+    for offset in neighbor_offsets @ strides:
+        if offset == 0:
+            continue
+        neighbor = np.searchsorted(cell_keys, cell_keys + offset)
+        found = neighbor < len(cell_keys)
+        found[found] = cell_keys[neighbor[found]] == cell_keys[found] + offset
+        if not found.any():
+            continue
+        vertices_found = found[cell_of]
+        pair_vertex.append(np.flatnonzero(vertices_found))
+        pair_cell.append(neighbor[cell_of[vertices_found]])
+
+    pair_vertex = np.concatenate(pair_vertex)
+    pair_cell = np.concatenate(pair_cell)
+    if len(pair_vertex) > 0:
+        counts = cell_ends[pair_cell] - cell_starts[pair_cell]
+        total = int(counts.sum())
+        pair_ranks = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts) + np.repeat(cell_starts[pair_cell], counts)
+        pair_other = order[pair_ranks]
+        pair_vertex = np.repeat(pair_vertex, counts)
+
+        close = pair_other < target[pair_vertex]
+        pair_vertex = pair_vertex[close]
+        pair_other = pair_other[close]
+        close = ((points[pair_vertex] - points[pair_other]) ** 2).sum(axis=1) <= distance_squared
+        pair_vertex = pair_vertex[close]
+        pair_other = pair_other[close]
+
+        # the first vertex each vertex is close to, there may be none if no pair was close enough
+        pairs = np.lexsort((pair_other, pair_vertex))
+        pair_vertex = pair_vertex[pairs]
+        pair_other = pair_other[pairs]
+        firsts = np.diff(pair_vertex, prepend=-1) != 0
+        target[pair_vertex[firsts]] = pair_other[firsts]
+
+    # a vertex that was merged into a vertex that was itself merged ends up in the first vertex of the chain
+    while True:
+        next_target = target[target]
+        if np.array_equal(next_target, target):
+            break
+        target = next_target
+
+    first, index = np.unique(target, return_inverse=True)
+    return vertices[first], index.reshape(-1).astype(np.int32)
+
+
+def __in_vertex_order(vertices, first, index):
+    order = np.argsort(first, kind="stable")
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    return vertices[first[order]], rank[index].astype(np.int32)
+
+
+def weld_faces(loop_vertices, starts, sizes):
+    """Drop the loops that use the same welded vertex as the loop before them in their face,
+    and the faces that are left with fewer than 3 loops, like remove_doubles does to faces that collapse.
+    Returns the mask of the loops that are kept, the mask of the faces that are kept and the starts and sizes of the kept faces."""
+
+    starts = np.asarray(starts, dtype=np.int64)
+    sizes = np.asarray(sizes, dtype=np.int64)
+    loop_count = len(loop_vertices)
+    if loop_count == 0:
+        return np.zeros(0, dtype=bool), np.zeros(len(starts), dtype=bool), starts.astype(np.int32), sizes.astype(np.int32)
+
+    # the previous loop of the first loop of a face is the last loop of that face
+    previous = np.arange(loop_count) - 1
+    previous[starts] = starts + sizes - 1
+    loop_mask = loop_vertices != loop_vertices[previous]
+
+    kept_sizes = np.add.reduceat(loop_mask.astype(np.int64), starts)
+    face_mask = kept_sizes >= 3
+    loop_mask &= np.repeat(face_mask, sizes)
+
+    kept_sizes = kept_sizes[face_mask]
+    kept_starts = np.cumsum(kept_sizes) - kept_sizes
+    return loop_mask, face_mask, kept_starts.astype(np.int32), kept_sizes.astype(np.int32)
+
+
+def points_near(points, queries, distance):
+    """Find every point that is within distance of each query, with the same grid of cells as weld_vertices.
+    Returns the index of the query and the index of the point of every match, sorted by query and then point."""
+
+    points = np.asarray(points, dtype=np.float64).reshape((-1, 3))
+    queries = np.asarray(queries, dtype=np.float64).reshape((-1, 3))
+    if len(points) == 0 or len(queries) == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+    low = np.minimum(points.min(axis=0), queries.min(axis=0))
+    extent = float((np.maximum(points.max(axis=0), queries.max(axis=0)) - low).max())
+    cell_size = max(float(distance), extent / max_cells)
+
+    point_cells = np.floor((points - low) / cell_size).astype(np.int64) + 1
+    query_cells = np.floor((queries - low) / cell_size).astype(np.int64) + 1
+    dims = np.maximum(point_cells.max(axis=0), query_cells.max(axis=0)) + 2
+    strides = np.array((dims[1] * dims[2], dims[2], 1), dtype=np.int64)
+    point_keys = point_cells @ strides
+    query_keys = query_cells @ strides
+
+    order = np.argsort(point_keys, kind="stable")
+    sorted_keys = point_keys[order]
+
+    match_query = []
+    match_point = []
+    distance_squared = float(distance) ** 2
+    for offset in neighbor_offsets @ strides:
+        neighbor_keys = query_keys + offset
+        starts = np.searchsorted(sorted_keys, neighbor_keys, side="left")
+        counts = np.searchsorted(sorted_keys, neighbor_keys, side="right") - starts
+        total = int(counts.sum())
+        if total == 0:
+            continue
+
+        pair_query = np.repeat(np.arange(len(queries)), counts)
+        pair_ranks = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts) + np.repeat(starts, counts)
+        pair_point = order[pair_ranks]
+        close = ((queries[pair_query] - points[pair_point]) ** 2).sum(axis=1) <= distance_squared
+        match_query.append(pair_query[close])
+        match_point.append(pair_point[close])
+
+    if len(match_query) == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+    match_query = np.concatenate(match_query)
+    match_point = np.concatenate(match_point)
+    matches = np.lexsort((match_point, match_query))
+    return match_query[matches], match_point[matches]
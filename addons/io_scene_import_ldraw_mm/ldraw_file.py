@@ -2,16 +2,19 @@ import mathutils
 
 import os
 import re
-import zipfile
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 
+from .compiled_cache import CompiledCache
 from .import_options import ImportOptions
 from .filesystem import FileSystem
+from .ldraw_core.geometry_lines import GeometryLines
+from .ldraw_core import matrix as core_matrix
+from .ldraw_core import text as core_text
 from .ldraw_node import LDrawNode
 from .ldraw_color import LDrawColor
 from . import base64_handler
 from . import helpers
 from . import ldraw_part_types
-from . import texmap
 
 
 class LDrawFile:
@@ -22,14 +25,55 @@ class LDrawFile:
     __unparsed_file_cache = {}
     __parsed_file_cache = {}
 
+    # the fields that are written to the compiled cache, in the order they are stored
+    header_fields = (
+        "description",
+        "name",
+        "author",
+        "part_type",
+        "actual_part_type",
+        "optional_qualifier",
+        "update_date",
+        "license",
+        "help",
+        "category",
+        "keywords",
+        "cmdline",
+        "history",
+        "named",
+    )
+
+    # parsed library files are kept for the life of the process
+    # an entry is reused as long as its file, the import options that affect parsing
+    # and the files it references are unchanged
+    __library_file_cache = {}
+    __validated_library_files = {}
+
+    # filename -> (location, source, ldraw_file) read by prefetch and not yet used by get_file
+    # ldraw_file is the file already parsed from source, or None if get_file has to read source itself
+    __prefetched_files = {}
+
+    # filename -> (text, start, end) of an mpd section that hasn't been referenced yet
+    __mpd_sections = {}
+
     @classmethod
     def reset_caches(cls):
         cls.__unparsed_file_cache.clear()
         cls.__parsed_file_cache.clear()
+        cls.__validated_library_files.clear()
+        cls.__prefetched_files.clear()
+        cls.__mpd_sections.clear()
+
+    @classmethod
+    def clear_library_cache(cls):
+        cls.__library_file_cache.clear()
+        cls.__validated_library_files.clear()
 
     def __init__(self, filename):
         self.filename = filename
         self.lines = []
+        # the clean and stripped version of each line, dropped once the file is parsed
+        self.clean_lines = []
 
         self.description = None
         self.name = os.path.basename(filename)
@@ -50,9 +94,28 @@ class LDrawFile:
 
         self.child_nodes = []
         self.geometry_commands = {}
+        # the type 2-5 lines, see GeometryLines
+        self.geometry = None
 
         self.named = False
 
+        # set for files that were read on their own from the library so they can be reused by later imports
+        self.signature = None
+        self.options_key = None
+        self.subfiles = []
+        self.color_lines = []
+        # the names of the type 1 lines, only set by scan_file
+        self.subfile_names = []
+        # the lines scan_file couldn't read, as "line: error"
+        self.scan_errors = []
+        # the compiled data the file is read from instead of its text, dropped once the file is parsed
+        self.compiled = None
+        self.is_compiled = False
+        # set once the lines are parsed, which is done on a prefetch thread for the files it reads
+        self.parsed = False
+        # (ldraw_node, filename, matrix rows) of each type 1 line until __link_subfiles gets its file
+        self.pending_subfiles = []
+
     def __str__(self):
         return "\n".join([
             f"filename: {self.filename}",
@@ -119,199 +182,559 @@ class LDrawFile:
         return ldraw_file
 
     @classmethod
-    def get_file(cls, filename):
+    def get_file(cls, filename, parent_filename=None):
         ldraw_file = cls.__parsed_file_cache.get(filename)
         if ldraw_file is not None:
             return ldraw_file
 
-        ldraw_file = cls.__unparsed_file_cache.get(filename)
+        ldraw_file = cls.__get_unparsed_file(filename)
         if ldraw_file is None:
-            ldraw_file = cls.__load_file(filename)
+            ldraw_file = cls.__get_library_file(filename)
+            if ldraw_file is not None:
+                return ldraw_file
+            ldraw_file = cls.__load_file(filename, parent_filename)
 
         if ldraw_file is None:
             return ldraw_file
 
-        ldraw_file.__parse_file()
+        if not ldraw_file.parsed:
+            ldraw_file.__parse()
+        ldraw_file.__link_subfiles()
+        cls.__parsed_file_cache[filename] = ldraw_file
+
+        if ldraw_file.signature is not None:
+            ldraw_file.options_key = cls.__options_key()
+            cls.__library_file_cache[filename] = ldraw_file
+            cls.__validated_library_files[filename] = True
+            if not ldraw_file.is_compiled:
+                ldraw_file.__write_compiled()
+        return ldraw_file
+
+    @staticmethod
+    def __options_key():
+        return (
+            ImportOptions.meta_texmap,
+            ImportOptions.display_logo,
+            ImportOptions.chosen_logo,
+            FileSystem.resolution,
+        )
+
+    @classmethod
+    def __get_library_file(cls, filename):
+        ldraw_file = cls.__library_file_cache.get(filename)
+        if ldraw_file is None:
+            return None
+
+        if not cls.__is_valid_library_file(filename, ldraw_file):
+            cls.__library_file_cache.pop(filename, None)
+            return None
+
         cls.__parsed_file_cache[filename] = ldraw_file
         return ldraw_file
 
     @classmethod
-    def __load_file(cls, filename):
+    def __is_valid_library_file(cls, filename, ldraw_file):
+        valid = cls.__validated_library_files.get(filename)
+        if valid is not None:
+            return valid
+
+        # assume valid while checking the subfiles in case they reference this file
+        cls.__validated_library_files[filename] = True
+
+        valid = ldraw_file.options_key == cls.__options_key()
+        valid = valid and ldraw_file.signature == FileSystem.file_signature(filename)
+
+        # a subfile must still resolve to the same file
+        # it could have changed on disk, or be replaced by a file in the model being imported
+        for subfile_name, subfile in ldraw_file.subfiles:
+            if not valid:
+                break
+            current = cls.__parsed_file_cache.get(subfile_name) or cls.__get_unparsed_file(subfile_name)
+            if current is None:
+                if subfile is None:
+                    valid = FileSystem.locate(subfile_name, parent_filename=filename) is None
+                    continue
+                current = cls.__get_library_file(subfile_name)
+            valid = current is subfile
+
+        cls.__validated_library_files[filename] = valid
+        if valid:
+            ldraw_file.__reuse()
+        return valid
+
+    # put the file back to the state it was in right after it was parsed
+    def __reuse(self):
+        for child_node in self.child_nodes:
+            child_node.reset_state()
+
+        self.__parse_colors()
+
+    # the colors are shared by every file, so they are only added once the file is linked
+    def __parse_colors(self):
+        if self.is_configuration():
+            for clean_line in self.color_lines:
+                LDrawColor.parse_color(clean_line)
+
+    @classmethod
+    def __load_file(cls, filename, parent_filename=None):
         # _*_lp_lc_mod
-        result = FileSystem.locate(filename)
+        result = FileSystem.locate(filename, parent_filename=parent_filename)
         if result is None:
             return None
+        # _*_mod_end
+
+        prefetched = cls.__prefetched_files.pop(filename, None)
+        if prefetched is not None and prefetched[0] == result:
+            location, source, ldraw_file = prefetched
+            if ldraw_file is not None:
+                return ldraw_file
+            signature, compiled, text = source
         else:
-            if isinstance(result, (list)):
-                archive_library = result[0]
-                filepath = result[1]
-            else:
-                filepath = result
+            signature, compiled, text = cls.__read_location(result)
+
+        if compiled is not None:
+            return cls.__compiled_file(filename, signature, compiled)
+
+        if text is not None:
+            return cls.__read_file(text, filename, signature)
+        return None
+
+    @staticmethod
+    def __compiled_file(filename, signature, compiled):
+        ldraw_file = LDrawFile(filename)
+        ldraw_file.signature = signature
+        ldraw_file.compiled = compiled
+        return ldraw_file
+
+    # returns (signature, compiled, text) for a location returned by FileSystem.locate
+    # this is also run on the prefetch threads, so it only reads and must not change any cache
+    @classmethod
+    def __read_location(cls, location):
+        # _*_lp_lc_mod
+        if isinstance(location, list):
+            archive_library = location[0]
+            filepath = location[1]
+        else:
+            filepath = location
         # _*_mod_end
 
-        if filename.endswith('.io') and zipfile.is_zipfile(filename):
-            with zipfile.ZipFile(filename, 'r') as zip:
-                model_ldr = zip.read('model.ldr').decode('utf-8-sig')
-                return cls.__read_file(model_ldr.splitlines(), filename)
-            
-        if os.path.exists(filepath):
-            with open(filepath, 'r', encoding='utf-8-sig') as file:
-                return cls.__read_file(file, filename)
+        signature = FileSystem.location_signature(location)
+        compiled = CompiledCache.read(signature, cls.__options_key())
+        if compiled is not None:
+            return signature, compiled, None
+
+        if not isinstance(location, list):
+            if os.path.exists(filepath):
+                return signature, None, core_text.read_text(filepath)
         # _*_lp_lc_mod
-        elif FileSystem.have_archive_libraries:
+        elif FileSystem.have_archive_libraries or archive_library == FileSystem.io_library:
             bin_io = FileSystem.get_archive(filepath, library=archive_library)
             if bin_io is not None:
-                return cls.__read_file(bin_io.splitlines(), filename)
+                return signature, None, bin_io
 
-        return None
+        return signature, None, None
         # _*_mod_end
 
     @classmethod
-    def __read_file(cls, file, filename):
-        hit_not_blank_line = False
+    def prefetch(cls, filepath, workers):
+        """Read and parse filepath and every file it references, directly or through its subfiles, on a pool of workers threads
+        so get_file only has to link each file to its subfiles. Linking stays on the calling thread since it fills the shared caches.
+        An mpd is only read, since its sections go into the shared caches, and only its type 1 lines are looked at to find the files it references.
+        Returns the number of files referenced and the number that were read."""
+
+        referenced = {filepath}
+        read_count = 0
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            pending = {}
+
+            def submit(filename, parent_filename=None):
+                location = FileSystem.locate(filename, parent_filename=parent_filename, count_missing=False)
+                if location is not None:
+                    pending[executor.submit(cls.__prefetch_location, filename, location)] = (filename, location)
+
+            submit(filepath)
+            while len(pending) > 0:
+                done, not_done = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    filename, location = pending.pop(future)
+                    try:
+                        source, ldraw_file, subfile_names = future.result()
+                    except Exception:
+                        # get_file reads it again and reports the error where it always has
+                        continue
+                    read_count += 1
+                    cls.__prefetched_files[filename] = (location, source, ldraw_file)
+
+                    for subfile_name in subfile_names:
+                        if subfile_name in referenced:
+                            continue
+                        referenced.add(subfile_name)
+                        if (subfile_name in cls.__parsed_file_cache or
+                                subfile_name in cls.__unparsed_file_cache or
+                                subfile_name in cls.__mpd_sections or
+                                subfile_name in cls.__library_file_cache):
+                            continue
+                        submit(subfile_name, filename)
+
+        return len(referenced), read_count
+
+    # the source of a location, the file parsed from it and the names of the files its type 1 lines reference
+    # this is what __read_file does for a file that isn't an mpd, without adding it to any cache
+    # mpd sections are left out since they are read with the file that has them
+    @classmethod
+    def __prefetch_location(cls, filename, location):
+        source = cls.__read_location(location)
+        signature, compiled, text = source
+
+        ldraw_file = None
+        if compiled is not None:
+            ldraw_file = cls.__compiled_file(filename, signature, compiled)
+        elif text is not None and not core_text.is_mpd(text) and core_text.first_line(text) != "":
+            ldraw_file = cls.__file_from_lines(filename, text.splitlines(), False)
+            ldraw_file.signature = signature
+
+        if ldraw_file is not None:
+            ldraw_file.__parse()
+            subfile_names = {subfile_name for ldraw_node, subfile_name, rows in ldraw_file.pending_subfiles}
+            return source, ldraw_file, subfile_names
+
+        subfile_names = set()
+        if text is not None:
+            section_names = set()
+            for line in text.splitlines():
+                strip_line = line.strip()
+                if strip_line.startswith("1"):
+                    _sparams = strip_line.split(maxsplit=14)
+                    if len(_sparams) == 15 and _sparams[0] == "1":
+                        subfile_names.add(cls.__subfile_name(_sparams[14]))
+                elif strip_line.startswith("0 FILE "):
+                    section_names.add(strip_line.split(maxsplit=2)[2].lower())
+            subfile_names -= section_names
+
+        return source, None, subfile_names
+
+    @classmethod
+    def scan_file(cls, filepath, header_only=False):
+        """Read the header of filepath, and unless header_only its type 1 lines, without building any nodes or geometry.
+        Only the header fields, subfile_names and scan_errors of the returned file are set, and it is not added to any cache.
+        For an mpd, only the first section is read. Returns None if filepath can't be read."""
+
+        try:
+            text = core_text.read_text(filepath)
+        except OSError:
+            return None
+        return cls.__scan_lines(os.path.basename(filepath).lower(), text.splitlines(), header_only)
+
+    # a header_only scan stops at the end of the header
+    @classmethod
+    def __scan_lines(cls, filename, lines, header_only):
+        ldraw_file = LDrawFile(filename)
         is_mpd = None
-        no_file = False
-        first_mpd_filename = None
-        current_file = None
-        current_mpd_file = None
-        current_data_filename = None
-        current_data = None
-
-        for line in file:
-            clean_line = helpers.clean_line(line)
-            strip_line = line.strip()
 
+        for line in lines:
+            clean_line = helpers.clean_line(line)
             if clean_line == "":
                 continue
 
-            # if we're working on a data block, keep adding to it
-            # until we reach a line that is not is_texmap_line
-            # at that point, process the data block
-            if current_data_filename is not None:
-                if texmap.is_texmap_line(clean_line):
-                    if ImportOptions.meta_texmap:
-                        try:
-                            base64_data = texmap.clean_line(strip_line)
-                            current_data.append(base64_data)
-                        except IndexError as e:
-                            print(e)
-                            import traceback
-                            print(traceback.format_exc())
-                        continue
-                else:
-                    base64_handler.named_png_from_base64_str(current_data_filename, "".join(current_data))
-                    current_data_filename = None
-                    current_data = None
-
-            is_file_line = clean_line.startswith("0 FILE ")
-            is_nofile_line = clean_line.startswith("0 NOFILE")
-            is_data_line = clean_line.startswith("0 !DATA ")
-            is_mpd_line = is_file_line or is_data_line
-
-            # if the first non-blank line is 0 FILE, this is an mpd
-            if not hit_not_blank_line:
-                is_mpd = is_mpd_line
-
-            hit_not_blank_line = True
-
-            # clean up texmap geometry line prefixes
-            if ImportOptions.meta_texmap:
-                line = texmap.clean_line(line)
-
-            # not mpd -> regular ldr/dat file
-            if not is_mpd:
-                if current_file is None:
-                    current_file = LDrawFile(filename)
-                current_file.lines.append(line)
+            if is_mpd is None:
+                is_mpd = clean_line.startswith("0 FILE ")
+                if is_mpd:
+                    continue
+            elif is_mpd and (clean_line.startswith("0 FILE ") or clean_line.startswith("0 NOFILE")):
+                break
+
+            # the header is the type 0 lines before the first line of any other type
+            if header_only and not clean_line.startswith("0 "):
+                break
+
+            # a library scan reads thousands of files, so errors are kept for the caller to report instead of printed
+            try:
+                ldraw_file.__scan_line(clean_line, line.strip())
+            except Exception as e:
+                ldraw_file.scan_errors.append(f"{clean_line}: {e!r}")
                 continue
 
-            if is_mpd_line:
-                no_file = False
+        return ldraw_file
 
-            if is_file_line:
-                mpd_filename = strip_line.split(maxsplit=2)[2].lower()
-                if first_mpd_filename is None:
-                    first_mpd_filename = mpd_filename
+    # signature is only kept for files that aren't an mpd, since mpd sections are specific to the model being imported
+    @classmethod
+    def __read_file(cls, text, filename, signature=None):
+        if core_text.is_mpd(text):
+            return cls.__read_mpd(text, filename)
 
-                if current_mpd_file is not None:
-                    cls.__unparsed_file_cache[current_mpd_file.filename] = current_mpd_file
-                current_mpd_file = LDrawFile(mpd_filename)
-                continue
+        # not mpd -> regular ldr/dat file
+        if core_text.first_line(text) == "":
+            return None
 
-            if is_nofile_line:
-                no_file = True
-                if current_mpd_file is not None:
-                    cls.__unparsed_file_cache[current_mpd_file.filename] = current_mpd_file
-                current_mpd_file = None
-                continue
+        ldraw_file = cls.__file_from_lines(filename, text.splitlines(), False)
+        ldraw_file.signature = signature
+        cls.__unparsed_file_cache[filename] = ldraw_file
+        return ldraw_file
+
+    # each section is kept as its offsets into text and only split into lines by
+    # __get_unparsed_file when it is first referenced, so unused submodels are never read
+    # !DATA blocks are only recorded, base64_handler decodes one when a texmap first uses it
+    @classmethod
+    def __read_mpd(cls, text, filename):
+        first_mpd_filename, sections, data_blocks = core_text.index_mpd(text)
+
+        for mpd_filename, start, end in sections:
+            cls.__unparsed_file_cache.pop(mpd_filename, None)
+            cls.__mpd_sections[mpd_filename] = (text, start, end)
+
+        if ImportOptions.meta_texmap:
+            for data_filename, start in data_blocks:
+                base64_handler.add_embedded_image(data_filename, text, start, core_text.data_block_end(text, start))
+
+        if first_mpd_filename is not None:
+            filename = first_mpd_filename
+
+        return cls.__get_unparsed_file(filename)
 
-            if is_data_line:
-                current_data_filename = strip_line.split(maxsplit=2)[2]
-                current_data = []
+    # the file, or the mpd section, that hasn't been parsed yet
+    @classmethod
+    def __get_unparsed_file(cls, filename):
+        ldraw_file = cls.__unparsed_file_cache.get(filename)
+        if ldraw_file is None:
+            section = cls.__mpd_sections.pop(filename, None)
+            if section is not None:
+                text, start, end = section
+                ldraw_file = cls.__file_from_lines(filename, text[start:end].splitlines(), True)
+                cls.__unparsed_file_cache[filename] = ldraw_file
+        return ldraw_file
+
+    # the data blocks of an mpd section were already read by __read_mpd, so they are skipped here
+    # the cleaned line is kept so __parse_file doesn't have to clean it again
+    @staticmethod
+    def __file_from_lines(filename, lines, is_mpd):
+        ldraw_file = LDrawFile(filename)
+        for line, clean_line, strip_line in core_text.section_lines(lines, is_mpd, ImportOptions.meta_texmap):
+            ldraw_file.lines.append(line)
+            ldraw_file.clean_lines.append((clean_line, strip_line))
+        return ldraw_file
+
+    # files that reference a missing file are not compiled
+    # since the reference has to be parsed again if that file is added later
+    def __write_compiled(self):
+        if not CompiledCache.enabled:
+            return False
+
+        if any(subfile is None for subfile_name, subfile in self.subfiles):
+            return False
+
+        subfile_names = iter([subfile_name for subfile_name, subfile in self.subfiles])
+
+        records = []
+        floats = []
+        for child_node in self.child_nodes:
+            subfile_name = None
+            float_count = 0
+            if child_node.meta_command == "1":
+                subfile_name = next(subfile_names)
+                matrix = child_node.matrix
+                for row in range(3):
+                    floats.extend(matrix[row])
+                float_count = 12
+
+            records.append((
+                child_node.meta_command,
+                child_node.line,
+                child_node.color_code,
+                dict(child_node.meta_args),
+                subfile_name,
+                float_count,
+            ))
+
+        # the geometry line arrays are stored after the matrices
+        geometry = None
+        float_parts = [floats]
+        if self.geometry is not None:
+            geometry, geometry_floats = self.geometry.to_compiled()
+            float_parts.extend(geometry_floats)
+
+        header = tuple(getattr(self, field) for field in self.header_fields)
+        return CompiledCache.write(self.signature, self.options_key, (header, records, self.color_lines, geometry), float_parts)
+
+    # parsing only reads the file itself and builds no blender data, so the prefetch threads can run it
+    # __link_subfiles does the rest on the calling thread
+    def __parse(self):
+        if self.compiled is not None:
+            self.__parse_compiled()
+        else:
+            self.__parse_file()
+        self.parsed = True
+
+    # gets the file of each type 1 line, which fills the shared caches so it isn't done by __parse
+    def __link_subfiles(self):
+        missing = False
+        for ldraw_node, filename, rows in self.pending_subfiles:
+            ldraw_file = LDrawFile.get_file(filename, parent_filename=self.filename)
+            self.subfiles.append((filename, ldraw_file))
+            if ldraw_file is None:
+                missing = True
                 continue
 
-            if no_file:
+            ldraw_node.file = ldraw_file
+            ldraw_node.matrix = mathutils.Matrix((*rows, (0, 0, 0, 1)))
+
+            if ldraw_file.is_geometry():
+                self.geometry_commands.setdefault("1", 0)
+                self.geometry_commands["1"] += 1
+        self.pending_subfiles = []
+
+        if missing:
+            self.__drop_missing_subfiles()
+
+        self.__parse_colors()
+
+    # the nodes of missing files are dropped, and the geometry nodes around one are joined
+    # so the nodes are the same as if its line had never been in the file
+    def __drop_missing_subfiles(self):
+        child_nodes = []
+        for child_node in self.child_nodes:
+            if child_node.meta_command == "1" and child_node.file is None:
                 continue
 
-            if current_mpd_file is not None:
-                current_mpd_file.lines.append(line)
+            previous_node = child_nodes[-1] if len(child_nodes) > 0 else None
+            if child_node.meta_command == "geometry" and previous_node is not None and previous_node.meta_command == "geometry":
+                meta_args = previous_node.meta_args
+                meta_args["line_types"] += child_node.meta_args["line_types"]
+                for line_type, count in child_node.meta_args["counts"].items():
+                    meta_args["counts"][line_type] = meta_args["counts"].get(line_type, 0) + count
                 continue
 
-        if current_data_filename is not None:
-            base64_handler.named_png_from_base64_str(current_data_filename, "".join(current_data))
-            current_data_filename = None
-            current_data = None
+            child_nodes.append(child_node)
+        self.child_nodes = child_nodes
 
-        # last file in mpd will not be added to the file cache if it doesn't end in 0 NOFILE
-        if current_mpd_file is not None:
-            cls.__unparsed_file_cache[current_mpd_file.filename] = current_mpd_file
+    # builds the same header data and ldraw_nodes __parse_file does from a compiled file
+    def __parse_compiled(self):
+        (header, records, color_lines, geometry), floats = self.compiled
+        self.compiled = None
+        self.is_compiled = True
 
-        if current_file is not None:
-            cls.__unparsed_file_cache[current_file.filename] = current_file
+        for field, value in zip(self.header_fields, header):
+            setattr(self, field, value)
 
-        if first_mpd_filename is not None:
-            filename = first_mpd_filename
+        offset = 0
+        for meta_command, line, color_code, meta_args, subfile_name, float_count in records:
+            values = floats[offset:offset + float_count].tolist()
+            offset += float_count
+
+            ldraw_node = LDrawNode()
+            ldraw_node.line = line
+            ldraw_node.meta_command = meta_command
+            ldraw_node.color_code = color_code
+            if len(meta_args) > 0:
+                ldraw_node.meta_args = meta_args
+
+            if subfile_name is not None:
+                self.pending_subfiles.append((ldraw_node, subfile_name, (values[0:4], values[4:8], values[8:12])))
+            elif meta_command == "geometry":
+                for line_type, count in meta_args["counts"].items():
+                    self.geometry_commands.setdefault(line_type, 0)
+                    self.geometry_commands[line_type] += count
+
+            self.child_nodes.append(ldraw_node)
 
-        return cls.__unparsed_file_cache.get(filename)
+        if geometry is not None:
+            self.geometry = GeometryLines.from_compiled(geometry, floats[offset:])
+
+        self.color_lines = list(color_lines)
 
     # create meta nodes when those commands affect the scene
     # process meta command in place if it only affects the file
     def __parse_file(self):
-        for line in self.lines:
+        for clean_line, strip_line in self.clean_lines:
             try:
-                clean_line = helpers.clean_line(line)
-                strip_line = line.strip()
-
-                if self.__line_description(strip_line): continue
-                if self.__line_name(clean_line, strip_line): continue
-                if self.__line_author(clean_line, strip_line): continue
-                if self.__line_part_type(clean_line, strip_line): continue
-                if self.__line_license(strip_line): continue
-                if self.__line_help(strip_line): continue
-                if self.__line_category(strip_line): continue
-                if self.__line_keywords(strip_line): continue
-                if self.__line_cmdline(strip_line): continue
-                if self.__line_history(strip_line): continue
-                if self.__line_comment(clean_line): continue
-                if self.__line_color(clean_line): continue
-                if self.__line_geometry(clean_line): continue
-                if self.__line_subfile(clean_line, strip_line): continue
-                if self.__line_bfc(clean_line, strip_line): continue
-                if self.__line_step(clean_line): continue
-                if self.__line_save(clean_line): continue
-                if self.__line_clear(clean_line): continue
-                if self.__line_print(clean_line): continue
-                if self.__line_ldcad(clean_line): continue
-                # _*_lp_lc_mod
-                if self.__line_lp_lc(clean_line): continue
-                # _*_mod_end
-                if self.__line_texmap(clean_line): continue
-                if self.__line_stud_io(clean_line): continue
+                self.__parse_line(clean_line, strip_line)
             except Exception as e:
                 print(e)
                 import traceback
                 print(traceback.format_exc())
                 continue
+        self.clean_lines = []
+
+        if self.geometry is not None:
+            self.geometry.finalize()
+            for child_node in self.child_nodes:
+                if child_node.meta_command == "geometry":
+                    line_types = child_node.meta_args["line_types"]
+                    child_node.meta_args["line_types"] = "".join(line_types)
+                    child_node.meta_args["counts"] = {line_type: line_types.count(line_type) for line_type in dict.fromkeys(line_types)}
+
+    # each line is classified once by its line type, and 0 lines by their meta keyword
+    # and only given to the handlers that could match it, in the same order they were always checked
+    def __parse_line(self, clean_line, strip_line):
+        if self.description is None:
+            self.__line_description(strip_line)
+
+        space = clean_line.find(" ")
+        if space < 0:
+            line_type = clean_line
+            handlers = ()
+        else:
+            line_type = clean_line[:space]
+            handlers = self.__line_type_handlers.get(line_type, ())
+
+        if line_type == "0":
+            keyword = clean_line[space + 1:].split(" ", 1)[0]
+            _keyword = keyword.lower()
+            if _keyword == "name:":
+                if self.__line_name(clean_line, strip_line): return
+            elif _keyword == "author:":
+                if self.__line_author(clean_line, strip_line): return
+            handlers = self.__meta_line_handlers.get(keyword, self.__meta_handlers)
+
+        # a part type is found anywhere in the line, so check every line that could hold one
+        if self.__might_have_part_type(strip_line):
+            if self.__line_part_type(clean_line, strip_line): return
+
+        for handler in handlers:
+            if handler(self, clean_line, strip_line): return
+
+    # the same header handlers as __parse_line, type 1 lines only have their filename kept
+    # the filename is only lowercased since the stud logo that is chosen is specific to an import
+    def __scan_line(self, clean_line, strip_line):
+        if self.description is None:
+            self.__line_description(strip_line)
+
+        space = clean_line.find(" ")
+        line_type = clean_line[:space] if space >= 0 else clean_line
+
+        if line_type == "1":
+            _sparams = strip_line.split(maxsplit=14)
+            if len(_sparams) == 15:
+                self.subfile_names.append(_sparams[14].lower())
+            return
+
+        if line_type != "0" or space < 0:
+            return
+
+        keyword = clean_line[space + 1:].split(" ", 1)[0]
+        _keyword = keyword.lower()
+        if _keyword == "name:":
+            if self.__line_name(clean_line, strip_line): return
+        elif _keyword == "author:":
+            if self.__line_author(clean_line, strip_line): return
+
+        if self.__might_have_part_type(strip_line):
+            if self.__line_part_type(clean_line, strip_line): return
+
+        for handler in self.__header_line_handlers.get(keyword, ()):
+            if handler(self, clean_line, strip_line): return
+
+    # true for any line __line_part_type could match, and few others
+    @staticmethod
+    def __might_have_part_type(strip_line):
+        return ("ORIGINAL" in strip_line or
+                "UPDATE" in strip_line or
+                "Alias" in strip_line or
+                # Physical_Colour, Flexible_Section, LDRAW_ORG
+                "_" in strip_line or
+                # Official, Unofficial and Un-official in any case
+                "f" in strip_line or
+                "F" in strip_line)
 
     # always return false so that the rest of the line types are parsed even if this is true
     def __line_description(self, strip_line):
@@ -399,52 +822,53 @@ class LDrawFile:
 
         return False
 
-    def __line_license(self, strip_line):
+    def __line_license(self, clean_line, strip_line):
         if strip_line.startswith("0 !LICENSE "):
             self.license = strip_line.split(maxsplit=2)[2]
             return True
         return False
 
-    def __line_help(self, strip_line):
+    def __line_help(self, clean_line, strip_line):
         if strip_line.startswith("0 !HELP "):
             self.help.append(strip_line.split(maxsplit=2)[2])
             return True
         return False
 
-    def __line_category(self, strip_line):
+    def __line_category(self, clean_line, strip_line):
         if strip_line.startswith("0 !CATEGORY "):
             self.category.append(strip_line.split(maxsplit=2)[2])
             return True
         return False
 
-    def __line_keywords(self, strip_line):
+    def __line_keywords(self, clean_line, strip_line):
         if strip_line.startswith("0 !KEYWORDS "):
             self.keywords += strip_line.split(maxsplit=2)[2].split(',')
             return True
         return False
 
-    def __line_cmdline(self, strip_line):
+    def __line_cmdline(self, clean_line, strip_line):
         if strip_line.startswith("0 !CMDLINE "):
             self.cmdline = strip_line.split(maxsplit=2)[2]
             return True
         return False
 
-    def __line_history(self, strip_line):
+    def __line_history(self, clean_line, strip_line):
         if strip_line.startswith("0 !HISTORY "):
             self.history.append(strip_line.split(maxsplit=4)[2:])
             return True
         return False
 
-    def __line_comment(self, clean_line):
+    def __line_comment(self, clean_line, strip_line):
         if clean_line.startswith("0 //"):
             return True
         return False
 
     # TODO: add collection of colors specific to this file
-    def __line_color(self, clean_line):
+    def __line_color(self, clean_line, strip_line):
         if clean_line.startswith("0 !COLOUR "):
+            # parsed by __link_subfiles
             if self.is_configuration():
-                LDrawColor.parse_color(clean_line)
+                self.color_lines.append(clean_line)
             else:
                 # TODO: add this color to this file's colors
                 # color = LDrawColor()
@@ -459,12 +883,12 @@ class LDrawFile:
             ldraw_node = LDrawNode()
             ldraw_node.line = clean_line
             ldraw_node.meta_command = "bfc"
-            ldraw_node.meta_args["command"] = strip_line.split(maxsplit=2)[2]
+            ldraw_node.meta_args = {"command": strip_line.split(maxsplit=2)[2]}
             self.child_nodes.append(ldraw_node)
             return True
         return False
 
-    def __line_step(self, clean_line):
+    def __line_step(self, clean_line, strip_line):
         if clean_line.startswith("0 STEP"):
             ldraw_node = LDrawNode()
             ldraw_node.line = clean_line
@@ -473,7 +897,7 @@ class LDrawFile:
             return True
         return False
 
-    def __line_save(self, clean_line):
+    def __line_save(self, clean_line, strip_line):
         if clean_line.startswith("0 SAVE"):
             ldraw_node = LDrawNode()
             ldraw_node.line = clean_line
@@ -482,7 +906,7 @@ class LDrawFile:
             return True
         return False
 
-    def __line_clear(self, clean_line):
+    def __line_clear(self, clean_line, strip_line):
         if clean_line.startswith("0 CLEAR"):
             ldraw_node = LDrawNode()
             ldraw_node.line = clean_line
@@ -491,22 +915,23 @@ class LDrawFile:
             return True
         return False
 
-    def __line_print(self, clean_line):
+    def __line_print(self, clean_line, strip_line):
         if clean_line.startswith("0 PRINT ") or clean_line.startswith("0 WRITE "):
             ldraw_node = LDrawNode()
             ldraw_node.line = clean_line
             ldraw_node.meta_command = "print"
-            ldraw_node.meta_args["message"] = clean_line.split(maxsplit=2)[2]
+            ldraw_node.meta_args = {"message": clean_line.split(maxsplit=2)[2]}
             self.child_nodes.append(ldraw_node)
             return True
         return False
 
     # http://www.melkert.net/LDCad/tech/meta
-    def __line_ldcad(self, clean_line):
+    def __line_ldcad(self, clean_line, strip_line):
         if clean_line.startswith("0 !LDCAD GROUP_DEF "):
             ldraw_node = LDrawNode()
             ldraw_node.line = clean_line
             ldraw_node.meta_command = "group_def"
+            ldraw_node.meta_args = {}
 
             # 0 !LDCAD GROUP_DEF [topLevel=true] [LID=119507361] [GID=FsMGcO9CYmY] [name=Group 12] [center=0 0 0]
             _params = re.search(r"\S+\s+\S+\s+\S+\s+(\[.*\])\s+(\[.*\])\s+(\[.*\])\s+(\[.*\])\s+(\[.*\])", clean_line)
@@ -540,7 +965,7 @@ class LDrawFile:
 
             ids_str = _params[1]  # "[ids=13016969]"
             ids_args = re.search(r"\[(.*)=(.*)\]", ids_str)
-            ldraw_node.meta_args["id"] = ids_args[2]  # "13016969"
+            ldraw_node.meta_args = {"id": ids_args[2]}  # "13016969"
 
             self.child_nodes.append(ldraw_node)
             return True
@@ -548,7 +973,7 @@ class LDrawFile:
 
     # https://www.leocad.org/docs/meta.html
     # _*_lp_lc_mod
-    def __line_lp_lc(self, clean_line):
+    def __line_lp_lc(self, clean_line, strip_line):
         meta = "!LPUB"
         name = "lpub3d"
         if clean_line.startswith("0 !LEOCAD "):
@@ -561,7 +986,7 @@ class LDrawFile:
             ldraw_node = LDrawNode()
             ldraw_node.line = clean_line
             ldraw_node.meta_command = "group_begin"
-            ldraw_node.meta_args["name"] = name_args[4]
+            ldraw_node.meta_args = {"name": name_args[4]}
             self.child_nodes.append(ldraw_node)
             return True
 
@@ -593,7 +1018,7 @@ class LDrawFile:
         # _*_mod_end
         return False
 
-    def __line_texmap(self, clean_line):
+    def __line_texmap(self, clean_line, strip_line):
         if clean_line.startswith("0 !TEXMAP "):
             ldraw_node = LDrawNode()
             ldraw_node.line = clean_line
@@ -602,7 +1027,7 @@ class LDrawFile:
             return True
         return False
 
-    def __line_stud_io(self, clean_line):
+    def __line_stud_io(self, clean_line, strip_line):
         if clean_line.startswith("0 PE_TEX_PATH "):
             ldraw_node = LDrawNode()
             ldraw_node.line = clean_line
@@ -626,104 +1051,156 @@ class LDrawFile:
             return True
         return False
 
+    # the name a type 1 line's filename is looked up by
+    @staticmethod
+    def __subfile_name(filename):
+        filename = filename.lower()
+
+        # filename = "stud-logo.dat"
+        # parts = filename.split(".") => ["stud-logo", "dat"]
+        # name = parts[0] => "stud-logo"
+        # name_parts = name.split('-') => ["stud", "logo"]
+        # stud_name = name_parts[0] => "stud"
+        # chosen_logo = special_bricks.chosen_logo => "logo5"
+        # ext = parts[1] => "dat"
+        # filename = f"{stud_name}-{chosen_logo}.{ext}" => "stud-logo5.dat"
+        if ImportOptions.display_logo and filename in ldraw_part_types.stud_names:
+            parts = filename.split('.')
+            name = parts[0]
+            name_parts = name.split('-')
+            stud_name = name_parts[0]
+            chosen_logo = ImportOptions.chosen_logo_value()
+            ext = parts[1]
+            filename = f"{stud_name}-{chosen_logo}.{ext}"
+        return filename
+
     def __line_subfile(self, clean_line, strip_line):
         if clean_line.startswith("1 "):
-            _params = clean_line.split(maxsplit=14)
-            _sparams = strip_line.split(maxsplit=14)
-
-            color_code = _params[1]
+            color_code, values, filename = core_matrix.subfile_params(clean_line, strip_line)
 
-            (x, y, z, a, b, c, d, e, f, g, h, i) = map(float, _params[2:14])
-            matrix = mathutils.Matrix((
+            (x, y, z, a, b, c, d, e, f, g, h, i) = values
+            rows = (
                 (a, b, c, x),
                 (d, e, f, y),
                 (g, h, i, z),
-                (0, 0, 0, 1)
-            ))
+            )
 
             # allows for extra spaces in the filename
-            filename = _sparams[14].lower()
-
-            # filename = "stud-logo.dat"
-            # parts = filename.split(".") => ["stud-logo", "dat"]
-            # name = parts[0] => "stud-logo"
-            # name_parts = name.split('-') => ["stud", "logo"]
-            # stud_name = name_parts[0] => "stud"
-            # chosen_logo = special_bricks.chosen_logo => "logo5"
-            # ext = parts[1] => "dat"
-            # filename = f"{stud_name}-{chosen_logo}.{ext}" => "stud-logo5.dat"
-            if ImportOptions.display_logo and filename in ldraw_part_types.stud_names:
-                parts = filename.split('.')
-                name = parts[0]
-                name_parts = name.split('-')
-                stud_name = name_parts[0]
-                chosen_logo = ImportOptions.chosen_logo_value()
-                ext = parts[1]
-                filename = f"{stud_name}-{chosen_logo}.{ext}"
-
-            ldraw_file = LDrawFile.get_file(filename)
-            if ldraw_file is None:
-                return True
+            filename = LDrawFile.__subfile_name(filename)
 
+            # the file and matrix are set by __link_subfiles
             ldraw_node = LDrawNode()
-            ldraw_node.file = ldraw_file
             ldraw_node.line = clean_line
             ldraw_node.meta_command = "1"
             ldraw_node.color_code = color_code
-            ldraw_node.matrix = matrix
             self.child_nodes.append(ldraw_node)
-
-            if ldraw_file.is_geometry():
-                self.geometry_commands.setdefault(_params[0], 0)
-                self.geometry_commands[_params[0]] += 1
-
+            self.pending_subfiles.append((ldraw_node, filename, rows))
             return True
         return False
 
-    def __line_geometry(self, clean_line):
+    def __line_geometry(self, clean_line, strip_line):
         if (clean_line.startswith("2 ") or
                 clean_line.startswith("3 ") or
                 clean_line.startswith("4 ") or
                 clean_line.startswith("5 ")):
             _params = clean_line.split()
-
-            self.geometry_commands.setdefault(_params[0], 0)
-            self.geometry_commands[_params[0]] += 1
-
-            ldraw_node = LDrawNode()
-            ldraw_node.line = clean_line
-            ldraw_node.meta_command = _params[0]
-            ldraw_node.color_code = _params[1]
-            ldraw_node.vertices = self.__parse_face(_params)
-            self.child_nodes.append(ldraw_node)
+            line_type = _params[0]
+
+            if self.geometry is None:
+                self.geometry = GeometryLines()
+
+            # consecutive geometry lines share one node that records the order of their line types
+            # their vertices are in self.geometry, from the start index of each line type
+            ldraw_node = self.child_nodes[-1] if len(self.child_nodes) > 0 else None
+            if ldraw_node is not None and ldraw_node.meta_command != "geometry":
+                ldraw_node = None
+            starts = None
+            if ldraw_node is None:
+                starts = {_line_type: self.geometry.count(_line_type) for _line_type in GeometryLines.line_types}
+
+            self.geometry.add(line_type, clean_line, _params)
+
+            self.geometry_commands.setdefault(line_type, 0)
+            self.geometry_commands[line_type] += 1
+
+            if ldraw_node is None:
+                ldraw_node = LDrawNode()
+                ldraw_node.meta_command = "geometry"
+                ldraw_node.meta_args = {
+                    "line_types": [],
+                    "starts": starts,
+                }
+                self.child_nodes.append(ldraw_node)
+            ldraw_node.meta_args["line_types"].append(line_type)
             return True
         return False
 
-    @staticmethod
-    def __parse_face(_params):
-        line_type = _params[0]
-        vert_count = 0
-        if line_type == "2":
-            vert_count = 2
-        elif line_type == "3":
-            vert_count = 3
-        elif line_type == "4":
-            vert_count = 4
-        elif line_type == "5":
-            # 1.148 26.114 -19.076
-            # 6.9   25.8   -18.6
-            # 0     26     -19
-            # 2.121 26.44  -19.293
-            vert_count = 4
-
-        verts = []
-        for i in range(vert_count):
-            x = float(_params[i * 3 + 2])
-            y = float(_params[i * 3 + 3])
-            z = float(_params[i * 3 + 4])
-            vertex = mathutils.Vector((x, y, z))
-            verts.append(vertex)
-        return verts
+    # every meta handler, used for a meta keyword that isn't in __meta_line_handlers
+    __meta_handlers = (
+        __line_license,
+        __line_help,
+        __line_category,
+        __line_keywords,
+        __line_cmdline,
+        __line_history,
+        __line_comment,
+        __line_color,
+        __line_bfc,
+        __line_step,
+        __line_save,
+        __line_clear,
+        __line_print,
+        __line_ldcad,
+        # _*_lp_lc_mod
+        __line_lp_lc,
+        # _*_mod_end
+        __line_texmap,
+        __line_stud_io,
+    )
+
+    __meta_line_handlers = {
+        "!LICENSE": (__line_license,),
+        "!HELP": (__line_help,),
+        "!CATEGORY": (__line_category,),
+        "!KEYWORDS": (__line_keywords,),
+        "!CMDLINE": (__line_cmdline,),
+        "!HISTORY": (__line_history,),
+        "//": (__line_comment,),
+        "!COLOUR": (__line_color,),
+        "BFC": (__line_bfc,),
+        "STEP": (__line_step,),
+        "SAVE": (__line_save,),
+        "CLEAR": (__line_clear,),
+        "PRINT": (__line_print,),
+        "WRITE": (__line_print,),
+        "!LDCAD": (__line_ldcad,),
+        # _*_lp_lc_mod
+        "!LPUB": (__line_lp_lc,),
+        "!LEOCAD": (__line_lp_lc,),
+        # _*_mod_end
+        "!TEXMAP": (__line_texmap,),
+        "PE_TEX_PATH": (__line_stud_io,),
+        "PE_TEX_INFO": (__line_stud_io,),
+        "PE_TEX_NEXT_SHEAR": (__line_stud_io,),
+    }
+
+    # the meta handlers that only set header fields, used by scan_file
+    __header_line_handlers = {
+        "!LICENSE": (__line_license,),
+        "!HELP": (__line_help,),
+        "!CATEGORY": (__line_category,),
+        "!KEYWORDS": (__line_keywords,),
+        "!CMDLINE": (__line_cmdline,),
+        "!HISTORY": (__line_history,),
+    }
+
+    __line_type_handlers = {
+        "1": (__line_subfile,),
+        "2": (__line_geometry,),
+        "3": (__line_geometry,),
+        "4": (__line_geometry,),
+        "5": (__line_geometry,),
+    }
 
     # if there's a line type specified, determine what that type is
     @staticmethod
@@ -1,28 +1,64 @@
+import hashlib
+
 import bpy
 import bmesh
-import mathutils
+import numpy as np
 
 from .blender_materials import BlenderMaterials
 from .import_options import ImportOptions
+from .ldraw_core.weld import weld_vertices, weld_faces
+from .ldraw_core.edges import sharp_edge_keys, sharp_edge_mask
 from . import special_bricks
 from . import strings
 from . import helpers
 from . import matrices
 
 
+# mesh key -> {material slot index: (texmap, pe_texmap)} of the slots with color 16 faces
+# objects give these slots their own color, see ldraw_object.create_object
+object_color_slots = {}
+
+# (filename, hash of the vertices and type 2 lines) -> the keys of the vertex pairs that type 2 lines run along, see __get_sharp_edges
+# every color of a part has the same vertices so they share these
+sharp_edge_keys_cache = {}
+
+# the faces of the meshes built by this import and how many materials they looked up, see __get_material_indices
+material_face_count = 0
+material_lookup_count = 0
+
+
+def reset_caches():
+    global material_face_count
+    global material_lookup_count
+
+    object_color_slots.clear()
+    sharp_edge_keys_cache.clear()
+    material_face_count = 0
+    material_lookup_count = 0
+
+
+# the number of faces given a material and the number of BlenderMaterials.get_material calls that took
+def material_stats():
+    return material_face_count, material_lookup_count
+
+
 def _create_mesh(key):
     return bpy.data.meshes.new(key)
 
 
 def create_mesh(key, geometry_data, color_code, return_mesh=False):
     mesh = bpy.data.meshes.get(key)
-    if mesh is None or return_mesh:
+    # a shared mesh left by an earlier import is built again so its color 16 slots are known
+    rebuild = ImportOptions.share_part_meshes and key not in object_color_slots
+    if mesh is None or return_mesh or rebuild:
         if mesh is None:
             mesh = _create_mesh(key)
         mesh.name = key
         mesh[strings.ldraw_filename_key] = geometry_data.file.name
 
-        __process_bmesh(mesh, geometry_data, color_code)
+        object_color_slots[key] = {}
+        __process_mesh_faces(mesh, geometry_data, color_code, object_color_slots[key])
+        __process_bmesh(mesh, geometry_data)
         __process_mesh_sharp_edges(mesh, geometry_data)
         __process_mesh(mesh)
 
@@ -31,23 +67,13 @@ def create_mesh(key, geometry_data, color_code, return_mesh=False):
     return mesh
 
 
-# for edge_data in geometry_data.line_data:
-# for vertex in edge_data.vertices[0:2]:  # in case line_data is being used since it has 4 verts
+# geometry_data.line_vertices[:, 0:2] in case line_data is being used since it has 4 verts
 def create_edge_mesh(key, geometry_data):
     mesh = bpy.data.meshes.get(key)
     if mesh is None:
-        e_verts = []
+        e_verts = geometry_data.edge_vertices.array.reshape((-1, 3)).tolist()
         e_edges = []
-        e_faces = []
-
-        i = 0
-        for edge_data in geometry_data.edge_data:
-            face_indices = []
-            for vertex in edge_data.vertices:
-                e_verts.append(vertex)
-                face_indices.append(i)
-                i += 1
-            e_faces.append(face_indices)
+        e_faces = np.arange(len(e_verts)).reshape((-1, 2)).tolist()
 
         mesh = bpy.data.meshes.new(key)
         mesh.name = key
@@ -60,114 +86,208 @@ def create_edge_mesh(key, geometry_data):
     return mesh
 
 
+# bmesh is only used for the operations that need it, the faces are added by __process_mesh_faces
 # https://b3d.interplanety.org/en/how-to-get-global-vertex-coordinates/
 # https://blender.stackexchange.com/questions/50160/scripting-low-level-join-meshes-elements-hopefully-with-bmesh
 # https://blender.stackexchange.com/questions/188039/how-to-join-only-two-objects-to-create-a-new-object-using-python
 # https://blender.stackexchange.com/questions/23905/select-faces-depending-on-material
-def __process_bmesh(mesh, geometry_data, color_code):
-    bm = __process_bmesh_faces(mesh, geometry_data, color_code)
+def __process_bmesh(mesh, geometry_data):
+    if not (ImportOptions.recalculate_normals or ImportOptions.smooth_type_value() == "bmesh_split"):
+        return
+
+    # from_mesh keeps the order of the edges, so bm.edges has the same indices as mesh.edges
+    sharp_edges = None
+    if ImportOptions.smooth_type_value() == "bmesh_split":
+        sharp_edges = __get_sharp_edges(mesh, geometry_data)
+
+    bm = bmesh.new()
+    bm.from_mesh(mesh)
     helpers.ensure_bmesh(bm)
     __clean_bmesh(bm)
-    __process_bmesh_edges(bm, geometry_data)
+    __process_bmesh_edges(bm, sharp_edges)
     helpers.finish_bmesh(bm, mesh)
     helpers.finish_mesh(mesh)
 
 
-# bpy.context.object.data.edges[6].use_edge_sharp = True
-# Create kd tree for fast "find nearest points" calculation
-# https://docs.blender.org/api/blender_python_api_current/mathutils.kdtree.html
-# https://docs.scipy.org/doc/scipy/reference/generated/scipy.spatial.KDTree.html
-def __get_edge_indices(verts, geometry_data):
-    kd = mathutils.kdtree.KDTree(len(verts))
-    for i, v in enumerate(verts):
-        kd.insert(v.co, i)
-    kd.balance()
-
-    # increase the distance to look for edges to merge
-    # merge line type 2 edges at a greater distance than mesh edges
-    # the rounded part in the seat of 4079.dat has a gap just wide
-    # enough that 2x isn't enough
-    distance = ImportOptions.merge_distance
-    distance = ImportOptions.merge_distance * 2.1
-
-    edge_indices = set()
-
-    for edge_data in geometry_data.edge_data:
-        edge_verts = []
-        # for vertex in edge_data.vertices[0:2]:  # in case line_data is being used since it has 4 verts
-        for vertex in edge_data.vertices:
-            edge_verts.append(vertex)
-
-        edges0 = [index for (co, index, dist) in kd.find_range(edge_verts[0], distance)]
-        edges1 = [index for (co, index, dist) in kd.find_range(edge_verts[1], distance)]
-        for e0 in edges0:
-            for e1 in edges1:
-                edge_indices.add((e0, e1))
-                edge_indices.add((e1, e0))
-
-    return edge_indices
+# which edges of the mesh a type 2 line of the part runs along
+# the vertex positions are hashed into a grid instead of searching a kd tree for each end of each line
+def __get_sharp_edges(mesh, geometry_data):
+    vertex_count = len(mesh.vertices)
+    vertices = np.empty(vertex_count * 3, dtype=np.float32)
+    mesh.vertices.foreach_get("co", vertices)
+    edges = np.empty(len(mesh.edges) * 2, dtype=np.int32)
+    mesh.edges.foreach_get("vertices", edges)
+
+    # the keys are vertex indices, so they are only reused by a mesh with exactly the same vertices and lines
+    # two meshes of a file can have different vertices with the same count, like a texmap variant welded differently
+    line_vertices = np.ascontiguousarray(geometry_data.edge_vertices.array, dtype=np.float32)
+    digest = hashlib.sha1(vertices.tobytes())
+    digest.update(line_vertices.tobytes())
+    key = (geometry_data.file.name, digest.digest())
+    keys = sharp_edge_keys_cache.get(key)
+    if keys is None:
+        # increase the distance to look for edges to merge
+        # merge line type 2 edges at a greater distance than mesh edges
+        # the rounded part in the seat of 4079.dat has a gap just wide
+        # enough that 2x isn't enough
+        distance = ImportOptions.merge_distance * 2.1
+
+        # geometry_data.line_vertices[:, 0:2] in case line_data is being used since it has 4 verts
+        keys = sharp_edge_keys(vertices.reshape((-1, 3)), line_vertices, distance)
+        sharp_edge_keys_cache[key] = keys
+
+    return sharp_edge_mask(keys, edges, vertex_count)
+
+
+def __process_bmesh_edges(bm, sharp_edges):
+    if sharp_edges is not None:
+        # Find the appropriate mesh edges and make them sharp (i.e. not smooth)
+        edges = [bm.edges[i] for i in np.flatnonzero(sharp_edges).tolist()]
+        bmesh.ops.split_edges(bm, edges=edges)
 
 
-def __process_bmesh_edges(bm, geometry_data):
-    if ImportOptions.smooth_type_value() == "bmesh_split":
-        edge_indices = __get_edge_indices(bm.verts, geometry_data)
+# the vertices, loops and polygons are set straight from the geometry_data arrays
+# the verts are in the same order the faces use them, each face has its own, so loop i uses vertex i until they are welded
+def __process_mesh_faces(mesh, geometry_data, color_code, color_slots):
+    vertices = geometry_data.face_vertices.array
+    starts = geometry_data.face_starts.array
+    sizes = geometry_data.face_sizes.array
+    vertex_count = len(vertices)
+    face_count = len(starts)
 
-        # Find the appropriate mesh edges and make them sharp (i.e. not smooth)
-        edges = set()
-        # merge = set()
-        for edge in bm.edges:
-            v0 = edge.verts[0]
-            v1 = edge.verts[1]
-            i0 = v0.index
-            i1 = v1.index
-            if (i0, i1) in edge_indices:
-                edges.add(edge)
+    material_indices = __get_material_indices(mesh, geometry_data, color_code, color_slots)
+    uvs = __get_uvs(geometry_data, vertices, starts, sizes)
 
-        bmesh.ops.split_edges(bm, edges=list(edges))
+    loop_vertices = np.arange(vertex_count, dtype=np.int32)
 
+    # the mesh is created welded, faces that collapse lose the loops that were merged
+    if ImportOptions.remove_doubles:
+        vertices, loop_vertices = weld_vertices(vertices, ImportOptions.merge_distance)
+        loop_mask, face_mask, starts, sizes = weld_faces(loop_vertices, starts, sizes)
+        loop_vertices = loop_vertices[loop_mask]
+        material_indices = material_indices[face_mask]
+        face_count = len(starts)
+        if uvs is not None:
+            uvs = uvs[loop_mask]
+
+    mesh.clear_geometry()
+
+    mesh.vertices.add(len(vertices))
+    mesh.vertices.foreach_set("co", vertices.ravel())
+
+    mesh.loops.add(len(loop_vertices))
+    mesh.loops.foreach_set("vertex_index", loop_vertices)
+
+    mesh.polygons.add(face_count)
+    mesh.polygons.foreach_set("loop_start", starts)
+    # loop_total is read only from 4.0, where it comes from loop_start
+    if bpy.app.version < (4,):
+        mesh.polygons.foreach_set("loop_total", sizes.astype(np.int32))
+    mesh.polygons.foreach_set("material_index", material_indices)
+    mesh.polygons.foreach_set("use_smooth", np.full(face_count, ImportOptions.shade_smooth))
+
+    if uvs is not None:
+        uv_layer = mesh.uv_layers.new()
+        uv_layer.data.foreach_set("uv", uvs.ravel())
 
-def __process_bmesh_faces(mesh, geometry_data, color_code):
-    bm = bmesh.new()
+    helpers.finish_mesh(mesh)
 
-    for face_data in geometry_data.face_data:
-        verts = [bm.verts.new(vertex) for vertex in face_data.vertices]
-        face = bm.faces.new(verts)
 
-        c = color_code if face_data.color_code == "16" else face_data.color_code
+# every texmap projects the loops of all of its faces at once, pe_texmaps have uvs of their own for each face
+# returns the uv of every loop, or None if no face has uvs
+def __get_uvs(geometry_data, vertices, starts, sizes):
+    uvs = None
+
+    face_texmaps = geometry_data.face_texmaps.array
+    loop_texmaps = np.repeat(face_texmaps, sizes)
+    for texmap_index in np.unique(face_texmaps).tolist():
+        texmap = geometry_data.texmaps[texmap_index]
+        if texmap is None:
+            continue
+        loops = loop_texmaps == texmap_index
+        texmap_uvs = texmap.uv_unwrap_faces(vertices[loops])
+        if texmap_uvs is None:
+            continue
+        if uvs is None:
+            uvs = np.zeros((len(vertices), 2), dtype=np.float32)
+        uvs[loops] = texmap_uvs
+
+    faces = zip(starts.tolist(), sizes.tolist(), geometry_data.face_pe_texmaps.array.tolist())
+    for start, size, pe_texmap_index in faces:
+        pe_texmap = geometry_data.pe_texmaps[pe_texmap_index]
+        if pe_texmap is None:
+            continue
+        face_vertices = [tuple(vertex) for vertex in vertices[start:start + size].tolist()]
+        face_uvs = pe_texmap.uv_unwrap_face(face_vertices)
+        if face_uvs is None:
+            continue
+        if uvs is None:
+            uvs = np.zeros((len(vertices), 2), dtype=np.float32)
+        uvs[start:start + size] = face_uvs
+
+    return uvs
+
+
+# a part usually has only a few materials, so the faces are grouped by their color, texmap and pe_texmap
+# and the material and slot of each group are looked up once
+# returns the material index of every face
+def __get_material_indices(mesh, geometry_data, color_code, color_slots):
+    global material_face_count
+    global material_lookup_count
+
+    groups = np.stack((
+        geometry_data.face_colors.array,
+        geometry_data.face_texmaps.array,
+        geometry_data.face_pe_texmaps.array,
+    ), axis=1)
+    groups, first_faces, face_groups = np.unique(groups, axis=0, return_index=True, return_inverse=True)
+
+    part_slopes = special_bricks.get_part_slopes(geometry_data.file.name)
+    parts_cloth = special_bricks.get_parts_cloth(geometry_data.file.name)
+
+    slots = {}
+    for i, material in enumerate(mesh.materials):
+        if material is not None:
+            slots.setdefault(material.name, i)
+
+    # in the order of the first face of each group so the slots are in the order the faces use them
+    group_slots = np.empty(len(groups), dtype=np.int32)
+    for group in np.argsort(first_faces, kind="stable").tolist():
+        color_index, texmap_index, pe_texmap_index = groups[group].tolist()
+        face_color_code = geometry_data.color_codes[color_index]
+        texmap = geometry_data.texmaps[texmap_index]
+        pe_texmap = geometry_data.pe_texmaps[pe_texmap_index]
+
+        c = color_code if face_color_code == "16" else face_color_code
 
-        part_slopes = special_bricks.get_part_slopes(geometry_data.file.name)
-        parts_cloth = special_bricks.get_parts_cloth(geometry_data.file.name)
         material = BlenderMaterials.get_material(
             color_code=c,
             bfc_certified=geometry_data.bfc_certified,
             part_slopes=part_slopes,
             parts_cloth=parts_cloth,
-            texmap=face_data.texmap,
-            pe_texmap=face_data.pe_texmap,
+            texmap=texmap,
+            pe_texmap=pe_texmap,
         )
 
-        material_index = mesh.materials.find(material.name)
-        if material_index == -1:
+        material_index = slots.get(material.name)
+        if material_index is None:
             # mesh.materials.append(None) #add blank slot
+            material_index = len(mesh.materials)
             mesh.materials.append(material)
-            material_index = mesh.materials.find(material.name)
+            slots[material.name] = material_index
 
-        face.material_index = material_index
-        face.smooth = ImportOptions.shade_smooth
+        if c == "16":
+            color_slots[material_index] = (texmap, pe_texmap)
 
-        if face_data.texmap is not None:
-            face_data.texmap.uv_unwrap_face(bm, face)
+        group_slots[group] = material_index
 
-        if face_data.pe_texmap is not None:
-            face_data.pe_texmap.uv_unwrap_face(bm, face)
+    material_face_count += len(face_groups)
+    material_lookup_count += len(groups)
 
-    return bm
+    return group_slots[face_groups.reshape(-1)]
 
 
 def __clean_bmesh(bm):
-    if ImportOptions.remove_doubles:
-        bmesh.ops.remove_doubles(bm, verts=bm.verts[:], dist=ImportOptions.merge_distance)
-
     # recalculate_normals completely overwrites any bfc processing
     if ImportOptions.recalculate_normals:
         bmesh.ops.recalc_face_normals(bm, faces=bm.faces[:])
@@ -175,38 +295,32 @@ def __clean_bmesh(bm):
 
 def __process_mesh_sharp_edges(mesh, geometry_data):
     if ImportOptions.smooth_type_value() == "edge_split" or ImportOptions.use_freestyle_edges or ImportOptions.bevel_edges:
-        edge_indices = __get_edge_indices(mesh.vertices, geometry_data)
+        sharp_edges = __get_sharp_edges(mesh, geometry_data)
+        if not sharp_edges.any():
+            return
+
+        if ImportOptions.smooth_type_value() == "edge_split":
+            __set_edge_values(mesh.edges, "use_edge_sharp", sharp_edges, True)
+        if ImportOptions.use_freestyle_edges:
+            __set_edge_values(mesh.edges, "use_freestyle_mark", sharp_edges, True)
 
-        # If we need bevel edges, get a reference to the attribute data
-        # so we can assign bevel weights by index.
-        bevel_attr_data = None
         if ImportOptions.bevel_edges:
             if bpy.app.version < (4, 3):
-                pass
+                __set_edge_values(mesh.edges, "bevel_weight", sharp_edges, ImportOptions.bevel_weight)
             else:
                 if "bevel_weight_edge" not in mesh.attributes:
                     mesh.attributes.new(name="bevel_weight_edge", type='FLOAT', domain='EDGE')
+                # Instead of using edge.bevel_weight, we now assign the value to the attribute
                 bevel_attr_data = mesh.attributes["bevel_weight_edge"]
+                __set_edge_values(bevel_attr_data.data, "value", sharp_edges, ImportOptions.bevel_weight)
+
 
-        # we need i for indexing
-        # Original code was: for edge in mesh.edges:
-        # We'll use enumerate to index the edges for attribute assignment
-        for i, edge in enumerate(mesh.edges):
-            v0 = edge.vertices[0]
-            v1 = edge.vertices[1]
-            if (v0, v1) in edge_indices:
-                if ImportOptions.smooth_type_value() == "edge_split":
-                    edge.use_edge_sharp = True
-                if ImportOptions.use_freestyle_edges:
-                    edge.use_freestyle_mark = True
-
-                if ImportOptions.bevel_edges:
-                    if bpy.app.version < (4, 3):
-                        edge.bevel_weight = ImportOptions.bevel_weight
-                    else:
-                        if bevel_attr_data is not None:
-                            # Instead of using edge.bevel_weight, we now assign the value to the attribute
-                            bevel_attr_data.data[i].value = ImportOptions.bevel_weight
+# set attribute of the sharp edges to value and leave the others as they are
+def __set_edge_values(data, attribute, sharp_edges, value):
+    values = np.empty(len(sharp_edges), dtype=bool if isinstance(value, bool) else np.float32)
+    data.foreach_get(attribute, values)
+    values[sharp_edges] = value
+    data.foreach_set(attribute, values)
 
 
 def __process_mesh(mesh):
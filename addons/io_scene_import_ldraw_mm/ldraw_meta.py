@@ -1,11 +1,13 @@
 import bpy
 import mathutils
+import numpy as np
 
 from . import matrices
 from .import_options import ImportOptions
 from .pe_texmap import PETexInfo, PETexmap
 from .texmap import TexMap
 from .geometry_data import FaceData
+from .ldraw_core.matrix import transform as transform_vertices
 from . import group
 from . import helpers
 from . import ldraw_camera
@@ -511,13 +513,14 @@ def meta_texmap(ldraw_node, child_node, matrix):
             new_texmap.glossmap = glossmap
 
         if ldraw_node.texmap is not None:
-            ldraw_node.texmaps.append(ldraw_node.texmap)
+            ldraw_node.texmaps = (*ldraw_node.texmaps, ldraw_node.texmap)
         ldraw_node.texmap = new_texmap
 
 
 def set_texmap_end(ldraw_node):
     try:
-        ldraw_node.texmap = ldraw_node.texmaps.pop()
+        ldraw_node.texmap = ldraw_node.texmaps[-1]
+        ldraw_node.texmaps = ldraw_node.texmaps[:-1]
     except IndexError as e:
         print(e)
         import traceback
@@ -641,15 +644,20 @@ def meta_pe_tex_info(ldraw_node, child_node):
         return
 
     from . import base64_handler
-    image = base64_handler.named_png_from_base64_str(f"{ldraw_node.file.name}_{ldraw_node.current_pe_tex_path}.png", base64_str)
+    image_name = f"{ldraw_node.file.name}_{ldraw_node.current_pe_tex_path}.png"
+    base64_handler.add_embedded_image(image_name, base64_str, 0, len(base64_str))
 
-    pe_tex_info.image = image.name
+    pe_tex_info.image = image_name
 
     if ldraw_node.current_subfile_pe_tex_path is not None:
+        if ldraw_node.subfile_pe_tex_infos is ldraw_node.empty_mapping:
+            ldraw_node.subfile_pe_tex_infos = {}
         ldraw_node.subfile_pe_tex_infos.setdefault(ldraw_node.current_pe_tex_path, {})
         ldraw_node.subfile_pe_tex_infos[ldraw_node.current_pe_tex_path].setdefault(ldraw_node.current_subfile_pe_tex_path, [])
         ldraw_node.subfile_pe_tex_infos[ldraw_node.current_pe_tex_path][ldraw_node.current_subfile_pe_tex_path].append(pe_tex_info)
     else:
+        if ldraw_node.pe_tex_infos is ldraw_node.empty_mapping:
+            ldraw_node.pe_tex_infos = {}
         ldraw_node.pe_tex_infos.setdefault(ldraw_node.current_pe_tex_path, [])
         ldraw_node.pe_tex_infos[ldraw_node.current_pe_tex_path].append(pe_tex_info)
 
@@ -657,31 +665,128 @@ def meta_pe_tex_info(ldraw_node, child_node):
         ldraw_node.pe_tex_info = ldraw_node.pe_tex_infos[ldraw_node.current_pe_tex_path]
 
 
-def meta_edge(child_node, color_code, matrix, geometry_data):
-    vertices = [matrix @ v for v in child_node.vertices]
-
-    geometry_data.add_edge_data(
-        vertices=vertices,
-        color_code=color_code,
-    )
-
+# child_node is a run of consecutive geometry lines, see LDrawFile.__line_geometry
+def meta_geometry(ldraw_node, child_node, color_code, matrix, geometry_data, winding):
+    # lines are only skipped while in a texmap fallback block, and that can only end at a line if it is also texmap_next
+    if ldraw_node.texmap_fallback and not ldraw_node.texmap_next:
+        return
 
-def meta_face(ldraw_node, child_node, color_code, matrix, geometry_data, winding):
-    vertices = FaceData.handle_vertex_winding(child_node, matrix, winding)
-    pe_texmap = PETexmap.build_pe_texmap(ldraw_node, child_node, winding)
+    geometry = ldraw_node.file.geometry
+    starts = child_node.meta_args["starts"]
 
-    geometry_data.add_face_data(
-        vertices=vertices,
-        color_code=color_code,
-        texmap=ldraw_node.texmap,
-        pe_texmap=pe_texmap,
-    )
+    # a texmap that only applies to the next line and pe_tex uvs are handled line by line
+    # this is the only way a BakedGeometry is added to, since subfiles with either are never baked
+    if not ldraw_node.texmap_next and len(ldraw_node.pe_tex_info) < 1:
+        add_geometry(ldraw_node, child_node, color_code, matrix, geometry_data, winding)
+        return
 
+    # every vertex of each line type in the run is transformed at once
+    vertices = {}
+    colors = {}
+    for line_type, count in child_node.meta_args["counts"].items():
+        start = starts[line_type]
+        vertices[line_type] = geometry.transform(line_type, start, count, matrix)
+        colors[line_type] = geometry.get(line_type)[1][start:start + count].tolist()
+
+    indices = dict.fromkeys(vertices, 0)
+    for line_type in child_node.meta_args["line_types"]:
+        index = indices[line_type]
+        indices[line_type] += 1
+        line_index = starts[line_type] + index
+
+        # a line whose coordinates couldn't be read is left out like it was never in the file
+        if (line_type, line_index) in geometry.invalid_lines:
+            continue
+
+        if not ldraw_node.texmap_fallback:
+            line_color = colors[line_type][index]
+            if line_color == "16":
+                line_color = color_code
+
+            line_vertices = [mathutils.Vector(vertex) for vertex in vertices[line_type][index]]
+
+            if line_type == "2":
+                geometry_data.add_edge_data(
+                    vertices=line_vertices,
+                    color_code=line_color,
+                )
+            elif line_type == "5":
+                geometry_data.add_line_data(
+                    vertices=line_vertices,
+                    color_code=line_color,
+                )
+            else:
+                line_vertices = FaceData.handle_vertex_winding(line_vertices, winding)
+
+                pe_texmap = None
+                if len(ldraw_node.pe_tex_info) > 0:
+                    local_vertices = [mathutils.Vector(vertex) for vertex in geometry.get(line_type)[0][line_index].tolist()]
+                    clean_line = geometry.extended_lines.get((line_type, line_index))
+                    pe_texmap = PETexmap.build_pe_texmap(ldraw_node, clean_line, local_vertices, winding)
+
+                geometry_data.add_face_data(
+                    vertices=line_vertices,
+                    color_code=line_color,
+                    texmap=ldraw_node.texmap,
+                    pe_texmap=pe_texmap,
+                )
+
+        if ldraw_node.texmap_next:
+            set_texmap_end(ldraw_node)
 
-def meta_line(child_node, color_code, matrix, geometry_data):
-    vertices = [matrix @ v for v in child_node.vertices]
 
-    geometry_data.add_line_data(
-        vertices=vertices,
-        color_code=color_code,
-    )
+# add every line of the run to geometry_data at once
+# the lines of each type keep their order, and faces keep the order their 3 and 4 lines are in
+def add_geometry(ldraw_node, child_node, color_code, matrix, geometry_data, winding):
+    geometry = ldraw_node.file.geometry
+    starts = child_node.meta_args["starts"]
+
+    lines = {}
+    # line type -> which lines of the run could be read, only set if the file has lines that couldn't be
+    valid = {}
+    for line_type, count in child_node.meta_args["counts"].items():
+        start = starts[line_type]
+        vertices, colors = geometry.get(line_type)
+        vertices = vertices[start:start + count]
+        colors = colors[start:start + count]
+
+        # a line whose coordinates couldn't be read is left out like it was never in the file
+        if len(geometry.invalid_lines) > 0:
+            valid[line_type] = np.array([(line_type, line_index) not in geometry.invalid_lines for line_index in range(start, start + count)], dtype=bool)
+            vertices = vertices[valid[line_type]]
+            colors = colors[valid[line_type]]
+
+        lines[line_type] = (
+            transform_vertices(vertices, matrix),
+            np.where(colors == "16", color_code, colors),
+        )
+
+    if "2" in lines:
+        geometry_data.add_edges(*lines["2"])
+    if "5" in lines:
+        geometry_data.add_lines(*lines["5"])
+
+    if "3" in lines or "4" in lines:
+        line_types = np.frombuffer(child_node.meta_args["line_types"].encode(), dtype=np.uint8)
+        is_quad = line_types[(line_types == ord("3")) | (line_types == ord("4"))] == ord("4")
+        if len(valid) > 0:
+            valid_faces = np.empty(len(is_quad), dtype=bool)
+            if "3" in valid:
+                valid_faces[~is_quad] = valid["3"]
+            if "4" in valid:
+                valid_faces[is_quad] = valid["4"]
+            is_quad = is_quad[valid_faces]
+
+        vertices = np.empty((len(is_quad), 4, 3), dtype=np.float64)
+        colors = np.empty(len(is_quad), dtype=object)
+        if "3" in lines:
+            triangles, triangle_colors = lines["3"]
+            vertices[~is_quad, :3] = triangles
+            vertices[~is_quad, 3] = triangles[:, 2]
+            colors[~is_quad] = triangle_colors
+        if "4" in lines:
+            quads, quad_colors = lines["4"]
+            vertices[is_quad] = quads
+            colors[is_quad] = quad_colors
+
+        geometry_data.add_faces(vertices, is_quad, colors.astype(str), winding, texmap=ldraw_node.texmap)
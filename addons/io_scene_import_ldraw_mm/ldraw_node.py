@@ -1,6 +1,7 @@
 import uuid
+from types import MappingProxyType
 
-from .geometry_data import GeometryData
+from .geometry_data import GeometryData, BakedGeometry
 from .import_options import ImportOptions
 from . import group
 from . import ldraw_mesh
@@ -9,6 +10,45 @@ from . import ldraw_meta
 from . import matrices
 
 
+class LoadFrame:
+    """
+    The state of one LDrawNode while LDrawNode.load works through its file's child nodes.
+    """
+
+    __slots__ = (
+        "node",
+        "color_code",
+        "object_color_code",
+        "parent_matrix",
+        "accum_matrix",
+        "current_matrix",
+        "child_matrix",
+        "child_accum_matrix",
+        "geometry_data",
+        "geometry_data_key",
+        "accum_cull",
+        "accum_invert",
+        "collection",
+        "is_top",
+        "part_model",
+        "child_nodes",
+        "bake",
+        "index",
+        "local_cull",
+        "winding",
+        "invert_next",
+        "subfile_line_index",
+    )
+
+    def __init__(self):
+        self.bake = None
+        self.index = 0
+        self.local_cull = True
+        self.winding = "CCW"
+        self.invert_next = False
+        self.subfile_line_index = 0
+
+
 class LDrawNode:
     """
     A line of a file that has been processed into something usable.
@@ -20,12 +60,48 @@ class LDrawNode:
 
     key_map = {}
     geometry_datas = {}
+    baked_geometries = {}
+    plain_files = {}
+    bfc_certified_files = {}
+
+    # the meta commands a file can have and still be baked, see __bake
+    plain_commands = frozenset(("1", "geometry", "bfc"))
 
     @classmethod
     def reset_caches(cls):
         cls.part_count = 0
         cls.key_map.clear()
         cls.geometry_datas.clear()
+        cls.baked_geometries.clear()
+        cls.plain_files.clear()
+        cls.bfc_certified_files.clear()
+
+    __slots__ = (
+        "is_root",
+        "file",
+        "line",
+        "color_code",
+        "matrix",
+        "bfc_certified",
+        "meta_command",
+        "meta_args",
+        "texmap_start",
+        "texmap_next",
+        "texmap_fallback",
+        "texmaps",
+        "texmap",
+        "current_pe_tex_path",
+        "current_subfile_pe_tex_path",
+        "pe_tex_infos",
+        "subfile_pe_tex_infos",
+        "pe_tex_info",
+        "pe_tex_next_shear",
+    )
+
+    # every node starts with these instead of allocating its own empty containers
+    # they can't be changed, so a node is given its own container before anything is added to it
+    empty_tuple = ()
+    empty_mapping = MappingProxyType({})
 
     def __init__(self):
         self.is_root = False
@@ -33,24 +109,45 @@ class LDrawNode:
         self.line = ""
         self.color_code = "16"
         self.matrix = matrices.identity_matrix
-        self.vertices = []
         self.bfc_certified = None
         self.meta_command = None
-        self.meta_args = {}
+        self.meta_args = LDrawNode.empty_mapping
+
+        self.texmap_start = False
+        self.texmap_next = False
+        self.texmap_fallback = False
+        self.texmaps = LDrawNode.empty_tuple
+        self.texmap = None
+
+        self.current_pe_tex_path = None
+        self.current_subfile_pe_tex_path = None
+        self.pe_tex_infos = LDrawNode.empty_mapping
+        self.subfile_pe_tex_infos = LDrawNode.empty_mapping
+        self.pe_tex_info = LDrawNode.empty_tuple
+        self.pe_tex_next_shear = False
+
+    # clear the state a node picks up while it is loaded
+    # so a file reused by a later import loads the same way a newly parsed one does
+    def reset_state(self):
+        self.bfc_certified = None
 
         self.texmap_start = False
         self.texmap_next = False
         self.texmap_fallback = False
-        self.texmaps = []
+        self.texmaps = LDrawNode.empty_tuple
         self.texmap = None
 
         self.current_pe_tex_path = None
         self.current_subfile_pe_tex_path = None
-        self.pe_tex_infos = {}
-        self.subfile_pe_tex_infos = {}
-        self.pe_tex_info = []
+        self.pe_tex_infos = LDrawNode.empty_mapping
+        self.subfile_pe_tex_infos = LDrawNode.empty_mapping
+        self.pe_tex_info = LDrawNode.empty_tuple
         self.pe_tex_next_shear = False
 
+    # load used to call itself for every subfile line, which hit the recursion limit on deeply nested models
+    # and paid for a python call and its locals at every level of every part
+    # the nodes being loaded are now kept on an explicit stack of LoadFrames instead
+    # __enter is what load did before its loop over the child nodes, __exit is what it did after it
     def load(self,
              color_code="16",
              parent_matrix=None,
@@ -62,11 +159,136 @@ class LDrawNode:
              return_mesh=False,
              ):
 
-        if self.file.is_edge_logo() and not ImportOptions.display_logo:
-            return
-        if self.file.is_stud() and ImportOptions.no_studs:
+        # these can't change during an import, so they're only looked up once
+        display_logo = ImportOptions.display_logo
+        no_studs = ImportOptions.no_studs
+        meta_bfc = ImportOptions.meta_bfc
+
+        frame = self.__enter(color_code, parent_matrix, accum_matrix, geometry_data, accum_cull, accum_invert, parent_collection, display_logo, no_studs)
+        if frame is None:
             return
 
+        result = None
+        stack = [frame]
+        while stack:
+            frame = stack[-1]
+            node = frame.node
+            child_nodes = frame.child_nodes
+            child_matrix = frame.child_matrix
+
+            child_frame = None
+            while frame.index < len(child_nodes):
+                child_node = child_nodes[frame.index]
+                frame.index += 1
+                meta_command = child_node.meta_command
+
+                # self.texmap_fallback will only be true if ImportOptions.meta_texmap == True and you're on a fallback line
+                # if ImportOptions.meta_texmap == False, it will always be False
+                if meta_command == "1" and not node.texmap_fallback:
+                    child_current_color = LDrawNode.__determine_color(frame.color_code, child_node.color_code)
+                    child_node.texmap = node.texmap
+
+                    # if we have no pe_tex_info, try to get one from pe_tex_infos otherwise keep using the one we have
+                    # custom minifig head > 3626tex.dat (has no pe_tex) > 3626texshell.dat
+                    if len(node.pe_tex_info) < 1:
+                        child_node.pe_tex_info = node.pe_tex_infos.get(frame.subfile_line_index, LDrawNode.empty_tuple)
+                    else:
+                        child_node.pe_tex_info = node.pe_tex_info
+
+                    subfile_pe_tex_infos = node.subfile_pe_tex_infos.get(frame.subfile_line_index, LDrawNode.empty_mapping)
+                    if len(subfile_pe_tex_infos) > 0 and child_node.pe_tex_infos is LDrawNode.empty_mapping:
+                        child_node.pe_tex_infos = {}
+                    # don't replace the collection in case this file already has pe_tex_infos
+                    for k, v in subfile_pe_tex_infos.items():
+                        child_node.pe_tex_infos.setdefault(k, v)
+
+                    child_frame = child_node.__enter(
+                        child_current_color,
+                        child_matrix,
+                        frame.child_accum_matrix,
+                        frame.geometry_data,
+                        node.bfc_certified and frame.accum_cull and frame.local_cull,
+                        frame.accum_invert ^ frame.invert_next,  # xor
+                        frame.collection,
+                        display_logo,
+                        no_studs,
+                    )
+                    if child_frame is not None and frame.geometry_data is not None and LDrawNode.__can_bake(child_node):
+                        child_frame = child_node.__bake(child_frame)
+                    if child_frame is not None:
+                        # the rest of this subfile line is handled by __end_subfile once the child has been loaded
+                        break
+                    node.__end_subfile(frame, child_node)
+                    continue
+                elif meta_command == "geometry":
+                    _winding = None
+                    if node.bfc_certified and frame.accum_cull and frame.local_cull:
+                        _winding = frame.winding
+
+                    ldraw_meta.meta_geometry(
+                        node,
+                        child_node,
+                        frame.color_code,
+                        child_matrix,
+                        frame.geometry_data,
+                        _winding,
+                    )
+                elif meta_command == "bfc":
+                    # does it make sense for models to have bfc info? maybe if that model has geometry, but then it would be treated like a part
+                    if meta_bfc:
+                        frame.local_cull, frame.winding, frame.invert_next = ldraw_meta.meta_bfc(node, child_node, child_matrix, frame.local_cull, frame.winding, frame.invert_next, frame.accum_invert)
+                elif meta_command == "texmap":
+                    ldraw_meta.meta_texmap(node, child_node, child_matrix)
+                elif meta_command.startswith("pe_tex_"):
+                    ldraw_meta.meta_pe_tex(node, child_node)
+                else:
+                    # these meta commands really only make sense if they are encountered at the model level
+                    # these should never be encoutered when geometry_data not None
+                    # so they should be processed every time they are hit
+                    # as opposed to just once because they won't be cached
+                    if meta_command == "step":
+                        ldraw_meta.meta_step()
+                    elif meta_command == "save":
+                        ldraw_meta.meta_save()
+                    elif meta_command == "clear":
+                        ldraw_meta.meta_clear()
+                    elif meta_command == "print":
+                        ldraw_meta.meta_print(child_node)
+                    elif meta_command.startswith("group"):
+                        ldraw_meta.meta_group(child_node)
+                    # _*_lp_lc_mod
+                    elif meta_command == "leocad_camera":
+                        ldraw_meta.meta_lp_lc_camera(child_node, child_matrix)
+                    elif meta_command == "lpub3d_camera":
+                        ldraw_meta.meta_lp_lc_camera(child_node, child_matrix)
+                    elif meta_command == "leocad_light":
+                        ldraw_meta.meta_lp_lc_light(child_node, child_matrix)
+                    elif meta_command == "lpub3d_light":
+                        ldraw_meta.meta_lp_lc_light(child_node, child_matrix)
+                    # _*_mod_end
+
+                node.__end_line(frame, child_node)
+
+            if child_frame is not None:
+                stack.append(child_frame)
+                continue
+
+            # every child node of this frame has been loaded
+            stack.pop()
+            result = node.__exit(frame, return_mesh and not stack)
+            if stack:
+                parent_frame = stack[-1]
+                parent_frame.node.__end_subfile(parent_frame, parent_frame.child_nodes[parent_frame.index - 1])
+
+        # yield obj
+        return result
+
+    def __enter(self, color_code, parent_matrix, accum_matrix, geometry_data, accum_cull, accum_invert, parent_collection, display_logo, no_studs):
+        if self.file.is_edge_logo() and not display_logo:
+            return None
+        if self.file.is_stud() and no_studs:
+            return None
+
         LDrawNode.current_filename = self.file.name
 
         # keep track of the matrix and color up to this point
@@ -87,13 +309,6 @@ class LDrawNode:
         # current_color_code is the color_code up to this point
         current_color_code = color_code
 
-        # when a part is used on its own and also treated as a subpart like with a shortcut, the part will not render in the shortcut
-        # obj_key is essentially a list of attributes that are unique to parts that share the same file
-        # texmap parts are defined as parts so it should be safe to exclude that from the key
-        # pe_tex_info is defined like an mpd so mutliple instances sharing the same part name will share the same texture unless it is included in the key
-        # the only thing unique about a geometry_data object is its filename and whether it has pe_tex_info
-        geometry_data_key = LDrawNode.__build_key(self.file.name, color_code=current_color_code, pe_tex_info=self.pe_tex_info)
-
         # if there's no geometry_data and some part type, it's a top level part so start collecting geometry
         # there are occasions where files with part_type of model have geometry so you can't rely on its part_type
         # example: 10252 - 10252_towel.dat in 10252-1 - Volkswagen Beetle.mpd
@@ -121,6 +336,21 @@ class LDrawNode:
         part_model = False
         top_part = top_part or part_model
 
+        # when a part is used on its own and also treated as a subpart like with a shortcut, the part will not render in the shortcut
+        # obj_key is essentially a list of attributes that are unique to parts that share the same file
+        # texmap parts are defined as parts so it should be safe to exclude that from the key
+        # pe_tex_info is defined like an mpd so mutliple instances sharing the same part name will share the same texture unless it is included in the key
+        # the only thing unique about a geometry_data object is its filename and whether it has pe_tex_info
+        # the key is only used by top level parts, so subparts don't build one
+        # with share_part_meshes a part's geometry is collected in color 16 for every color it is used in
+        # and each object gives those faces its own color, see ldraw_object.create_object
+        if top_part and ImportOptions.share_part_meshes:
+            current_color_code = "16"
+
+        geometry_data_key = None
+        if top_part or merge_model:
+            geometry_data_key = LDrawNode.__build_key(self.file.name, color_code=current_color_code, pe_tex_info=self.pe_tex_info)
+
         if top_part:
             LDrawNode.part_count += 1
             geometry_data = LDrawNode.geometry_datas.get(geometry_data_key)
@@ -160,165 +390,203 @@ class LDrawNode:
         # always process geometry_data if this is a subpart or there is no geometry_data
         # if geometry_data exists, this is a top level part that has already been processed so don't process this key again
         is_top = top_part or merge_model or part_model
+        child_nodes = LDrawNode.empty_tuple
         if not is_top or geometry_data is None:
             if is_top:
                 geometry_data = GeometryData()
+            child_nodes = self.file.child_nodes
+
+        frame = LoadFrame()
+        frame.node = self
+        frame.color_code = current_color_code
+        frame.object_color_code = color_code
+        frame.parent_matrix = parent_matrix
+        frame.accum_matrix = accum_matrix
+        frame.current_matrix = current_matrix
+        frame.child_matrix = child_matrix
+        frame.child_accum_matrix = child_accum_matrix
+        frame.geometry_data = geometry_data
+        frame.geometry_data_key = geometry_data_key
+        frame.accum_cull = accum_cull
+        frame.accum_invert = accum_invert
+        frame.collection = collection
+        frame.is_top = is_top
+        frame.part_model = part_model
+        frame.child_nodes = child_nodes
+        return frame
+
+    # what is left of a subfile line after its child node has been loaded
+    def __end_subfile(self, frame, child_node):
+        frame.subfile_line_index += 1
+        ldraw_meta.meta_root_group_nxt(self, child_node)
+        self.__end_line(frame, child_node)
+
+    def __end_line(self, frame, child_node):
+        if self.texmap_next:
+            ldraw_meta.set_texmap_end(self)
+
+        if child_node.meta_command != "bfc":
+            frame.invert_next = False
+        elif child_node.meta_command == "bfc" and child_node.meta_args["command"] != "INVERTNEXT":
+            frame.invert_next = False
+
+    # a subfile of a part is usually a primitive like stud.dat that is used many times with the same bfc state
+    # so instead of walking it every time, it's baked into a BakedGeometry in its own space the first time
+    # and every later reference with the same state just transforms that
+    # the state is everything that decides the winding of its faces, including whether the matrix is mirrored
+    # a baking frame loads into the BakedGeometry in the space of bake_matrix with color code 16, __exit adds it to the part
+    # returns the frame to load, or None if the subfile was already baked
+    def __bake(self, frame):
+        matrix = frame.child_matrix
+        determinant = matrix.determinant()
+        # culling is turned off below a degenerate matrix, let those load like before
+        if determinant == 0:
+            return frame
+
+        # mirrored subfiles are baked mirrored, so meta_bfc sees the same determinant sign
+        bake_matrix = matrices.identity_matrix
+        if determinant < 0:
+            bake_matrix = matrices.mirror_matrix
+
+        key = (self.file.name, bool(frame.accum_cull), bool(frame.accum_invert), determinant < 0, LDrawNode.__file_bfc_certified(self.file))
+        baked_geometry = LDrawNode.baked_geometries.get(key)
+        if baked_geometry is not None:
+            baked_geometry.add_to(frame.geometry_data, matrix @ bake_matrix, frame.color_code)
+            return None
+
+        # a node keeps the bfc state it was left in by its last load, so the file is always baked from the start of its own state
+        self.bfc_certified = None
+        frame.bake = (key, frame.geometry_data, matrix @ bake_matrix, frame.color_code)
+        frame.geometry_data = BakedGeometry()
+        frame.child_matrix = bake_matrix
+        frame.color_code = "16"
+        return frame
+
+    # only subfiles with nothing but geometry, bfc and subfiles like that are baked
+    # a texmap or pe_tex depends on where the subfile is, so those are always walked
+    @staticmethod
+    def __can_bake(child_node):
+        if child_node.texmap is not None:
+            return False
+        if len(child_node.pe_tex_info) > 0 or len(child_node.pe_tex_infos) > 0:
+            return False
+        return LDrawNode.__is_plain(child_node.file)
+
+    # files are checked from an explicit stack like load, so a long chain of subfiles can't reach the recursion limit
+    # a file is plain if its own lines are and every file it references is
+    @staticmethod
+    def __is_plain(ldraw_file):
+        plain = LDrawNode.plain_files.get(ldraw_file)
+        if plain is not None:
+            return plain
+
+        # files whose own lines are plain and whose subfiles are still being checked
+        # a file that references itself, directly or through its subfiles, is never plain
+        checking = set()
+        stack = [(ldraw_file, False)]
+        while len(stack) > 0:
+            current_file, subfiles_checked = stack.pop()
+            if current_file in LDrawNode.plain_files:
+                continue
+
+            subfiles = [child_node.file for child_node in current_file.child_nodes if child_node.meta_command == "1"]
+
+            if subfiles_checked:
+                checking.discard(current_file)
+                LDrawNode.plain_files[current_file] = all(LDrawNode.plain_files.get(subfile, False) for subfile in subfiles)
+                continue
+
+            if not LDrawNode.__has_plain_lines(current_file):
+                LDrawNode.plain_files[current_file] = False
+                continue
+
+            checking.add(current_file)
+            stack.append((current_file, True))
+            for subfile in subfiles:
+                if subfile not in LDrawNode.plain_files and subfile not in checking:
+                    stack.append((subfile, False))
+
+        return LDrawNode.plain_files[ldraw_file]
+
+    # the bfc_certified a node is left with by loading ldraw_file from the start, see ldraw_meta.meta_bfc
+    # the first bfc line certifies the file unless it or a later one is NOCERTIFY
+    @staticmethod
+    def __file_bfc_certified(ldraw_file):
+        if ldraw_file in LDrawNode.bfc_certified_files:
+            return LDrawNode.bfc_certified_files[ldraw_file]
 
-            local_cull = True
-            winding = "CCW"
-            invert_next = False
-
-            subfile_line_index = 0
-            for child_node in self.file.child_nodes:
-                # self.texmap_fallback will only be true if ImportOptions.meta_texmap == True and you're on a fallback line
-                # if ImportOptions.meta_texmap == False, it will always be False
-                if child_node.meta_command in ["1", "2", "3", "4", "5"] and not self.texmap_fallback:
-                    child_current_color = LDrawNode.__determine_color(color_code, child_node.color_code)
-                    if child_node.meta_command == "1":
-                        child_node.texmap = self.texmap
-
-                        # if we have no pe_tex_info, try to get one from pe_tex_infos otherwise keep using the one we have
-                        # custom minifig head > 3626tex.dat (has no pe_tex) > 3626texshell.dat
-                        if len(self.pe_tex_info) < 1:
-                            child_node.pe_tex_info = self.pe_tex_infos.get(subfile_line_index, [])
-                        else:
-                            child_node.pe_tex_info = self.pe_tex_info
-
-                        subfile_pe_tex_infos = self.subfile_pe_tex_infos.get(subfile_line_index, {})
-                        # don't replace the collection in case this file already has pe_tex_infos
-                        for k, v in subfile_pe_tex_infos.items():
-                            child_node.pe_tex_infos.setdefault(k, v)
-
-                        child_node.load(
-                            color_code=child_current_color,
-                            parent_matrix=child_matrix,
-                            accum_matrix=child_accum_matrix,
-                            geometry_data=geometry_data,
-                            accum_cull=self.bfc_certified and accum_cull and local_cull,
-                            accum_invert=(accum_invert ^ invert_next),  # xor
-                            parent_collection=collection,
-                        )
-                        # for node in child_node.load(
-                        #         color_code=child_current_color,
-                        #         parent_matrix=child_matrix,
-                        #         geometry_data=geometry_data,
-                        #         accum_cull=self.bfc_certified and accum_cull and local_cull,
-                        #         accum_invert=(accum_invert ^ invert_next),  # xor
-                        #         parent_collection=collection,
-                        # ):
-                        #     yield node
-
-                        subfile_line_index += 1
-                        ldraw_meta.meta_root_group_nxt(self, child_node)
-                    elif child_node.meta_command == "2":
-                        ldraw_meta.meta_edge(
-                            child_node,
-                            child_current_color,
-                            child_matrix,
-                            geometry_data,
-                        )
-                    elif child_node.meta_command in ["3", "4"]:
-                        _winding = None
-                        if self.bfc_certified and accum_cull and local_cull:
-                            _winding = winding
-
-                        ldraw_meta.meta_face(
-                            self,
-                            child_node,
-                            child_current_color,
-                            child_matrix,
-                            geometry_data,
-                            _winding,
-                        )
-                    elif child_node.meta_command == "5":
-                        ldraw_meta.meta_line(
-                            child_node,
-                            child_current_color,
-                            child_matrix,
-                            geometry_data,
-                        )
-                elif child_node.meta_command == "bfc":
-                    # does it make sense for models to have bfc info? maybe if that model has geometry, but then it would be treated like a part
-                    if ImportOptions.meta_bfc:
-                        local_cull, winding, invert_next = ldraw_meta.meta_bfc(self, child_node, child_matrix, local_cull, winding, invert_next, accum_invert)
-                elif child_node.meta_command == "texmap":
-                    ldraw_meta.meta_texmap(self, child_node, child_matrix)
-                elif child_node.meta_command.startswith("pe_tex_"):
-                    ldraw_meta.meta_pe_tex(self, child_node)
-                else:
-                    # these meta commands really only make sense if they are encountered at the model level
-                    # these should never be encoutered when geometry_data not None
-                    # so they should be processed every time they are hit
-                    # as opposed to just once because they won't be cached
-                    if child_node.meta_command == "step":
-                        ldraw_meta.meta_step()
-                    elif child_node.meta_command == "save":
-                        ldraw_meta.meta_save()
-                    elif child_node.meta_command == "clear":
-                        ldraw_meta.meta_clear()
-                    elif child_node.meta_command == "print":
-                        ldraw_meta.meta_print(child_node)
-                    elif child_node.meta_command.startswith("group"):
-                        ldraw_meta.meta_group(child_node)
-                    # _*_lp_lc_mod
-                    elif child_node.meta_command == "leocad_camera":
-                        ldraw_meta.meta_lp_lc_camera(child_node, child_matrix)
-                    elif child_node.meta_command == "lpub3d_camera":
-                        ldraw_meta.meta_lp_lc_camera(child_node, child_matrix)
-                    elif child_node.meta_command == "leocad_light":
-                        ldraw_meta.meta_lp_lc_light(child_node, child_matrix)
-                    elif child_node.meta_command == "lpub3d_light":
-                        ldraw_meta.meta_lp_lc_light(child_node, child_matrix)
-                    # _*_mod_end
+        certified = None
+        if ImportOptions.meta_bfc:
+            for child_node in ldraw_file.child_nodes:
+                if child_node.meta_command != "bfc":
+                    continue
+                if "NOCERTIFY" in child_node.line.split()[2:]:
+                    certified = False
+                    break
+                certified = True
 
-                if self.texmap_next:
-                    ldraw_meta.set_texmap_end(self)
+        LDrawNode.bfc_certified_files[ldraw_file] = certified
+        return certified
 
-                if child_node.meta_command != "bfc":
-                    invert_next = False
-                elif child_node.meta_command == "bfc" and child_node.meta_args["command"] != "INVERTNEXT":
-                    invert_next = False
-
-        if is_top:
-            # geometry_data will not be None if this is a new mesh
-            # geometry_data will be None if the mesh already exists
-            if geometry_data_key not in LDrawNode.geometry_datas and geometry_data is not None:
-                geometry_data.key = geometry_data_key
-                geometry_data.file = self.file
-                geometry_data.bfc_certified = self.bfc_certified
-                LDrawNode.geometry_datas[geometry_data_key] = geometry_data
-            geometry_data = LDrawNode.geometry_datas[geometry_data_key]
-
-            obj_matrix = current_matrix
-
-            if part_model:
-                obj_matrix = self.matrix
-                obj_matrix = parent_matrix
-                obj_matrix = current_matrix
-                obj_matrix = child_matrix
-                obj_matrix = accum_matrix @ self.matrix
-
-            # blender mesh data is unique also based on color
-            # this means a geometry_data for a file is created only once, but a mesh is created for every color that uses that geometry_data
-            key = geometry_data.key
-            mesh = ldraw_mesh.create_mesh(key, geometry_data, color_code, return_mesh=return_mesh)
-            if return_mesh:
-                return mesh
-            obj = ldraw_object.create_object(mesh, geometry_data, color_code, obj_matrix, collection)
-
-            if ImportOptions.import_edges:
-                edge_key = f"e_{geometry_data.key}"
-                edge_mesh = ldraw_mesh.create_edge_mesh(edge_key, geometry_data)
-                edge_obj = ldraw_object.create_edge_obj(edge_mesh, geometry_data, color_code, obj, collection)
-
-            if group.end_next_collection:
-                group.next_collection = None
-
-            # if LDrawNode.part_count == 1:
-            #     raise BaseException("done")
-
-            # yield obj
-            return obj
+    @staticmethod
+    def __has_plain_lines(ldraw_file):
+        return all(child_node.meta_command in LDrawNode.plain_commands for child_node in ldraw_file.child_nodes)
+
+    def __exit(self, frame, return_mesh):
+        if frame.bake is not None:
+            key, geometry_data, matrix, color_code = frame.bake
+            baked_geometry = frame.geometry_data
+            baked_geometry.finish()
+            LDrawNode.baked_geometries[key] = baked_geometry
+            baked_geometry.add_to(geometry_data, matrix, color_code)
+
+        if not frame.is_top:
+            return None
+
+        color_code = frame.object_color_code
+        collection = frame.collection
+        geometry_data_key = frame.geometry_data_key
+        geometry_data = frame.geometry_data
+
+        # geometry_data will not be None if this is a new mesh
+        # geometry_data will be None if the mesh already exists
+        if geometry_data_key not in LDrawNode.geometry_datas and geometry_data is not None:
+            geometry_data.key = geometry_data_key
+            geometry_data.file = self.file
+            geometry_data.bfc_certified = self.bfc_certified
+            LDrawNode.geometry_datas[geometry_data_key] = geometry_data
+        geometry_data = LDrawNode.geometry_datas[geometry_data_key]
+
+        obj_matrix = frame.current_matrix
+
+        if frame.part_model:
+            obj_matrix = self.matrix
+            obj_matrix = frame.parent_matrix
+            obj_matrix = frame.current_matrix
+            obj_matrix = frame.child_matrix
+            obj_matrix = frame.accum_matrix @ self.matrix
+
+        # blender mesh data is unique also based on color
+        # this means a geometry_data for a file is created only once, but a mesh is created for every color that uses that geometry_data
+        # unless share_part_meshes is set, then the mesh is built in color 16
+        key = geometry_data.key
+        mesh = ldraw_mesh.create_mesh(key, geometry_data, frame.color_code, return_mesh=return_mesh)
+        if return_mesh:
+            return mesh
+        obj = ldraw_object.create_object(mesh, geometry_data, color_code, obj_matrix, collection)
+
+        if ImportOptions.import_edges:
+            edge_key = f"e_{geometry_data.key}"
+            edge_mesh = ldraw_mesh.create_edge_mesh(edge_key, geometry_data)
+            edge_obj = ldraw_object.create_edge_obj(edge_mesh, geometry_data, color_code, obj, collection)
+
+        if group.end_next_collection:
+            group.next_collection = None
+
+        # if LDrawNode.part_count == 1:
+        #     raise BaseException("done")
+
+        return obj
 
     # set the working color code to this file's
     # color code if it isn't color code 16
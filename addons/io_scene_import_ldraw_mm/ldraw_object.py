@@ -1,11 +1,14 @@
 import bpy
 
 from .import_options import ImportOptions
+from .blender_materials import BlenderMaterials
 from .ldraw_color import LDrawColor
 from . import group
 from . import strings
 from . import ldraw_props
 from . import ldraw_meta
+from . import ldraw_mesh
+from . import special_bricks
 from . import matrices
 from pathlib import Path
 
@@ -13,6 +16,9 @@ from pathlib import Path
 top_empty = None
 gap_scale_empty = None
 
+# mesh key -> the color codes of the objects that use that mesh
+mesh_color_codes = {}
+
 
 def reset_caches():
     global top_empty
@@ -20,6 +26,14 @@ def reset_caches():
 
     top_empty = None
     gap_scale_empty = None
+    mesh_color_codes.clear()
+
+
+# the number of meshes created for parts and how many more there would be with a mesh for every color
+def mesh_stats():
+    mesh_count = len(mesh_color_codes)
+    saved_count = sum(len(color_codes) for color_codes in mesh_color_codes.values()) - mesh_count
+    return mesh_count, saved_count
 
 
 # FIXME: this is a bottleneck for large files
@@ -37,6 +51,7 @@ def create_object(mesh, geometry_data, color_code, matrix, collection):
     obj.color = color.linear_color_a
 
     ldraw_props.set_props(obj, geometry_data.file, color_code)
+    __process_object_color_slots(obj, geometry_data, color_code)
     __process_top_object_matrix(obj, matrix)
     __process_top_object_edges(obj)
 
@@ -97,6 +112,31 @@ def create_edge_obj(mesh, geometry_data, color_code, obj, collection):
     return edge_obj
 
 
+# a mesh built in color 16 is shared by every color of its part
+# so the object links its own materials to the slots that have color 16 faces
+def __process_object_color_slots(obj, geometry_data, color_code):
+    mesh_color_codes.setdefault(geometry_data.key, set()).add(color_code)
+
+    color_slots = ldraw_mesh.object_color_slots.get(geometry_data.key)
+    if not color_slots or color_code == "16":
+        return
+
+    part_slopes = special_bricks.get_part_slopes(geometry_data.file.name)
+    parts_cloth = special_bricks.get_parts_cloth(geometry_data.file.name)
+    for index, (texmap, pe_texmap) in color_slots.items():
+        material = BlenderMaterials.get_material(
+            color_code=color_code,
+            bfc_certified=geometry_data.bfc_certified,
+            part_slopes=part_slopes,
+            parts_cloth=parts_cloth,
+            texmap=texmap,
+            pe_texmap=pe_texmap,
+        )
+        material_slot = obj.material_slots[index]
+        material_slot.link = "OBJECT"
+        material_slot.material = material
+
+
 def __process_top_object_matrix(obj, obj_matrix):
     global top_empty
 
@@ -0,0 +1,141 @@
+import os
+import json
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+
+from .ldraw_file import LDrawFile
+from . import helpers
+
+
+class LibraryCatalog:
+    """
+    The header fields and subfile references of every LDraw file in a folder, for inventories, search and cache keys.
+    Files are read with LDrawFile.scan_file, so no nodes or geometry are built.
+    """
+
+    catalog_version = 1
+
+    extensions = (".dat", ".ldr", ".mpd")
+
+    # the LDrawFile fields kept for each file
+    fields = (
+        "name",
+        "description",
+        "author",
+        "part_type",
+        "actual_part_type",
+        "optional_qualifier",
+        "update_date",
+        "license",
+        "category",
+        "keywords",
+    )
+
+    @classmethod
+    def scan_dir(cls, library_path, header_only=False, workers=8, errors=None):
+        """Scan every LDraw file under library_path on a pool of workers threads.
+        Returns a dict of path relative to library_path -> entry, sorted by path.
+        If errors is given, it is filled with path -> error messages for files that couldn't be read or had lines that couldn't be."""
+
+        paths = []
+        for root, dirs, files in os.walk(library_path):
+            dirs[:] = sorted(d for d in dirs if not d.startswith("."))
+            for file in files:
+                if file.lower().endswith(cls.extensions):
+                    paths.append(os.path.join(root, file))
+
+        def scan(filepath):
+            try:
+                stat = os.stat(filepath)
+            except OSError:
+                return filepath, None, None
+            return filepath, stat, LDrawFile.scan_file(filepath, header_only=header_only)
+
+        entries = {}
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            for filepath, stat, ldraw_file in executor.map(scan, paths):
+                rel_path = os.path.relpath(filepath, library_path).replace(os.path.sep, "/")
+                if ldraw_file is None:
+                    if errors is not None:
+                        errors[rel_path] = ["file could not be read"]
+                    continue
+                if ldraw_file.scan_errors and errors is not None:
+                    errors[rel_path] = ldraw_file.scan_errors
+                entries[rel_path] = cls.__entry(ldraw_file, stat)
+
+        return dict(sorted(entries.items()))
+
+    @classmethod
+    def __entry(cls, ldraw_file, stat):
+        entry = {field: getattr(ldraw_file, field) for field in cls.fields}
+        entry["size"] = stat.st_size
+        entry["mtime"] = stat.st_mtime
+        entry["subfiles"] = list(dict.fromkeys(ldraw_file.subfile_names))
+        return entry
+
+    @classmethod
+    def build(cls, library_path, catalog_path, header_only=False, workers=8, errors=None):
+        """Scan library_path and write the catalog to catalog_path.
+        A .db, .sqlite or .sqlite3 catalog_path is written as SQLite, anything else as JSON.
+        Returns the number of files in the catalog, errors is filled the same way scan_dir fills it."""
+
+        entries = cls.scan_dir(library_path, header_only=header_only, workers=workers, errors=errors)
+        if catalog_path.lower().endswith((".db", ".sqlite", ".sqlite3")):
+            cls.write_sqlite(catalog_path, library_path, header_only, entries)
+        else:
+            cls.write_json(catalog_path, library_path, header_only, entries)
+        return len(entries)
+
+    @classmethod
+    def write_json(cls, catalog_path, library_path, header_only, entries):
+        helpers.write_json(catalog_path, {
+            "version": cls.catalog_version,
+            "library_path": library_path,
+            "header_only": header_only,
+            "files": entries,
+        })
+
+    # category and keywords are stored as JSON lists, each subfile reference is a row of subfiles
+    @classmethod
+    def write_sqlite(cls, catalog_path, library_path, header_only, entries):
+        with sqlite3.connect(catalog_path) as connection:
+            connection.executescript("""
+                DROP TABLE IF EXISTS catalog;
+                DROP TABLE IF EXISTS files;
+                DROP TABLE IF EXISTS subfiles;
+                CREATE TABLE catalog (key TEXT PRIMARY KEY, value TEXT);
+                CREATE TABLE files (
+                    path TEXT PRIMARY KEY,
+                    name TEXT,
+                    description TEXT,
+                    author TEXT,
+                    part_type TEXT,
+                    actual_part_type TEXT,
+                    optional_qualifier TEXT,
+                    update_date TEXT,
+                    license TEXT,
+                    category TEXT,
+                    keywords TEXT,
+                    size INTEGER,
+                    mtime REAL
+                );
+                CREATE TABLE subfiles (path TEXT, subfile TEXT);
+                CREATE INDEX subfiles_subfile ON subfiles (subfile);
+            """)
+            connection.executemany("INSERT INTO catalog VALUES (?, ?)", [
+                ("version", str(cls.catalog_version)),
+                ("library_path", library_path),
+                ("header_only", json.dumps(header_only)),
+            ])
+            connection.executemany(f"INSERT INTO files VALUES ({', '.join(['?'] * 13)})", [
+                (
+                    path,
+                    *(json.dumps(entry[field]) if isinstance(entry[field], list) else entry[field] for field in cls.fields),
+                    entry["size"],
+                    entry["mtime"],
+                ) for path, entry in entries.items()
+            ])
+            connection.executemany("INSERT INTO subfiles VALUES (?, ?)", [
+                (path, subfile) for path, entry in entries.items() for subfile in entry["subfiles"]
+            ])
+        connection.close()
@@ -0,0 +1,154 @@
+import os
+
+from .definitions import APP_ROOT
+from . import helpers
+
+
+class LibraryIndex:
+    """
+    A single lowercase name -> location map for every search path and archive entry.
+    Directory scans are persisted to disk and reused as long as the mtimes of the directories they were built from do not change.
+    """
+
+    index_path = os.path.join('.cache', 'library_index.json')
+    index_version = 1
+
+    # root folders only map the files directly inside them
+    # every other search path also maps its immediate subfolders - parts/s, p/48, p/8, parts/textures
+    root_depth = 1
+    search_depth = 2
+
+    __scans = None
+    __names = {}
+
+    @classmethod
+    def reset_caches(cls):
+        cls.__names.clear()
+
+    @staticmethod
+    def normalize(filename):
+        return str(filename).replace("\\", "/").lower()
+
+    @classmethod
+    def get(cls, filename):
+        return cls.__names.get(cls.normalize(filename))
+
+    @classmethod
+    def items(cls):
+        return cls.__names.items()
+
+    @classmethod
+    def build(cls, search_dirs, root_dirs, archive_search_paths=None, archive_entries=None):
+        """
+        search_dirs are merged in order, the first folder that has a name wins
+        archive entries are only used when no folder has that name, which matches the order FileSystem.locate used
+        archive_entries is a list of (library, keys) in the order they should be searched
+        """
+
+        if cls.__scans is None:
+            cls.__scans = cls.__load_scans()
+
+        changed = False
+        names = {}
+        for search_dir in search_dirs:
+            depth = cls.root_depth if search_dir in root_dirs else cls.search_depth
+            key = f"{depth}|{search_dir}"
+
+            scan = cls.__scans.get(key)
+            if scan is None or not cls.__is_valid(scan):
+                scan = cls.__scan_dir(search_dir, depth)
+                cls.__scans[key] = scan
+                changed = True
+
+            for rel_path in scan["files"]:
+                names.setdefault(rel_path.lower(), os.path.join(search_dir, rel_path.replace("/", os.path.sep)))
+
+        if archive_search_paths and archive_entries:
+            cls.__merge_archive_entries(names, archive_search_paths, archive_entries)
+
+        cls.__names = names
+
+        if changed:
+            helpers.write_json(cls.index_path, {
+                "version": cls.index_version,
+                "scans": cls.__scans,
+            })
+
+        return names
+
+    # an archive key is found by FileSystem.locate as f"{archive_search_path}/{name}"
+    # so map every entry to the name it is found by for the earliest search path it is under
+    @staticmethod
+    def __merge_archive_entries(names, archive_search_paths, archive_entries):
+        ranks = {}
+        for rank, path in enumerate(archive_search_paths):
+            ranks.setdefault(path.lower(), rank)
+
+        best = {}
+        for library, keys in archive_entries:
+            for archive_key in keys:
+                index = archive_key.find("/")
+                while index != -1:
+                    rank = ranks.get(archive_key[:index])
+                    if rank is not None:
+                        name = archive_key[index + 1:]
+                        current = best.get(name)
+                        if current is None or rank < current[0]:
+                            best[name] = (rank, [library, archive_key])
+                    index = archive_key.find("/", index + 1)
+
+        for name, (rank, location) in best.items():
+            names.setdefault(name, location)
+
+    @classmethod
+    def __load_scans(cls):
+        full_path = os.path.join(APP_ROOT, cls.index_path)
+        if not os.path.exists(full_path):
+            return {}
+
+        data = helpers.read_json(cls.index_path, {})
+        if not isinstance(data, dict) or data.get("version") != cls.index_version:
+            return {}
+        return data.get("scans", {})
+
+    @staticmethod
+    def __get_mtime(path):
+        try:
+            return os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+
+    @classmethod
+    def __is_valid(cls, scan):
+        for path, mtime in scan["dirs"].items():
+            if cls.__get_mtime(path) != mtime:
+                return False
+        return True
+
+    # mirrors the glob patterns that were used to build the lowercase path map
+    # hidden files are skipped the same way glob skips them
+    @classmethod
+    def __scan_dir(cls, search_dir, depth):
+        dirs = {}
+        files = []
+
+        stack = [("", 1)]
+        while stack:
+            rel_dir, level = stack.pop()
+            full_dir = os.path.join(search_dir, rel_dir.replace("/", os.path.sep)) if rel_dir else search_dir
+            dirs[full_dir] = cls.__get_mtime(full_dir)
+            try:
+                with os.scandir(full_dir) as entries:
+                    for entry in entries:
+                        if entry.name.startswith("."):
+                            continue
+                        rel_path = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+                        if entry.is_dir():
+                            if level < depth:
+                                stack.append((rel_path, level + 1))
+                        else:
+                            files.append(rel_path)
+            except OSError:
+                continue
+
+        return {"dirs": dirs, "files": files}
@@ -14,6 +14,7 @@ auto_smooth_angle = math.radians(auto_smooth_angle_deg)  # 1.56905
 identity_matrix = mathutils.Matrix.Identity(4).freeze()
 rotation_matrix = mathutils.Matrix.Rotation(math.radians(-90), 4, 'X').freeze()  # rotate -90 degrees on X axis to make -Y up
 reverse_rotation_matrix = mathutils.Matrix.Rotation(math.radians(90), 4, 'X').freeze()  # rotate 90 degrees on X axis to make Y up
+mirror_matrix = mathutils.Matrix.Scale(-1, 4, (1, 0, 0)).freeze()  # mirror on X, its determinant is negative
 import_scale_matrix = mathutils.Matrix.Scale(ImportOptions.import_scale, 4).freeze()
 gap_scale_matrix = mathutils.Matrix.Scale(ImportOptions.gap_scale, 4).freeze()
 
@@ -200,6 +200,20 @@ class IMPORT_OT_do_ldraw_import(bpy.types.Operator, ImportHelper):
         **ImportSettings.settings_dict('no_studs'),
     )
 
+    prefetch_workers: bpy.props.IntProperty(
+        name="Prefetch workers",
+        description="Number of threads that read and parse the files a model uses before it is loaded. 0 reads each file when it is first used",
+        **ImportSettings.settings_dict('prefetch_workers'),
+        min=0,
+        max=64,
+    )
+
+    share_part_meshes: bpy.props.BoolProperty(
+        name="Share part meshes",
+        description="Build one mesh for every part instead of one for every color it is used in. Color 16 faces get their material from the object",
+        **ImportSettings.settings_dict('share_part_meshes'),
+    )
+
     parent_to_empty: bpy.props.BoolProperty(
         name="Parent to empty",
         description="Parent the model to an empty",
@@ -519,6 +533,8 @@ class IMPORT_OT_do_ldraw_import(bpy.types.Operator, ImportHelper):
             self.import_edges            = self.prefs.get("import_edges", self.import_edges)
             self.treat_shortcut_as_model = self.prefs.get("treat_shortcut_as_model", self.treat_shortcut_as_model)
             self.no_studs                = self.prefs.get("no_studs", self.no_studs)
+            self.prefetch_workers        = self.prefs.get("prefetch_workers", self.prefetch_workers)
+            self.share_part_meshes       = self.prefs.get("share_part_meshes", self.share_part_meshes)
 
             self.profile                 = self.prefs.get("profile", self.profile)
             self.verbose                 = self.prefs.get("verbose", self.verbose)
@@ -584,6 +600,8 @@ class IMPORT_OT_do_ldraw_import(bpy.types.Operator, ImportHelper):
             self.prefs["import_edges"]            = self.import_edges
             self.prefs["treat_shortcut_as_model"] = self.treat_shortcut_as_model
             self.prefs["no_studs"]                = self.no_studs
+            self.prefs["prefetch_workers"]        = self.prefetch_workers
+            self.prefs["share_part_meshes"]       = self.share_part_meshes
 
             self.prefs["profile"]                 = self.profile
             self.prefs["verbose"]                 = self.verbose
@@ -742,6 +760,8 @@ class IMPORT_OT_do_ldraw_import(bpy.types.Operator, ImportHelper):
         box.prop(self, "import_edges")
         box.prop(self, "treat_shortcut_as_model")
         box.prop(self, "no_studs")
+        box.prop(self, "prefetch_workers")
+        box.prop(self, "share_part_meshes")
         box.prop(self, "verbose")
         box.prop(self, "profile")
         # _*_mod_end
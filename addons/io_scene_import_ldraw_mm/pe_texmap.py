@@ -36,25 +36,27 @@ class PETexmap:
         self.texture = None
         self.uvs = []
 
-    def uv_unwrap_face(self, bm, face):
+    # vertices are the coordinates of a face's vertices in loop order
+    # returns the uv of each of them, or None if there are no uvs
+    def uv_unwrap_face(self, vertices):
         if not self.uvs:
-            return
+            return None
 
-        uv_layer = bm.loops.layers.uv.verify()
         uvs = {}
-        for i, loop in enumerate(face.loops):
-            p = loop.vert.co.copy().freeze()
-            if p not in uvs:
-                uvs[p] = self.uvs[i]
-            loop[uv_layer].uv = uvs[p]
+        for i, vertex in enumerate(vertices):
+            if vertex not in uvs:
+                uvs[vertex] = self.uvs[i]
+        return [uvs[vertex] for vertex in vertices]
 
     @staticmethod
-    def build_pe_texmap(ldraw_node, child_node, winding):
-        # child_node is a 3 or 4 line
-        clean_line = child_node.line
-        _params = clean_line.split()[2:]
+    def build_pe_texmap(ldraw_node, clean_line, local_vertices, winding):
+        # local_vertices are the untransformed vertices of a 3 or 4 line
+        # clean_line is only given for lines with more parameters than their vertices, see GeometryLines.extended_lines
+        _params = []
+        if clean_line is not None:
+            _params = clean_line.split()[2:]
 
-        vert_count = len(child_node.vertices)
+        vert_count = len(local_vertices)
 
         pe_texmap = None
         for pp in ldraw_node.pe_tex_info:
@@ -90,7 +92,7 @@ class PETexmap:
 
                 p.init_with_target_part_matrix(ldraw_node.matrix)
 
-                vertices = [p.matrix_inverse @ v for v in child_node.vertices]
+                vertices = [p.matrix_inverse @ v for v in local_vertices]
                 if winding == 'CW':
                     vertices.reverse()
 
@@ -1,3 +1,4 @@
 ldraw_filename_key = "ldraw_filename"
 ldraw_color_code_key = "ldraw_color_code"
 ldraw_color_name_key = "ldraw_color_name"
+ldraw_image_hash_key = "ldraw_image_hash"
@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+"""
+Copyright (c) 2025 by Trevor SANDY
+
+LPub3D Blender LDraw Addon GPLv3 license.
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 2
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program; if not, write to the Free Software Foundation,
+Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+
+LPub3D Benchmark LDraw Import
+
+This file imports one model with the LDraw Import MM addon and reports how long it took and the peak memory
+(resident set size) of the Blender process, so a change can be measured by running it before and after on the same model.
+
+The import settings saved by the addon (config/ImportOptions.json) are used.
+Peak memory is for the whole process, so run each measurement in a new Blender.
+
+To Run (Windows example):
+- Prerequisites
+    - Blender 2.82 or later
+    - The Blender LDraw addons installed with install_blender_ldraw_addons.py
+- Open Windows command terminal (cmd.exe) and navigate to this script directory.
+- Execute Command
+    - <Blender Path>/blender --background --factory-startup --python benchmark_ldraw_import.py -- <arguments>
+    - Example: %PROFILE%\\Projects\\blender-4.5.1-windows-x64\\blender.exe --background --factory-startup --python benchmark_ldraw_import.py -- -f "10294 - Titanic.mpd"
+    - Example: %PROFILE%\\Projects\\blender-4.5.1-windows-x64\\blender.exe --background --factory-startup --python benchmark_ldraw_import.py -- -gp 10000 -gd 50
+- Arguments:
+    -f, --filepath            LDraw model to import
+    -gp, --generate_parts     Generate and import a model with this many parts instead of --filepath, rounded up to a multiple of 100
+    -gd, --generate_depth     Number of submodels each part of the generated model is nested in, defaults to 8
+    -gn, --generate_part      Library part used by the generated model, defaults to 3001.dat
+    -mn, --module_name        LDraw Import MM module name, defaults to io_scene_import_ldraw_mm
+
+The generated model is written to the temp folder. Every 100 parts are in a leaf submodel that is reached through
+a chain of --generate_depth submodels, so it measures how the import walks deeply nested models as well as many parts.
+"""
+
+import os
+import sys
+import time
+import tempfile
+import importlib
+import traceback
+
+from pathlib import Path
+
+parent_dir = Path(__file__).parent
+
+sys.path.append(str(os.path.join(parent_dir, "setup")))
+sys.path.append(str(os.path.join(parent_dir, "addons")))
+
+from addon_setup.arguments import BlenderArgumentParser
+
+
+def parse_arguments():
+    arg_parser = BlenderArgumentParser(
+        description='Measure the time and peak memory of an LDraw Import MM import.')
+    arg_parser.add_argument("-f", "--filepath",
+                            help="LDraw model to import")
+    arg_parser.add_argument("-gp", "--generate_parts", type=int,
+                            help="Generate and import a model with this many parts instead of --filepath")
+    arg_parser.add_argument("-gd", "--generate_depth", type=int, default=8,
+                            help="Number of submodels each part of the generated model is nested in")
+    arg_parser.add_argument("-gn", "--generate_part", default="3001.dat",
+                            help="Library part used by the generated model")
+    arg_parser.add_argument("-mn", "--module_name", default="io_scene_import_ldraw_mm",
+                            help="LDraw Import MM module name")
+    return arg_parser.parse_args()
+
+
+def peak_rss():
+    """Return the peak resident set size of this process in bytes"""
+
+    if sys.platform == "win32":
+        import ctypes
+        from ctypes import wintypes
+
+        class ProcessMemoryCounters(ctypes.Structure):
+            _fields_ = [
+                ("cb", wintypes.DWORD),
+                ("PageFaultCount", wintypes.DWORD),
+                ("PeakWorkingSetSize", ctypes.c_size_t),
+                ("WorkingSetSize", ctypes.c_size_t),
+                ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                ("PagefileUsage", ctypes.c_size_t),
+                ("PeakPagefileUsage", ctypes.c_size_t),
+            ]
+
+        counters = ProcessMemoryCounters()
+        counters.cb = ctypes.sizeof(counters)
+        get_process_memory_info = ctypes.windll.psapi.GetProcessMemoryInfo
+        get_process_memory_info.argtypes = [wintypes.HANDLE, ctypes.POINTER(ProcessMemoryCounters), wintypes.DWORD]
+        get_process_memory_info(ctypes.windll.kernel32.GetCurrentProcess(), ctypes.byref(counters), counters.cb)
+        return counters.PeakWorkingSetSize
+
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    if sys.platform == "darwin":
+        return peak
+    return peak * 1024
+
+
+def generate_model(part_count, depth, part_name):
+    """Write an MPD with at least part_count parts to the temp folder and return its path"""
+
+    leaf_size = 100
+    colors = ("1", "4", "14", "15", "16")
+    leaf_count = max(1, -(-part_count // leaf_size))
+    depth = max(1, depth)
+
+    lines = ["0 FILE main.ldr", "0 Generated benchmark model", "0 Name: main.ldr", "0 Author: benchmark_ldraw_import.py", ""]
+    for i in range(leaf_count):
+        x = (i % 10) * 400
+        z = (i // 10) * 400
+        lines.append(f"1 16 {x} 0 {z} 1 0 0 0 1 0 0 0 1 level_1.ldr")
+
+    for level in range(1, depth + 1):
+        subfile = f"level_{level + 1}.ldr" if level < depth else "leaf.ldr"
+        lines += ["", f"0 FILE level_{level}.ldr", f"0 Level {level}", f"0 Name: level_{level}.ldr", "0 !LDRAW_ORG Unofficial_Model", ""]
+        lines.append(f"1 16 0 -24 0 1 0 0 0 1 0 0 0 1 {subfile}")
+        lines.append("0 STEP")
+
+    lines += ["", "0 FILE leaf.ldr", "0 Leaf", "0 Name: leaf.ldr", "0 !LDRAW_ORG Unofficial_Model", ""]
+    for i in range(leaf_size):
+        x = (i % 10) * 40
+        z = (i // 10) * 40
+        lines.append(f"1 {colors[i % len(colors)]} {x} 0 {z} 1 0 0 0 1 0 0 0 1 {part_name}")
+
+    filepath = os.path.join(tempfile.gettempdir(), f"ldraw_benchmark_{leaf_count * leaf_size}_{depth}.mpd")
+    with open(filepath, "w", encoding="utf-8", newline="\r\n") as file:
+        file.write("\n".join(lines) + "\n")
+    return filepath
+
+
+def benchmark_ldraw_import():
+    options = parse_arguments()
+
+    if options.generate_parts:
+        filepath = generate_model(options.generate_parts, options.generate_depth, options.generate_part)
+        print(f"INFO: generated {filepath}")
+    elif options.filepath:
+        filepath = os.path.abspath(options.filepath)
+    else:
+        print("ERROR: --filepath or --generate_parts is required")
+        sys.exit(1)
+
+    assert os.path.isfile(filepath), f"LDraw model not found: {filepath}"
+
+    try:
+        blender_import = importlib.import_module(f"{options.module_name}.blender_import")
+        ImportSettings = importlib.import_module(f"{options.module_name}.import_settings").ImportSettings
+        ImportSettings.load_settings()
+    except Exception:
+        traceback.print_exc()
+        sys.exit(1)
+
+    start_peak = peak_rss()
+    start = time.perf_counter()
+    blender_import.do_import(filepath)
+    elapsed = time.perf_counter() - start
+    end_peak = peak_rss()
+
+    print(f"INFO: {os.path.basename(filepath)} imported in {elapsed:.2f}s")
+    print(f"INFO: peak RSS {end_peak / 2 ** 20:.1f} MB "
+          f"({start_peak / 2 ** 20:.1f} MB before the import, +{(end_peak - start_peak) / 2 ** 20:.1f} MB)")
+
+
+if __name__ == '__main__':
+    benchmark_ldraw_import()
@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+"""
+Copyright (c) 2025 by Trevor SANDY
+
+LPub3D Blender LDraw Addon GPLv3 license.
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 2
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program; if not, write to the Free Software Foundation,
+Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+
+LPub3D Benchmark LDraw Parse
+
+This file measures the LDraw parsing core (io_scene_import_ldraw_mm/ldraw_core) on its own, without Blender.
+Each file is decoded, its mpd sections are indexed and split into lines, its type 1 lines are parsed into
+matrices and its type 2-5 lines are decoded into vertex arrays.
+
+To Run:
+- Prerequisites
+    - Python 3.7 or later with NumPy
+- Open a command terminal and navigate to this script directory.
+- Execute Command
+    - python benchmark_ldraw_parse.py <arguments>
+    - Example: python benchmark_ldraw_parse.py -f "10294 - Titanic.mpd" -r 5
+- Arguments:
+    -f, --filepath   LDraw file or folder of LDraw files to parse, can be given more than once
+    -r, --repeat     Number of times to parse the files, the fastest time is reported, defaults to 3
+"""
+
+import os
+import sys
+import time
+import argparse
+
+from pathlib import Path
+
+parent_dir = Path(__file__).parent
+
+sys.path.append(str(os.path.join(parent_dir, "addons", "io_scene_import_ldraw_mm")))
+
+from ldraw_core import text as ldraw_text
+from ldraw_core import matrix as ldraw_matrix
+from ldraw_core.geometry_lines import GeometryLines
+
+
+def parse_arguments():
+    arg_parser = argparse.ArgumentParser(
+        description='Measure the LDraw parsing core without Blender.')
+    arg_parser.add_argument("-f", "--filepath", action="append", required=True,
+                            help="LDraw file or folder of LDraw files to parse, can be given more than once")
+    arg_parser.add_argument("-r", "--repeat", type=int, default=3,
+                            help="Number of times to parse the files, the fastest time is reported")
+    return arg_parser.parse_args()
+
+
+def ldraw_files(filepaths):
+    files = []
+    for filepath in filepaths:
+        if os.path.isdir(filepath):
+            for root, dirs, names in os.walk(filepath):
+                files.extend(os.path.join(root, name) for name in names if name.lower().endswith((".dat", ".ldr", ".mpd")))
+        else:
+            files.append(filepath)
+    return sorted(files)
+
+
+def parse_lines(lines, counts):
+    geometry = GeometryLines()
+    for line in lines:
+        clean_line = ldraw_text.clean_line(line)
+        if clean_line == "":
+            continue
+        counts["lines"] += 1
+
+        line_type = clean_line.split(" ", 1)[0]
+        if line_type == "1":
+            color_code, values, filename = ldraw_matrix.subfile_params(clean_line, line.strip())
+            ldraw_matrix.subfile_matrix(values)
+            counts["subfiles"] += 1
+        elif line_type in GeometryLines.line_types:
+            _params = clean_line.split()
+            try:
+                geometry.add(line_type, clean_line, _params)
+            except IndexError:
+                continue
+            counts["geometry"] += 1
+    geometry.finalize()
+
+
+def parse_file(filepath, counts):
+    text = ldraw_text.read_text(filepath)
+    if ldraw_text.is_mpd(text):
+        first_filename, sections, data_blocks = ldraw_text.index_mpd(text)
+        for filename, start, end in sections:
+            parse_lines(text[start:end].splitlines(), counts)
+    else:
+        parse_lines(text.splitlines(), counts)
+
+
+def benchmark_ldraw_parse():
+    options = parse_arguments()
+
+    files = ldraw_files(options.filepath)
+    assert len(files) > 0, "No LDraw files found"
+
+    size = sum(os.path.getsize(file) for file in files)
+
+    times = []
+    for _ in range(max(1, options.repeat)):
+        counts = {"lines": 0, "subfiles": 0, "geometry": 0}
+        start = time.perf_counter()
+        for file in files:
+            parse_file(file, counts)
+        times.append(time.perf_counter() - start)
+
+    elapsed = max(min(times), 1e-6)
+    print(f"INFO: {len(files)} files ({size / 1e6:.1f} MB), {counts['lines']} lines, "
+          f"{counts['subfiles']} type 1 lines, {counts['geometry']} type 2-5 lines")
+    print(f"INFO: parsed in {elapsed:.3f}s - {len(files) / elapsed:.0f} files/s, "
+          f"{counts['lines'] / elapsed:.0f} lines/s, {size / 1e6 / elapsed:.2f} MB/s")
+
+
+if __name__ == '__main__':
+    benchmark_ldraw_parse()
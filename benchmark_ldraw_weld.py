@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+"""
+Copyright (c) 2025 by Trevor SANDY
+
+LPub3D Blender LDraw Addon GPLv3 license.
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 2
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program; if not, write to the Free Software Foundation,
+Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+
+LPub3D Benchmark LDraw Weld
+
+This file compares the two ways LDraw Import MM can merge the vertices of a part mesh:
+bmesh.ops.remove_doubles on a bmesh and the NumPy grid hash in io_scene_import_ldraw_mm/ldraw_core/weld.py.
+The model is imported with Remove doubles off so every face keeps its own vertices, like the meshes are before
+they are welded, then every imported mesh is welded both ways with the Merge distance of the saved import settings.
+
+To Run (Windows example):
+- Prerequisites
+    - Blender 2.82 or later
+    - The Blender LDraw addons installed with install_blender_ldraw_addons.py
+- Open Windows command terminal (cmd.exe) and navigate to this script directory.
+- Execute Command
+    - <Blender Path>/blender --background --factory-startup --python benchmark_ldraw_weld.py -- <arguments>
+    - Example: %PROFILE%\\Projects\\blender-4.5.1-windows-x64\\blender.exe --background --factory-startup --python benchmark_ldraw_weld.py -- -f "10294 - Titanic.mpd"
+- Arguments:
+    -f, --filepath       LDraw part or model to import
+    -r, --repeat         Number of times to weld every mesh, the fastest time is reported, defaults to 3
+    -mn, --module_name   LDraw Import MM module name, defaults to io_scene_import_ldraw_mm
+"""
+
+import os
+import sys
+import time
+import importlib
+import traceback
+
+from pathlib import Path
+
+import bpy
+import bmesh
+import numpy as np
+
+parent_dir = Path(__file__).parent
+
+sys.path.append(str(os.path.join(parent_dir, "setup")))
+sys.path.append(str(os.path.join(parent_dir, "addons")))
+
+from addon_setup.arguments import BlenderArgumentParser
+
+
+def parse_arguments():
+    arg_parser = BlenderArgumentParser(
+        description='Compare bmesh.ops.remove_doubles with the NumPy vertex welding of LDraw Import MM.')
+    arg_parser.add_argument("-f", "--filepath", required=True,
+                            help="LDraw part or model to import")
+    arg_parser.add_argument("-r", "--repeat", type=int, default=3,
+                            help="Number of times to weld every mesh, the fastest time is reported")
+    arg_parser.add_argument("-mn", "--module_name", default="io_scene_import_ldraw_mm",
+                            help="LDraw Import MM module name")
+    return arg_parser.parse_args()
+
+
+def remove_doubles(mesh, distance):
+    """Return the vertex count after bmesh.ops.remove_doubles and the time it took"""
+
+    bm = bmesh.new()
+    bm.from_mesh(mesh)
+    start = time.perf_counter()
+    bmesh.ops.remove_doubles(bm, verts=bm.verts[:], dist=distance)
+    elapsed = time.perf_counter() - start
+    count = len(bm.verts)
+    bm.free()
+    return count, elapsed
+
+
+def weld(weld_module, mesh, distance):
+    """Return the vertex count after weld_vertices and weld_faces and the time they took"""
+
+    vertices = np.empty(len(mesh.vertices) * 3, dtype=np.float32)
+    mesh.vertices.foreach_get("co", vertices)
+    starts = np.empty(len(mesh.polygons), dtype=np.int32)
+    mesh.polygons.foreach_get("loop_start", starts)
+    sizes = np.empty(len(mesh.polygons), dtype=np.int32)
+    mesh.polygons.foreach_get("loop_total", sizes)
+    loops = np.empty(len(mesh.loops), dtype=np.int32)
+    mesh.loops.foreach_get("vertex_index", loops)
+
+    start = time.perf_counter()
+    welded, index = weld_module.weld_vertices(vertices.reshape((-1, 3)), distance)
+    weld_module.weld_faces(index[loops], starts, sizes)
+    elapsed = time.perf_counter() - start
+    return len(welded), elapsed
+
+
+def benchmark_ldraw_weld():
+    options = parse_arguments()
+
+    filepath = os.path.abspath(options.filepath)
+    assert os.path.isfile(filepath), f"LDraw file not found: {filepath}"
+
+    try:
+        blender_import = importlib.import_module(f"{options.module_name}.blender_import")
+        weld_module = importlib.import_module(f"{options.module_name}.ldraw_core.weld")
+        strings = importlib.import_module(f"{options.module_name}.strings")
+        ImportSettings = importlib.import_module(f"{options.module_name}.import_settings").ImportSettings
+        ImportSettings.load_settings()
+    except Exception:
+        traceback.print_exc()
+        sys.exit(1)
+
+    # unwelded meshes in LDraw units, do_import saves the settings so they are put back afterwards
+    distance = ImportSettings.get_setting("merge_distance")
+    saved_settings = dict(ImportSettings.settings)
+    ImportSettings.set_setting("remove_doubles", False)
+    ImportSettings.set_setting("scale_strategy", "object")
+    try:
+        blender_import.do_import(filepath)
+    finally:
+        ImportSettings.settings = saved_settings
+        ImportSettings.save_settings(saved_settings)
+
+    meshes = [mesh for mesh in bpy.data.meshes if strings.ldraw_filename_key in mesh and len(mesh.polygons) > 0]
+    assert len(meshes) > 0, "No part meshes were imported"
+
+    vertex_count = sum(len(mesh.vertices) for mesh in meshes)
+    results = {}
+    for name, method in (("bmesh remove_doubles", remove_doubles), ("NumPy weld", lambda mesh, d: weld(weld_module, mesh, d))):
+        times = []
+        for _ in range(max(1, options.repeat)):
+            counts = [method(mesh, distance) for mesh in meshes]
+            times.append(sum(elapsed for count, elapsed in counts))
+        results[name] = (sum(count for count, elapsed in counts), min(times))
+
+    print(f"INFO: {len(meshes)} meshes, {vertex_count} unwelded vertices, merge distance {distance}")
+    for name, (count, elapsed) in results.items():
+        print(f"INFO: {name}: {count} vertices in {elapsed:.3f}s")
+
+
+if __name__ == '__main__':
+    benchmark_ldraw_weld()
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""
+Copyright (c) 2025 by Trevor SANDY
+
+LPub3D Blender LDraw Addon GPLv3 license.
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 2
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program; if not, write to the Free Software Foundation,
+Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+
+LPub3D Catalog LDraw Library
+
+This file writes the part type, description, category, keywords and subfile references
+of every file in an LDraw library folder to a JSON or SQLite catalog, without building any geometry.
+
+With --header_only, each file is only read up to the end of its header, so subfile references are left out.
+
+To Run (Windows example):
+- Prerequisites
+    - Blender 2.82 or later
+    - The Blender LDraw addons installed with install_blender_ldraw_addons.py
+- Open Windows command terminal (cmd.exe) and navigate to this script directory.
+- Execute Command
+    - <Blender Path>/blender --background --factory-startup --python catalog_ldraw_library.py -- <arguments>
+    - Example: %PROFILE%\\Projects\\blender-4.5.1-windows-x64\\blender.exe --background --factory-startup --python catalog_ldraw_library.py -- -o ldraw_catalog.db
+- Arguments:
+    -o, --output         Catalog file to write, .db, .sqlite or .sqlite3 for SQLite, otherwise JSON
+    -lp, --ldraw_path    LDraw library path, the saved LDraw Import MM path is used if not specified
+    -ho, --header_only   Only read the header of each file
+    -w, --workers        Number of threads to read files with, defaults to 8
+    -mn, --module_name   LDraw Import MM module name, defaults to io_scene_import_ldraw_mm
+"""
+
+import os
+import sys
+import time
+import importlib
+import traceback
+
+from pathlib import Path
+
+parent_dir = Path(__file__).parent
+
+sys.path.append(str(os.path.join(parent_dir, "setup")))
+sys.path.append(str(os.path.join(parent_dir, "addons")))
+
+from addon_setup.arguments import BlenderArgumentParser
+
+# the number of files whose errors are printed
+error_limit = 20
+
+
+def parse_arguments():
+    arg_parser = BlenderArgumentParser(
+        description='Catalog the LDraw library for the LDraw Import MM addon.')
+    arg_parser.add_argument("-o", "--output", default="ldraw_catalog.json",
+                            help="Catalog file to write, .db, .sqlite or .sqlite3 for SQLite, otherwise JSON")
+    arg_parser.add_argument("-lp", "--ldraw_path", default="",
+                            help="LDraw library path, the saved LDraw Import MM path is used if not specified")
+    arg_parser.add_argument("-ho", "--header_only", action="store_true",
+                            help="Only read the header of each file")
+    arg_parser.add_argument("-w", "--workers", type=int, default=8,
+                            help="Number of threads to read files with")
+    arg_parser.add_argument("-mn", "--module_name", default="io_scene_import_ldraw_mm",
+                            help="LDraw Import MM module name")
+    return arg_parser.parse_args()
+
+
+def catalog_ldraw_library():
+    options = parse_arguments()
+
+    try:
+        ImportSettings = importlib.import_module(f"{options.module_name}.import_settings").ImportSettings
+        FileSystem = importlib.import_module(f"{options.module_name}.filesystem").FileSystem
+        LibraryCatalog = importlib.import_module(f"{options.module_name}.library_catalog").LibraryCatalog
+
+        ImportSettings.load_settings()
+        if options.ldraw_path != "":
+            ImportSettings.settings["ldraw_path"] = options.ldraw_path
+        ImportSettings.apply_settings()
+    except Exception:
+        traceback.print_exc()
+        sys.exit(1)
+
+    ldraw_path = os.path.abspath(os.path.expanduser(FileSystem.ldraw_path))
+    assert os.path.isdir(ldraw_path), f"LDraw library path not found: {ldraw_path}"
+
+    output = os.path.abspath(options.output)
+    print(f"INFO: LDraw library: {ldraw_path}", flush=True)
+
+    start = time.perf_counter()
+    errors = {}
+    count = LibraryCatalog.build(ldraw_path, output, header_only=options.header_only, workers=options.workers, errors=errors)
+    elapsed = max(time.perf_counter() - start, 1e-6)
+
+    # only the first few are listed, a broken library can have an error in thousands of files
+    for path in list(errors)[:error_limit]:
+        for error in errors[path]:
+            print(f"ERROR: {path}: {error}")
+    if len(errors) > error_limit:
+        print(f"ERROR: ... and {len(errors) - error_limit} more files")
+
+    print(f"INFO: {count} files cataloged in {elapsed:.1f}s - {count / elapsed:.0f} files/s")
+    print(f"INFO: {len(errors)} files with errors, {sum(len(messages) for messages in errors.values())} errors")
+    print(f"INFO: Catalog written to {output}")
+
+
+if __name__ == '__main__':
+    catalog_ldraw_library()
@@ -0,0 +1,263 @@
+# -*- coding: utf-8 -*-
+"""
+Copyright (c) 2025 by Trevor SANDY
+
+LPub3D Blender LDraw Addon GPLv3 license.
+
+This program is free software; you can redistribute it and/or
+modify it under the terms of the GNU General Public License
+as published by the Free Software Foundation; either version 2
+of the License, or (at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program; if not, write to the Free Software Foundation,
+Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301, USA.
+
+LPub3D Precompile LDraw Library
+
+This file builds the LDraw Import MM compiled part cache for every part, subpart and primitive
+in the LDraw, unofficial and Stud.io libraries, so the first import on a new machine doesn't have to parse them.
+
+The parts are shared across several background Blender processes, since parsing needs mathutils.
+The import settings saved by the addon (config/ImportOptions.json) are used, so the cache matches what an import looks up.
+
+To Run (Windows example):
+- Prerequisites
+    - Blender 2.82 or later
+    - The Blender LDraw addons installed with install_blender_ldraw_addons.py
+- Open Windows command terminal (cmd.exe) and navigate to this script directory.
+- Execute Command
+    - <Blender Path>/blender --background --python precompile_ldraw_library.py -- <optional arguments>
+    - Example: %PROFILE%\\Projects\\blender-4.5.1-windows-x64\\blender.exe --background --python precompile_ldraw_library.py -- --workers 8
+- Optional Arguments:
+    -lp, --ldraw_path    LDraw library path, the saved LDraw Import MM path is used if not specified
+    -w, --workers        Number of Blender processes to parse with, defaults to the number of CPUs
+    -mn, --module_name   LDraw Import MM module name, defaults to io_scene_import_ldraw_mm
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import importlib
+import subprocess
+import traceback
+
+from pathlib import Path
+
+import bpy
+
+parent_dir = Path(__file__).parent
+
+sys.path.append(str(os.path.join(parent_dir, "setup")))
+sys.path.append(str(os.path.join(parent_dir, "addons")))
+
+from addon_setup.arguments import BlenderArgumentParser
+
+result_prefix = "PRECOMPILE_RESULT: "
+
+# parsed files are dropped after this many parts so memory doesn't grow with the library
+# their subfiles are read back from the compiled cache
+batch_size = 500
+
+
+def parse_arguments():
+    arg_parser = BlenderArgumentParser(
+        description='Precompile the LDraw library for the LDraw Import MM addon.')
+    arg_parser.add_argument("-lp", "--ldraw_path", default="",
+                            help="LDraw library path, the saved LDraw Import MM path is used if not specified")
+    arg_parser.add_argument("-w", "--workers", type=int, default=os.cpu_count() or 1,
+                            help="Number of Blender processes to parse with")
+    arg_parser.add_argument("-mn", "--module_name", default="io_scene_import_ldraw_mm",
+                            help="LDraw Import MM module name")
+    arg_parser.add_argument("--shard", type=int, default=None, help=argparse.SUPPRESS)
+    arg_parser.add_argument("--shards", type=int, default=1, help=argparse.SUPPRESS)
+    return arg_parser.parse_args()
+
+
+def load_addon(module_name):
+    """Import the addon modules the same way Blender does, without registering the addon"""
+
+    modules = {}
+    for name in ["compiled_cache", "filesystem", "import_settings", "ldraw_color", "ldraw_file", "library_index"]:
+        modules[name] = importlib.import_module(f"{module_name}.{name}")
+    return modules
+
+
+def setup_library(modules, options):
+    FileSystem = modules["filesystem"].FileSystem
+    ImportSettings = modules["import_settings"].ImportSettings
+    LDrawColor = modules["ldraw_color"].LDrawColor
+    LDrawFile = modules["ldraw_file"].LDrawFile
+
+    ImportSettings.load_settings()
+    if options.ldraw_path != "":
+        ImportSettings.settings["ldraw_path"] = options.ldraw_path
+    ImportSettings.apply_settings()
+
+    FileSystem.reset_caches()
+    LDrawColor.reset_caches()
+    LDrawFile.reset_caches()
+
+    FileSystem.build_search_paths()
+    LDrawFile.read_color_table()
+
+    assert os.path.isdir(FileSystem.ldraw_path), f"LDraw library path not found: {FileSystem.ldraw_path}"
+
+
+def is_part_location(location, root_dirs):
+    """Parts, subparts and primitives are the files under the parts and p folders of a library root"""
+
+    if isinstance(location, list):
+        folders = location[1].split("/")
+        if folders[0] == "ldraw":
+            folders = folders[1:]
+        return len(folders) > 1 and folders[0] in ["parts", "p"]
+
+    for root_dir in root_dirs:
+        if root_dir == "" or not location.startswith(root_dir):
+            continue
+        folders = os.path.relpath(location, root_dir).split(os.path.sep)
+        if len(folders) > 1 and folders[0].lower() in ["parts", "p"]:
+            return True
+    return False
+
+
+def library_parts(modules):
+    """Return a sorted list of (name, location), one for every part file the library index can find"""
+
+    FileSystem = modules["filesystem"].FileSystem
+    LibraryIndex = modules["library_index"].LibraryIndex
+
+    # a file can be found by more than one name, e.g. p/48/4-4cyli.dat is also 48/4-4cyli.dat
+    parts = {}
+    for name, location in LibraryIndex.items():
+        if not name.endswith(".dat") or not is_part_location(location, FileSystem.root_dirs):
+            continue
+        key = tuple(location) if isinstance(location, list) else location
+        current = parts.get(key)
+        if current is None or len(name) < len(current[0]):
+            parts[key] = (name, location)
+
+    return sorted(parts.values(), key=lambda part: part[0])
+
+
+def compile_parts(modules, parts):
+    FileSystem = modules["filesystem"].FileSystem
+    LDrawFile = modules["ldraw_file"].LDrawFile
+    CompiledCache = modules["compiled_cache"].CompiledCache
+
+    result = {
+        "files": 0,
+        "bytes": 0,
+        "written": 0,
+        "errors": [],
+    }
+
+    writes = CompiledCache.writes
+    for index, (name, location) in enumerate(parts):
+        if index > 0 and index % batch_size == 0:
+            LDrawFile.reset_caches()
+            LDrawFile.clear_library_cache()
+
+        result["files"] += 1
+        result["bytes"] += FileSystem.location_size(location) or 0
+        try:
+            if LDrawFile.get_file(name) is None:
+                result["errors"].append(f"{name}: could not be read")
+        except Exception as e:
+            result["errors"].append(f"{name}: {e}")
+
+    result["written"] = CompiledCache.writes - writes
+    return result
+
+
+def run_workers(options, part_count):
+    """Start one background Blender for each shard of the parts and wait for all of them"""
+
+    workers = max(1, min(options.workers, part_count))
+
+    arguments = [
+        "--ldraw_path", options.ldraw_path,
+        "--module_name", options.module_name,
+        "--shards", str(workers),
+    ]
+
+    processes = []
+    for shard in range(workers):
+        command = [
+            bpy.app.binary_path,
+            "--background",
+            "--factory-startup",
+            "--python", str(Path(__file__).resolve()),
+            "--",
+            *arguments,
+            "--shard", str(shard),
+        ]
+        processes.append(subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True))
+
+    results = []
+    for shard, process in enumerate(processes):
+        output, _ = process.communicate()
+        result = None
+        for line in output.splitlines():
+            if line.startswith(result_prefix):
+                result = json.loads(line[len(result_prefix):])
+        if result is None:
+            result = {"files": 0, "bytes": 0, "written": 0, "errors": [f"worker {shard} failed with exit code {process.returncode}"]}
+            print(output)
+        results.append(result)
+    return results
+
+
+def precompile_ldraw_library():
+    options = parse_arguments()
+
+    try:
+        modules = load_addon(options.module_name)
+        setup_library(modules, options)
+        parts = library_parts(modules)
+    except Exception:
+        traceback.print_exc()
+        sys.exit(1)
+
+    # worker - compile its share of the parts and report back to the main process
+    if options.shard is not None:
+        result = compile_parts(modules, parts[options.shard::options.shards])
+        print(f"{result_prefix}{json.dumps(result)}", flush=True)
+        return
+
+    FileSystem = modules["filesystem"].FileSystem
+    CompiledCache = modules["compiled_cache"].CompiledCache
+    print(f"INFO: LDraw library: {FileSystem.ldraw_path}", flush=True)
+    print(f"INFO: Compiled cache: {CompiledCache.cache_dir}", flush=True)
+    print(f"INFO: Compiling {len(parts)} parts with {max(1, min(options.workers, len(parts)))} workers...", flush=True)
+
+    start = time.perf_counter()
+    if options.workers > 1:
+        results = run_workers(options, len(parts))
+    else:
+        results = [compile_parts(modules, parts)]
+    elapsed = max(time.perf_counter() - start, 1e-6)
+
+    files = sum(result["files"] for result in results)
+    size = sum(result["bytes"] for result in results)
+    written = sum(result["written"] for result in results)
+    errors = [error for result in results for error in result["errors"]]
+
+    for error in errors:
+        print(f"ERROR: {error}")
+
+    print(f"INFO: {files} files ({size / 1e6:.1f} MB) in {elapsed:.1f}s - "
+          f"{files / elapsed:.0f} files/s, {size / 1e6 / elapsed:.2f} MB/s")
+    print(f"INFO: {written} compiled files written, {len(errors)} errors")
+
+
+if __name__ == '__main__':
+    precompile_ldraw_library()
@@ -0,0 +1,12 @@
+import os
+import sys
+import types
+
+ADDON_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "addons", "io_scene_import_ldraw_mm")
+
+# the addon's __init__ registers its operators with Blender, so the package is set up without running it
+# the tests only import the modules that don't need bpy
+if "io_scene_import_ldraw_mm" not in sys.modules:
+    package = types.ModuleType("io_scene_import_ldraw_mm")
+    package.__path__ = [ADDON_DIR]
+    sys.modules["io_scene_import_ldraw_mm"] = package
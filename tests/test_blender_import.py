@@ -0,0 +1,68 @@
+import pytest
+
+# these run the whole importer, so they need Blender's bpy module
+bpy = pytest.importorskip("bpy")
+
+from io_scene_import_ldraw_mm import blender_import
+from io_scene_import_ldraw_mm import strings
+from io_scene_import_ldraw_mm.import_settings import ImportSettings
+
+ldconfig = """0 LDraw.org Configuration File
+0 Name: LDConfig.ldr
+0 !COLOUR Red CODE 4 VALUE #C91A09 EDGE #333333
+0 !COLOUR Main_Colour CODE 16 VALUE #FFFF80 EDGE #333333
+0 !COLOUR Edge_Colour CODE 24 VALUE #7F7F7F EDGE #333333
+"""
+
+
+@pytest.fixture
+def import_part(tmp_path):
+    library = tmp_path / "ldraw"
+    (library / "parts" / "s").mkdir(parents=True)
+    (library / "p").mkdir()
+    (library / "LDConfig.ldr").write_text(ldconfig)
+
+    # do_import saves the settings, so they are put back afterwards
+    ImportSettings.load_settings()
+    saved_settings = dict(ImportSettings.settings)
+    ImportSettings.set_setting("ldraw_path", str(library))
+    ImportSettings.set_setting("remove_doubles", False)
+
+    def import_part(files, filename):
+        for name, text in files.items():
+            (library / "parts" / name).write_text(text)
+        blender_import.do_import(str(library / "parts" / filename))
+        # edge meshes have the filename too, but no faces
+        return [mesh for mesh in bpy.data.meshes if mesh.get(strings.ldraw_filename_key) == filename and len(mesh.polygons) > 0]
+
+    yield import_part
+
+    ImportSettings.settings = saved_settings
+    ImportSettings.save_settings(saved_settings)
+
+
+# a subpart is baked the first time it is used, the line that can't be read is left out of every use of it
+def test_unreadable_line_in_subpart(import_part):
+    meshes = import_part({
+        "bad.dat": (
+            "0 Bad Part\n"
+            "0 Name: bad.dat\n"
+            "0 !LDRAW_ORG Part\n"
+            "0 BFC CERTIFY CCW\n"
+            "1 16 0 0 0 1 0 0 0 1 0 0 0 1 s/bads01.dat\n"
+            "1 16 10 0 0 1 0 0 0 1 0 0 0 1 s/bads01.dat\n"
+        ),
+        "s/bads01.dat": (
+            "0 Bad Subpart\n"
+            "0 Name: s\\bads01.dat\n"
+            "0 !LDRAW_ORG Subpart\n"
+            "0 BFC CERTIFY CCW\n"
+            "2 24 0 0 0 1 0 0\n"
+            "3 16 0 0 0 1 0 0 0 1 0\n"
+            "3 16 0 0 0 1 x 0 0 1 0\n"
+            "4 16 0 0 0 1 0 0 1 1 0 0 1 0\n"
+        ),
+    }, "bad.dat")
+
+    assert len(meshes) == 1
+    assert [len(polygon.vertices) for polygon in meshes[0].polygons] == [3, 4, 3, 4]
@@ -0,0 +1,96 @@
+import os
+
+import numpy as np
+import pytest
+
+from io_scene_import_ldraw_mm.compiled_cache import CompiledCache
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(CompiledCache, "cache_dir", str(tmp_path))
+    monkeypatch.setattr(CompiledCache, "enabled", True)
+    return CompiledCache
+
+
+signature = ("/ldraw/parts/3001.dat", 1700000000000000000, 1234)
+archive_signature = ("parts/3001.dat", ("/ldraw/complete.zip", (1700000000000000000, 5678)))
+metadata = (("3001.dat", "Brick 2 x 4", "Part"), [(1, "16", 0), (3, "16", 12)], ["0 !COLOUR"], {"bfc": True})
+
+
+def test_round_trip(cache):
+    assert cache.write(signature, "options", metadata, [[1.0, 2.0, 3.0], np.arange(6)])
+
+    stored_metadata, floats = cache.read(signature, "options")
+    assert stored_metadata == metadata
+    assert floats.dtype == np.float32
+    assert floats.tolist() == [1.0, 2.0, 3.0, 0.0, 1.0, 2.0, 3.0, 4.0, 5.0]
+
+
+def test_round_trip_archive_member(cache):
+    assert cache.write(archive_signature, "options", metadata, [])
+
+    stored_metadata, floats = cache.read(archive_signature, "options")
+    assert stored_metadata == metadata
+    assert len(floats) == 0
+
+
+def test_changed_file_is_not_read(cache):
+    cache.write(signature, "options", metadata, [[1.0]])
+
+    changed = (signature[0], signature[1] + 1, signature[2])
+    assert cache.read(changed, "options") is None
+    # the changed file replaces the old one instead of being stored next to it
+    assert cache.get_path(changed, "options") == cache.get_path(signature, "options")
+
+
+def test_options_key_is_part_of_the_path(cache):
+    cache.write(signature, "options", metadata, [[1.0]])
+    assert cache.read(signature, "other options") is None
+
+
+def test_other_parser_version_is_not_read(cache, monkeypatch):
+    cache.write(signature, "options", metadata, [[1.0]])
+    monkeypatch.setattr(CompiledCache, "parser_version", CompiledCache.parser_version + 1)
+    assert cache.read(signature, "options") is None
+
+
+def test_disabled(cache, monkeypatch):
+    monkeypatch.setattr(CompiledCache, "enabled", False)
+    assert not cache.write(signature, "options", metadata, [[1.0]])
+    assert cache.read(signature, "options") is None
+
+
+def test_unmarshalable_metadata_is_not_written(cache):
+    assert not cache.write(signature, "options", (object(),), [[1.0]])
+    assert cache.read(signature, "options") is None
+
+
+def test_floats_are_a_writable_view_of_the_read_buffer(cache):
+    cache.write(signature, "options", metadata, [[1.0, 2.0, 3.0]])
+
+    stored_metadata, floats = cache.read(signature, "options")
+    assert not floats.flags.owndata
+    assert floats.flags.writeable
+
+
+def test_default_cache_dir_is_outside_the_addon():
+    from io_scene_import_ldraw_mm.definitions import APP_ROOT
+
+    cache_dir = os.path.realpath(CompiledCache.cache_dir)
+    assert os.path.isabs(CompiledCache.cache_dir)
+    assert os.path.commonpath([cache_dir, APP_ROOT]) != APP_ROOT
+
+
+def test_write_errors_are_reported_once(cache, monkeypatch, tmp_path, capsys):
+    # a file where the cache directory should be makes every write fail
+    blocked = tmp_path / "blocked"
+    blocked.write_text("")
+    monkeypatch.setattr(CompiledCache, "cache_dir", str(blocked))
+    monkeypatch.setattr(CompiledCache, "write_errors", 0)
+
+    assert not cache.write(signature, "options", metadata, [[1.0]])
+    assert not cache.write(archive_signature, "options", metadata, [[1.0]])
+
+    assert CompiledCache.write_errors == 2
+    assert capsys.readouterr().err.count("Compiled cache not written") == 1
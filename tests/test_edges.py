@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+
+from io_scene_import_ldraw_mm.ldraw_core.edges import edge_keys, sharp_edge_keys, sharp_edge_mask
+
+
+def close(a, b, distance):
+    return ((np.asarray(a, dtype=np.float64) - np.asarray(b, dtype=np.float64)) ** 2).sum() <= distance ** 2
+
+
+def test_edge_keys_either_way_round():
+    assert edge_keys([[1, 5], [5, 1], [2, 3]], 10).tolist() == [15, 15, 23]
+
+
+@pytest.mark.parametrize("seed", range(100))
+def test_sharp_edge_keys_matches_brute_force(seed):
+    rng = np.random.default_rng(seed)
+    vertices = (rng.integers(0, 5, size=(int(rng.integers(2, 30)), 3)) * 0.5).astype(np.float32)
+    lines = vertices[rng.integers(0, len(vertices), size=(int(rng.integers(1, 10)), 2))]
+    lines = lines + rng.normal(scale=0.05, size=lines.shape)
+    distance = 0.1
+
+    keys = sharp_edge_keys(vertices, lines, distance)
+
+    expected = set()
+    for start, end in lines:
+        for a in range(len(vertices)):
+            for b in range(len(vertices)):
+                if close(vertices[a], start, distance) and close(vertices[b], end, distance):
+                    expected.add(min(a, b) * len(vertices) + max(a, b))
+    assert keys.tolist() == sorted(expected)
+
+
+def test_sharp_edge_mask():
+    vertices = np.array([[0, 0, 0], [1, 0, 0], [1, 1, 0], [0, 1, 0]], dtype=np.float32)
+    edges = np.array([[0, 1], [1, 2], [2, 3], [3, 0], [0, 2]])
+
+    keys = sharp_edge_keys(vertices, [[[1, 0, 0], [0, 0, 0]], [[0, 1, 0], [1, 1, 0]]], 0.01)
+
+    assert sharp_edge_mask(keys, edges, len(vertices)).tolist() == [True, False, True, False, False]
+
+
+def test_sharp_edge_mask_no_keys():
+    keys = sharp_edge_keys(np.zeros((3, 3)), np.zeros((0, 2, 3)), 0.01)
+    assert sharp_edge_mask(keys, [[0, 1], [1, 2]], 3).tolist() == [False, False]
@@ -0,0 +1,264 @@
+import numpy as np
+import pytest
+
+from io_scene_import_ldraw_mm.ldraw_core import matrix
+from io_scene_import_ldraw_mm.ldraw_core import text
+from io_scene_import_ldraw_mm.ldraw_core.geometry_lines import GeometryLines
+from io_scene_import_ldraw_mm import base64_handler
+
+
+@pytest.mark.parametrize("data, expected", [
+    ("0 Brick\r\n0 Name: x.dat\r\n".encode("utf_8"), "0 Brick\n0 Name: x.dat\n"),
+    (b"\xef\xbb\xbf0 Stud.io\n", "0 Stud.io\n"),
+    # not utf-8, older library files are Latin-1
+    (b"0 Author: Ren\xe9\n", "0 Author: René\n"),
+])
+def test_decode(data, expected):
+    assert text.decode(data) == expected
+
+
+def test_is_mpd():
+    assert text.is_mpd("\n  0 FILE main.ldr\n")
+    assert text.is_mpd("0 !DATA image.png\n")
+    assert not text.is_mpd("0 Brick\n0 FILE main.ldr\n")
+
+
+def test_index_mpd():
+    source = (
+        "0 FILE Main.ldr\n"
+        "1 16 0 0 0 1 0 0 0 1 0 0 0 1 sub.ldr\n"
+        "0 NOFILE\n"
+        "0 FILE sub.ldr\n"
+        "0 !DATA image.png\n"
+        "0 !: iVBORw0KGgo\n"
+        "0 !: AAAA\n"
+        "3 16 0 0 0 1 0 0 0 1 0\n"
+    )
+    first_filename, sections, data_blocks = text.index_mpd(source)
+
+    assert first_filename == "main.ldr"
+    assert [(name, source[start:end]) for name, start, end in sections] == [
+        ("main.ldr", "\n1 16 0 0 0 1 0 0 0 1 0 0 0 1 sub.ldr\n"),
+        # a data block doesn't end its section
+        ("sub.ldr", source[source.index("\n0 !DATA"):]),
+    ]
+
+    assert [name for name, start in data_blocks] == ["image.png"]
+    start = data_blocks[0][1]
+    assert source[start:text.data_block_end(source, start)] == "0 !: iVBORw0KGgo\n0 !: AAAA\n"
+
+
+mpd_source = """
+
+   
+0 FILE Main.ldr
+0 Main
+1 16 0 0 0 1 0 0 0 1 0 0 0 1 sub.ldr
+
+1 4 0 0 0 1 0 0 0 1 0 0 0 1 Tex.ldr
+0 NOFILE
+0 not in any section
+0 FILE sub.ldr
+0 !TEXMAP START PLANAR 0 0 0 1 0 0 0 0 1 image.png
+0 !: 3 16 0 0 0 1 0 0 0 1 0
+0 !TEXMAP FALLBACK
+3 16 0 0 0 1 0 0 0 1 0
+0 !TEXMAP END
+0 NOFILE
+0 !DATA image.png
+0 !: iVBORw0KGgo
+0 !: AAAA
+0 FILE tex.ldr
+0 !DATA inner.png
+0 !: QUJD
+
+0 !: REVG
+3 16 0 0 0 1 0 0 0 1 0
+  2 24 0 0 0 1 1 1
+"""
+
+ldr_source = """
+0 Model
+0 !: 3 16 0 0 0 1 0 0 0 1 0
+0 !DATA image.png
+0 !: AAAA
+1 16 0 0 0 1 0 0 0 1 0 0 0 1 sub.ldr
+"""
+
+
+# LDrawFile.__read_file as it was before mpds were indexed, returning the lines of each file it cached
+# and the base64 string of each data block instead of adding them to the caches
+def read_file_reference(lines, filename, meta_texmap):
+    files = {}
+    images = {}
+
+    hit_not_blank_line = False
+    is_mpd = None
+    no_file = False
+    first_mpd_filename = None
+    current_file = None
+    current_mpd_file = None
+    current_data_filename = None
+    current_data = None
+
+    for line in lines:
+        clean_line = text.clean_line(line)
+        strip_line = line.strip()
+
+        if clean_line == "":
+            continue
+
+        if current_data_filename is not None:
+            if clean_line.startswith(text.texmap_prefix):
+                if meta_texmap:
+                    current_data.append(strip_line.replace(text.texmap_prefix, ""))
+                    continue
+            else:
+                images[current_data_filename] = "".join(current_data)
+                current_data_filename = None
+                current_data = None
+
+        is_file_line = clean_line.startswith("0 FILE ")
+        is_nofile_line = clean_line.startswith("0 NOFILE")
+        is_data_line = clean_line.startswith("0 !DATA ")
+        is_mpd_line = is_file_line or is_data_line
+
+        if not hit_not_blank_line:
+            is_mpd = is_mpd_line
+        hit_not_blank_line = True
+
+        if meta_texmap:
+            line = line.replace(text.texmap_prefix, "")
+
+        if not is_mpd:
+            if current_file is None:
+                current_file = (filename, [])
+            current_file[1].append(line)
+            continue
+
+        if is_mpd_line:
+            no_file = False
+
+        if is_file_line:
+            mpd_filename = strip_line.split(maxsplit=2)[2].lower()
+            if first_mpd_filename is None:
+                first_mpd_filename = mpd_filename
+            if current_mpd_file is not None:
+                files[current_mpd_file[0]] = current_mpd_file[1]
+            current_mpd_file = (mpd_filename, [])
+            continue
+
+        if is_nofile_line:
+            no_file = True
+            if current_mpd_file is not None:
+                files[current_mpd_file[0]] = current_mpd_file[1]
+            current_mpd_file = None
+            continue
+
+        if is_data_line:
+            current_data_filename = strip_line.split(maxsplit=2)[2]
+            current_data = []
+            continue
+
+        if no_file:
+            continue
+
+        if current_mpd_file is not None:
+            current_mpd_file[1].append(line)
+
+    if current_data_filename is not None:
+        images[current_data_filename] = "".join(current_data)
+
+    # without meta_texmap the data lines weren't kept, so each block was decoded from an empty string
+    if not meta_texmap:
+        images = {}
+
+    if current_mpd_file is not None:
+        files[current_mpd_file[0]] = current_mpd_file[1]
+    if current_file is not None:
+        files[current_file[0]] = current_file[1]
+
+    if first_mpd_filename is not None:
+        filename = first_mpd_filename
+    return filename, files, images
+
+
+# what LDrawFile.__read_mpd and __get_unparsed_file do with index_mpd and section_lines
+def read_file_indexed(source, filename, meta_texmap):
+    if not text.is_mpd(source):
+        lines = [line for line, clean_line, strip_line in text.section_lines(source.splitlines(), False, meta_texmap)]
+        return filename, {filename: lines}, {}
+
+    first_filename, sections, data_blocks = text.index_mpd(source)
+    files = {}
+    for name, start, end in sections:
+        files[name] = [line for line, clean_line, strip_line in text.section_lines(source[start:end].splitlines(), True, meta_texmap)]
+
+    images = {}
+    if meta_texmap:
+        for name, start in data_blocks:
+            images[name] = base64_handler.base64_str_from_span(source, start, text.data_block_end(source, start))
+    return first_filename or filename, files, images
+
+
+@pytest.mark.parametrize("meta_texmap", [True, False])
+@pytest.mark.parametrize("source", [mpd_source, ldr_source], ids=["mpd", "ldr"])
+def test_index_mpd_matches_reading_every_line(source, meta_texmap):
+    expected = read_file_reference(source.splitlines(), "model.ldr", meta_texmap)
+    assert read_file_indexed(source, "model.ldr", meta_texmap) == expected
+
+
+def test_section_lines():
+    lines = ["", "0 !: 3 16 0 0 0 1 0 0 0 1 0", "  1  16 0 0 0 1 0 0 0 1 0 0 0 1  a b.dat ", "0 !DATA x.png", "0 !: AAAA"]
+    assert list(text.section_lines(lines, True, True)) == [
+        ("3 16 0 0 0 1 0 0 0 1 0", "3 16 0 0 0 1 0 0 0 1 0", "3 16 0 0 0 1 0 0 0 1 0"),
+        (lines[2], "1 16 0 0 0 1 0 0 0 1 0 0 0 1 a b.dat", "1  16 0 0 0 1 0 0 0 1 0 0 0 1  a b.dat"),
+    ]
+
+
+def test_data_block_end_of_text():
+    source = "0 !DATA a.png\n0 !: AAAA"
+    start = source.index("0 !:")
+    assert text.data_block_end(source, start) == len(source)
+
+
+def test_subfile_params():
+    clean_line = text.clean_line("1  4 1 2 3  1 0 0 0 1 0 0 0 1  My Part.dat")
+    color_code, values, filename = matrix.subfile_params(clean_line, "1  4 1 2 3  1 0 0 0 1 0 0 0 1  My Part.dat")
+    assert color_code == "4"
+    assert values == (1, 2, 3, 1, 0, 0, 0, 1, 0, 0, 0, 1)
+    assert filename == "My Part.dat"
+
+
+def test_subfile_matrix_transform():
+    values = (10, 20, 30, 0, -1, 0, 1, 0, 0, 0, 0, 1)
+    result = matrix.transform([[1, 0, 0], [0, 2, 0]], matrix.subfile_matrix(values))
+    np.testing.assert_allclose(result, [[10, 21, 30], [8, 20, 30]])
+
+
+def test_geometry_lines():
+    geometry = GeometryLines()
+    lines = [
+        "2 24 0 0 0 1 0 0",
+        "3 16 0 0 0 1 0 0 0 1 0",
+        "3 4 0 0 0 x 0 0 0 1 0",
+        "4 16 0 0 0 1 0 0 1 1 0 0 1 0 0.5 0.5",
+    ]
+    for line in lines:
+        _params = line.split()
+        geometry.add(_params[0], line, _params)
+    geometry.finalize()
+
+    edges, edge_colors = geometry.get("2")
+    assert edges.shape == (1, 2, 3) and edge_colors.tolist() == ["24"]
+    triangles, triangle_colors = geometry.get("3")
+    assert triangles.shape == (2, 3, 3) and triangle_colors.tolist() == ["16", "4"]
+    assert geometry.invalid_lines == {("3", 1)}
+    assert geometry.extended_lines == {("4", 0): lines[3]}
+
+    metadata, float_parts = geometry.to_compiled()
+    compiled = GeometryLines.from_compiled(metadata, np.concatenate(float_parts))
+    for line_type in GeometryLines.line_types:
+        np.testing.assert_array_equal(compiled.get(line_type)[0], geometry.get(line_type)[0])
+        assert compiled.get(line_type)[1].tolist() == geometry.get(line_type)[1].tolist()
+    assert compiled.invalid_lines == geometry.invalid_lines
@@ -0,0 +1,172 @@
+import pytest
+
+# ldraw_file builds mathutils matrices, which only come with Blender
+pytest.importorskip("mathutils")
+
+from io_scene_import_ldraw_mm.ldraw_file import LDrawFile
+
+
+# the order every line was tried against the handlers before they were dispatched by line type and meta keyword
+# __line_description always came first and never ended the chain
+chain_handler_names = (
+    "name",
+    "author",
+    "part_type",
+    "license",
+    "help",
+    "category",
+    "keywords",
+    "cmdline",
+    "history",
+    "comment",
+    "color",
+    "geometry",
+    "subfile",
+    "bfc",
+    "step",
+    "save",
+    "clear",
+    "print",
+    "ldcad",
+    "lp_lc",
+    "texmap",
+    "stud_io",
+)
+chain_handlers = [getattr(LDrawFile, f"_LDrawFile__line_{name}") for name in chain_handler_names]
+
+header_lines = [
+    "0 Brick 1 x 1",
+    "0 Name: 3005.dat",
+    "0 NAME: second.dat",
+    "0 author: Jo_Smith",
+    "0 !LDRAW_ORG Part UPDATE 2004-03",
+    "0 LDRAW_ORG Primitive ORIGINAL",
+    "0 !LDRAW_ORG Part Alias UPDATE 2019-01",
+    "0 !LDRAW_ORG Part Physical_Colour",
+    "0 !LDRAW_ORG Part Flexible_Section",
+    "0 Unofficial Part",
+    "0 un-official model",
+    "0 Official LCAD Update 2003-02",
+    "0 !LICENSE Redistributable under CCAL version 2.0",
+    "0 !HELP Align with_this",
+    "0 !CATEGORY Figure Accessory",
+    "0 !KEYWORDS Alias, stud",
+    "0 !KEYWORDS plain",
+    "0 !CMDLINE -c1",
+    "0 !HISTORY 2002-08-18 [PTadmin] Official Update 2002-03",
+    "0 // comment with UPDATE 2020-01",
+    "0 // plain comment",
+    "0 ~Moved to 3001",
+    "0",
+]
+
+body_lines = [
+    "0 BFC CERTIFY CCW",
+    "0 BFC NOCERTIFY",
+    "0 !COLOUR Black CODE 0 VALUE #05131D EDGE #595959",
+    "0 STEP",
+    "0 SAVE",
+    "0 CLEAR",
+    "0 PRINT hello",
+    "0 WRITE hello_world",
+    "0 !LDCAD GROUP_NXT [ids=13016969] [nrs=-1]",
+    "0 !LPUB GROUP BEGIN group_1",
+    "0 !LEOCAD GROUP END",
+    "0 !LPUB CAMERA FOV 30",
+    "0 !LEOCAD LIGHT NAME Light",
+    "0 !TEXMAP START PLANAR 0 0 0 1 0 0 0 0 1 image_a.png",
+    "0 !TEXMAP END",
+    "0 PE_TEX_PATH 0",
+    "0 PE_TEX_INFO abc",
+    "0 PE_TEX_NEXT_SHEAR",
+    "1 16 0 0 0 1 0 0 0 1 0 0 0 1 s\\3005s01.dat",
+    "1 16 0 0 0 1 0 0 0 1 0 0 0 1 Flexible_Section.dat",
+    "1 4 0 0 0 1 0 0 0 1 0 0 0 1 Part UPDATE 2001",
+    "2 24 0 0 0 1 0 0",
+    "3 16 0 0 0 1 0 0 0 1 0",
+    "4 16 0 0 0 1 0 0 1 1 0 0 1 0",
+    "5 24 0 0 0 1 0 0 0 1 0 1 1 0",
+    "6 16 unknown",
+]
+
+
+def parse_chain(lines):
+    ldraw_file = LDrawFile("model.ldr")
+    for line in lines:
+        clean_line = " ".join(line.split())
+        strip_line = line.strip()
+        try:
+            ldraw_file._LDrawFile__line_description(strip_line)
+            for handler in chain_handlers:
+                if handler(ldraw_file, clean_line, strip_line):
+                    break
+        except Exception:
+            continue
+    return ldraw_file
+
+
+def parse_dispatched(lines):
+    ldraw_file = LDrawFile("model.ldr")
+    for line in lines:
+        try:
+            ldraw_file._LDrawFile__parse_line(" ".join(line.split()), line.strip())
+        except Exception:
+            continue
+    return ldraw_file
+
+
+def parsed_state(ldraw_file):
+    header = {field: getattr(ldraw_file, field) for field in LDrawFile.header_fields}
+    nodes = [(node.meta_command, node.line, node.color_code, dict(node.meta_args)) for node in ldraw_file.child_nodes]
+    subfiles = [(filename, rows) for node, filename, rows in ldraw_file.pending_subfiles]
+    return header, nodes, subfiles, ldraw_file.geometry_commands
+
+
+# each line on its own, so a line that sets a field can't hide what another line did to it
+@pytest.mark.parametrize("line", header_lines + body_lines)
+def test_dispatch_matches_handler_chain(line):
+    lines = ["0 Description", line]
+    assert parsed_state(parse_dispatched(lines)) == parsed_state(parse_chain(lines))
+
+
+def test_dispatch_matches_handler_chain_for_whole_file():
+    lines = header_lines + body_lines
+    assert parsed_state(parse_dispatched(lines)) == parsed_state(parse_chain(lines))
+
+
+@pytest.mark.parametrize("line, part_type, actual_part_type", [
+    ("0 !LDRAW_ORG Part UPDATE 2004-03", "part", "Part"),
+    ("0 LDRAW_ORG Primitive ORIGINAL 1998-01", "primitive", "Primitive"),
+    ("0 Unofficial Part", "part", "Unofficial_Part"),
+    ("0 Official LCAD Update 2003-02", "part", "Update"),
+    # name and author lines are never read as a part type
+    ("0 Name: Flexible_Section.dat", None, None),
+])
+def test_part_type(line, part_type, actual_part_type):
+    ldraw_file = parse_dispatched(["0 Description", line])
+    assert (ldraw_file.part_type, ldraw_file.actual_part_type) == (part_type, actual_part_type)
+
+
+# the words a part type is found by are looked for anywhere in a line, so they take the line from its own handler
+def test_part_type_words_in_other_lines():
+    ldraw_file = parse_dispatched(["0 Description", "0 !KEYWORDS Alias, stud", "0 // comment with UPDATE 2020-01"])
+    assert ldraw_file.optional_qualifier == "Alias"
+    assert ldraw_file.keywords == []
+    assert ldraw_file.update_date == "2020-01"
+    assert ldraw_file.child_nodes == []
+
+
+@pytest.mark.parametrize("strip_line, expected", [
+    ("0 Part ORIGINAL", True),
+    ("0 // UPDATE", True),
+    ("0 Part Alias", True),
+    ("0 !LDRAW_ORG Part", True),
+    ("0 Unofficial Part", True),
+    ("0 Official LCAD", True),
+    ("0 BFC CERTIFY CCW", True),
+    ("0 STEP", False),
+    ("3 16 0 0 0 1 0 0 0 1 0", False),
+    ("0 alias update original", False),
+])
+def test_might_have_part_type(strip_line, expected):
+    assert LDrawFile._LDrawFile__might_have_part_type(strip_line) == expected
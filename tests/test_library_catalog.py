@@ -0,0 +1,70 @@
+import pytest
+
+# ldraw_file builds mathutils matrices, which only come with Blender
+pytest.importorskip("mathutils")
+
+from io_scene_import_ldraw_mm.ldraw_file import LDrawFile
+from io_scene_import_ldraw_mm.library_catalog import LibraryCatalog
+
+part = """0 Brick 1 x 1
+0 Name: 3005.dat
+0 Author: James Jessiman
+0 !LDRAW_ORG Part UPDATE 2004-03
+0 BFC CERTIFY CCW
+1 16 0 0 0 1 0 0 0 1 0 0 0 1 S\\3005s01.dat
+4 16 -10 24 -10 10 24 -10 10 24 10 -10 24 10
+"""
+
+
+@pytest.fixture
+def library(tmp_path):
+    (tmp_path / "parts").mkdir()
+    (tmp_path / "parts" / "3005.dat").write_text(part)
+    (tmp_path / "parts" / "broken.dat").write_text(part.replace("3005.dat", "broken.dat"))
+    return tmp_path
+
+
+# a line that can't be scanned is made by failing one of them on purpose
+@pytest.fixture
+def failing_line(monkeypatch):
+    scan_line = LDrawFile._LDrawFile__scan_line
+
+    def failing_scan_line(self, clean_line, strip_line):
+        if self.name == "broken.dat" and clean_line.startswith("0 BFC"):
+            raise ValueError("bad line")
+        return scan_line(self, clean_line, strip_line)
+
+    monkeypatch.setattr(LDrawFile, "_LDrawFile__scan_line", failing_scan_line)
+
+
+def test_scan_file(library):
+    ldraw_file = LDrawFile.scan_file(str(library / "parts" / "3005.dat"))
+
+    assert ldraw_file.name == "3005.dat"
+    assert ldraw_file.description == "Brick 1 x 1"
+    assert ldraw_file.part_type == "part"
+    assert ldraw_file.subfile_names == ["s\\3005s01.dat"]
+    assert ldraw_file.scan_errors == []
+
+
+def test_scan_file_that_cant_be_read(library):
+    assert LDrawFile.scan_file(str(library / "parts" / "missing.dat")) is None
+
+
+def test_scan_errors_are_collected_instead_of_printed(library, failing_line, capsys):
+    ldraw_file = LDrawFile.scan_file(str(library / "parts" / "broken.dat"))
+
+    assert ldraw_file.scan_errors == ["0 BFC CERTIFY CCW: ValueError('bad line')"]
+    # the rest of the file is still scanned
+    assert ldraw_file.subfile_names == ["s\\3005s01.dat"]
+    assert capsys.readouterr().out == ""
+
+
+def test_scan_dir_errors(library, failing_line, capsys):
+    errors = {}
+    entries = LibraryCatalog.scan_dir(str(library), workers=2, errors=errors)
+
+    assert list(entries) == ["parts/3005.dat", "parts/broken.dat"]
+    assert entries["parts/3005.dat"]["subfiles"] == ["s\\3005s01.dat"]
+    assert errors == {"parts/broken.dat": ["0 BFC CERTIFY CCW: ValueError('bad line')"]}
+    assert capsys.readouterr().out == ""
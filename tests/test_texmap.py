@@ -0,0 +1,102 @@
+import math
+
+import numpy as np
+import pytest
+
+from io_scene_import_ldraw_mm.texmap import TexMap
+
+
+def sub(a, b):
+    return [x - y for x, y in zip(a, b)]
+
+
+def scale(a, k):
+    return [x * k for x in a]
+
+
+# like mathutils.Vector.dot, a longer second vector only has as many components used as the first has
+def dot(a, b):
+    return sum(x * y for x, y in zip(a, b))
+
+
+def cross(a, b):
+    return [a[1] * b[2] - a[2] * b[1], a[2] * b[0] - a[0] * b[2], a[0] * b[1] - a[1] * b[0]]
+
+
+def length(a):
+    return math.sqrt(dot(a, a))
+
+
+def normalized(a):
+    return scale(a, 1 / length(a))
+
+
+# the uv of one loop, the way the mathutils code computed it a loop at a time
+def reference_uv(method, parameters, p):
+    a, b, c = parameters[:3]
+    if method == "PLANAR":
+        ab = sub(b, a)
+        ac = sub(c, a)
+        du = dot(normalized(ab), sub(p, a)) / length(ab)
+        dv = dot(normalized(ac), sub(p, c)) / length(ac)
+        return du, -dv
+
+    if method == "CYLINDRICAL":
+        up = sub(a, b)
+        up_length = length(up)
+        front = normalized(sub(c, b))
+        plane_1_normal = scale(up, 1 / up_length)
+        plane_2_normal = normalized(cross(front, up))
+        front_plane = front + [-dot(front, b)]
+        plane_1 = plane_1_normal + [-dot(plane_1_normal, b)]
+        plane_2 = plane_2_normal + [-dot(plane_2_normal, b)]
+
+        dot_plane_1 = dot([p[0], p[1] - up_length, p[2], 1.0], plane_1)
+        point_in_plane_1 = sub(p, scale(plane_1[:3], dot_plane_1))
+        dot_front_plane = dot(point_in_plane_1, front_plane)
+        dot_plane_2 = dot(point_in_plane_1 + [1.0], plane_2)
+
+        _angle_1 = math.atan2(dot_plane_2, dot_front_plane) / math.pi * (360.0 / parameters[3])
+        du = min(max(0.5 + 0.5 * _angle_1, 0), 1)
+        dv = dot_plane_1 / up_length
+        return du, -dv
+
+    front = normalized(sub(b, a))
+    plane_1_normal = normalized(cross(front, sub(c, a)))
+    plane_2_normal = normalized(cross(plane_1_normal, front))
+    front_plane = front + [-dot(front, a)]
+    plane_1 = plane_1_normal + [-dot(plane_1_normal, a)]
+    plane_2 = plane_2_normal + [-dot(plane_2_normal, a)]
+
+    dot_plane_1 = dot(p + [1.0], plane_1)
+    point_in_plane_1 = sub(p, scale(plane_1[:3], dot_plane_1))
+    dot_front_plane = dot(point_in_plane_1, front_plane)
+    dot_plane_2 = dot(point_in_plane_1, plane_2)
+
+    _angle_1 = math.atan2(dot_plane_2, dot_front_plane) / math.pi * (360.0 / parameters[3])
+    du = 0.5 + 0.5 * _angle_1
+    _angle_2 = math.asin(dot_plane_1 / length(sub(p, a))) / math.pi * (180.0 / parameters[4])
+    dv = -0.5 - _angle_2
+    return du, -dv
+
+
+@pytest.mark.parametrize("method", ["PLANAR", "CYLINDRICAL", "SPHERICAL"])
+@pytest.mark.parametrize("seed", range(30))
+def test_uv_unwrap_faces_matches_per_loop(method, seed):
+    rng = np.random.default_rng(seed)
+    # the points are away from the origin, so the distance of each plane matters
+    points = rng.uniform(-50, 50, size=(3, 3)).tolist()
+    parameters = points + [float(rng.choice([90, 180, 360])), float(rng.choice([45, 90, 180]))]
+    vertices = rng.integers(-60, 60, size=(20, 3)).astype(np.float32)
+
+    texmap = TexMap(method)
+    texmap.parameters = parameters
+    uvs = texmap.uv_unwrap_faces(vertices)
+
+    expected = [reference_uv(method, parameters, vertex) for vertex in vertices.tolist()]
+    assert uvs.dtype == np.float32
+    np.testing.assert_allclose(uvs, expected, rtol=1e-5, atol=1e-5)
+
+
+def test_uv_unwrap_faces_unsupported_method():
+    assert TexMap("UNKNOWN").uv_unwrap_faces(np.zeros((3, 3))) is None
@@ -0,0 +1,93 @@
+import numpy as np
+import pytest
+
+from io_scene_import_ldraw_mm.ldraw_core.weld import points_near, weld_faces, weld_vertices
+
+
+def close(a, b, distance):
+    return ((np.asarray(a, dtype=np.float64) - np.asarray(b, dtype=np.float64)) ** 2).sum() <= distance ** 2
+
+
+# every vertex goes into the first vertex within distance of it, and so on along the chain
+def brute_force_weld(vertices, distance):
+    target = [next(j for j in range(i + 1) if close(vertices[i], vertices[j], distance)) for i in range(len(vertices))]
+    for i in range(len(target)):
+        while target[target[i]] != target[i]:
+            target[i] = target[target[i]]
+    firsts = sorted(set(target))
+    return vertices[firsts], np.array([firsts.index(t) for t in target])
+
+
+def random_vertices(rng, count):
+    # a coarse grid with a little noise, so there are exact duplicates, near misses and chains
+    vertices = rng.integers(0, 4, size=(count, 3)) * 0.04
+    noise = rng.random(count) < 0.3
+    vertices[noise] += rng.normal(scale=0.02, size=(noise.sum(), 3))
+    return vertices.astype(np.float32)
+
+
+@pytest.mark.parametrize("seed", range(400))
+def test_weld_vertices_matches_brute_force(seed):
+    rng = np.random.default_rng(seed)
+    vertices = random_vertices(rng, int(rng.integers(1, 40)))
+    distance = float(rng.choice([0.0, 0.01, 0.05, 0.1]))
+
+    welded, index = weld_vertices(vertices, distance)
+    expected_welded, expected_index = brute_force_weld(vertices, distance)
+
+    np.testing.assert_array_equal(welded, expected_welded)
+    np.testing.assert_array_equal(index, expected_index)
+
+
+@pytest.mark.parametrize("vertices, expected_index", [
+    # neighboring cells with no pair within distance
+    ([[0, 0, 0], [0, 0, 0], [0.07, 0, 0], [0.07, 0, 0]], [0, 0, 1, 1]),
+    ([[0, 0, 0], [0.07, 0, 0]], [0, 1]),
+    ([[0, 0, 0]], [0]),
+    # a chain ends up in its first vertex
+    ([[0.08, 0, 0], [0.04, 0, 0], [0, 0, 0]], [0, 0, 0]),
+])
+def test_weld_vertices_cases(vertices, expected_index):
+    welded, index = weld_vertices(vertices, 0.05)
+    assert index.tolist() == expected_index
+    assert len(welded) == max(expected_index) + 1
+
+
+def test_weld_vertices_empty():
+    welded, index = weld_vertices(np.zeros((0, 3)), 0.05)
+    assert welded.shape == (0, 3)
+    assert len(index) == 0
+
+
+def test_weld_faces():
+    # a quad that loses a loop, a triangle that collapses and a triangle that stays
+    loop_vertices = np.array([0, 1, 1, 2, 3, 3, 4, 5, 6, 7])
+    starts = np.array([0, 4, 7])
+    sizes = np.array([4, 3, 3])
+
+    loop_mask, face_mask, kept_starts, kept_sizes = weld_faces(loop_vertices, starts, sizes)
+
+    assert loop_vertices[loop_mask].tolist() == [0, 1, 2, 5, 6, 7]
+    assert face_mask.tolist() == [True, False, True]
+    assert kept_starts.tolist() == [0, 3]
+    assert kept_sizes.tolist() == [3, 3]
+
+
+def test_weld_faces_first_and_last_loop():
+    loop_mask, face_mask, kept_starts, kept_sizes = weld_faces(np.array([0, 1, 2, 0]), np.array([0]), np.array([4]))
+    # the first loop is compared with the last
+    assert loop_mask.tolist() == [False, True, True, True]
+    assert kept_sizes.tolist() == [3]
+
+
+@pytest.mark.parametrize("seed", range(50))
+def test_points_near_matches_brute_force(seed):
+    rng = np.random.default_rng(seed)
+    points = random_vertices(rng, int(rng.integers(1, 40)))
+    queries = random_vertices(rng, int(rng.integers(1, 10)))
+    distance = float(rng.choice([0.01, 0.05, 0.1]))
+
+    query, point = points_near(points, queries, distance)
+
+    expected = [(q, p) for q in range(len(queries)) for p in range(len(points)) if close(queries[q], points[p], distance)]
+    assert list(zip(query.tolist(), point.tolist())) == expected